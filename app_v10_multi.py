@@ -1,23 +1,44 @@
 import streamlit as st
-import pandas as pd
-from docx import Document
 import io
-import re
 import random
 import streamlit.components.v1 as components
-from bs4 import BeautifulSoup
 from datetime import datetime
 import json
-import os
-from difflib import SequenceMatcher
 
-# Intentar importar librerías de PDF
-try:
-    import PyPDF2
-    import pdfplumber
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
+# La lógica de calificación vive en el paquete retroalimentacion; este archivo solo la muestra.
+# Las dependencias pesadas (pandas, python-docx, BeautifulSoup, openpyxl y la pila de PDF)
+# se importan dentro de las funciones que las usan, así cada sección solo paga lo que necesita.
+from retroalimentacion import rendimiento
+from retroalimentacion.nombres import limpiar_nombre, normalizar_nombre, normalizar_serie_nombres
+from retroalimentacion.texto import PDF_AVAILABLE, leer_documento
+from retroalimentacion.excel import cargar_excel_proyectado
+from retroalimentacion.r3md import (
+    EXPRESIONES_FIJAS, MENSAJES_ERROR_R3, MENSAJES_EXITO_R3,
+    evaluar_documento_r3md, extraer_nombre, fila_calificacion_r3md, formatear_conjunto, generar_claves_r3md,
+    generar_mensaje_r3md, huella_documento_r3md,
+    id_alumno_desde_archivo, preparar_expresiones_r3md, tabla_claves_r3md, tabla_comparacion_r3md,
+    traza_compacta_r3md
+)
+from retroalimentacion.r4md import (
+    COLUMNA_CALIFICACION_R4, CURSO_PREDETERMINADO_R4,
+    borrar_historial_r4, borrar_marca_r4, calificar_participaciones_r4, cargar_historial_r4, cargar_marca_r4,
+    cargar_publicaciones_r4, guardar_publicaciones_r4,
+    construir_exportaciones_r4, contar_historial_r4, particiones_r4,
+    MENSAJES_SIMPLES_R4, exportar_libro_moodle_r4, extraer_participaciones_html,
+    generar_mensajes_simples_r4, guardar_historial_r4, guardar_marca_r4, marcar_duplicados_r4, nombres_sin_calificar,
+    punto_control_lote_r4
+)
+from retroalimentacion.r7md import (
+    MENSAJES_ALTERNOS_R7, MENSAJES_CORRECTO_R7, MENSAJES_INCORRECTO_R7,
+    alumnos_de_entregas_r7, cargar_cola_r7, entregas_pendientes_r7, extraer_entregas_desde_html,
+    guardar_cola_r7, personalizar_mensaje_r7, registrar_en_cola_r7
+)
+from retroalimentacion.puntos_control import PuntoControl, huella
+from retroalimentacion.similitud import agrupar_similares
+from retroalimentacion.trabajos import (
+    CANCELADO, FALLIDO, INTERRUMPIDO, TERMINADO,
+    cancelar_trabajo, enviar_lote, enviar_trabajo, listar_trabajos, obtener_trabajo
+)
 
 # Configuración de la página
 st.set_page_config(page_title="Sistema de Retroalimentación", layout="wide")
@@ -28,6 +49,11 @@ menu_option = st.sidebar.selectbox(
     "Selecciona una opción:",
     ["R3MD - Conjuntos", "R4MD - Proposiciones Lógicas", "R7MD - Mensajes Predefinidos"]
 )
+# Solo para esta sesión: la medición es de cada contexto, no del proceso
+rendimiento.activar(st.sidebar.checkbox(
+    "⏱️ Medir rendimiento", value=False,
+    help="Registra tiempos, llamadas y bytes de cada etapa; se ven en el panel Rendimiento al final de la página"
+))
 
 # ==================== FUNCIONES COMPARTIDAS ====================
 
@@ -43,546 +69,170 @@ def copy_to_clipboard_js(text):
     </script>
     """
     return js_code
-# ==================== R3MD - CONJUNTOS (VERSIÓN DEFINITIVA FUSIONADA) ====================
-
-def extraer_texto_pdf(pdf_file):
-    """Extrae texto de un archivo PDF usando pdfplumber"""
-    if not PDF_AVAILABLE:
-        raise Exception("Las librerías de PDF no están instaladas. Instala: pip install PyPDF2 pdfplumber")
-    
-    try:
-        texto_completo = ""
-        with pdfplumber.open(pdf_file) as pdf:
-            for pagina in pdf.pages:
-                texto_pagina = pagina.extract_text()
-                if texto_pagina:
-                    texto_completo += texto_pagina + "\n"
-        return texto_completo.strip()
-    except Exception as e:
-        try:
-            pdf_file.seek(0)
-            texto_completo = ""
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            for pagina in pdf_reader.pages:
-                texto_completo += pagina.extract_text() + "\n"
-            return texto_completo.strip()
-        except Exception as e2:
-            raise Exception(f"Error con pdfplumber: {str(e)} | Error con PyPDF2: {str(e2)}")
-
-def extraer_texto_docx_completo(docx_file):
-    """Extrae texto de un archivo DOCX incluyendo párrafos y tablas en orden"""
-    doc = Document(docx_file)
-    
-    # Crear un diccionario para mantener el orden de elementos
-    elementos = []
-    
-    # Extraer párrafos con su índice
-    for para in doc.paragraphs:
-        if para.text.strip():
-            elementos.append(('parrafo', para.text))
-    
-    # Extraer tablas
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                if cell.text.strip():
-                    elementos.append(('tabla', cell.text))
-    
-    # Unir todo el texto
-    texto_completo = "\n".join([elem[1] for elem in elementos])
-    return texto_completo, doc  # También retornar el objeto doc
-
-# ========== FUNCIONES PARA WORD (de app_mejorado.py) ==========
 
-def extraer_numeros_de_texto(texto):
+def filtrar_por_busqueda(nombres, clave, etiqueta="🔍 Buscar alumno:"):
     """
-    Extrae números de un texto, soportando:
-    - Separados por comas: 1,2,3
-    - Separados por espacios: 1 2 3
-    - Combinaciones: 1, 2, 3 o 1,2, 3
-    Retorna un conjunto normalizado de números como strings
+    Muestra un campo de búsqueda y devuelve los índices de los nombres que contienen
+    el texto escrito (sin distinguir mayúsculas). Sin búsqueda se devuelven todos.
     """
-    # Extraer todos los números
-    numeros = re.findall(r'\d+', texto)
-    
-    # Normalizar (convertir a int y luego a string para eliminar ceros a la izquierda)
-    numeros_normalizados = set(str(int(num)) for num in numeros if num)
-    
-    return numeros_normalizados
-
-def extraer_respuestas_desde_doc(doc):
+    buscar = st.text_input(etiqueta, placeholder="Escribe el nombre...", key=f"buscar_{clave}")
+    if not buscar:
+        return list(range(len(nombres)))
+    buscar = normalizar_nombre(buscar)
+    return [i for i, nombre in enumerate(nombres) if buscar in normalizar_nombre(nombre)]
+
+def _siguiente_alumno(clave, indices):
+    """Callback de "Siguiente": pasa el selector al alumno que sigue en la lista"""
+    actual = st.session_state.get(clave)
+    posicion = indices.index(actual) + 1 if actual in indices else 0
+    st.session_state[clave] = indices[posicion % len(indices)]
+
+def elegir_alumno(nombres, indices, clave, columnas=None):
     """
-    MÉTODO PARA WORD: Extrae TODAS las respuestas de un documento Word.
-    VERSIÓN V10 - Sin código duplicado, solo procesa celdas con "Resultado de la operación:"
-    
-    Mejoras V10:
-    - Eliminado código duplicado que causaba doble extracción
-    - Procesa ÚNICAMENTE celdas con "Resultado de la operación:"
-    - Usa rfind para encontrar el último "=" y extraer correctamente
-    - Extrae exactamente 7 respuestas (no 14)
+    Lista compacta de los alumnos (una fila por alumno en una sola tabla) y un selector.
+    Retorna el índice del alumno elegido (None si no hay): solo a ese se le dibujan
+    los widgets de detalle, así cada rerun cuesta lo mismo sin importar el tamaño del grupo.
+    columnas: {título: lista paralela a nombres} con columnas extra para la tabla.
     """
-    respuestas = []
-    primera_respuesta = True
+    import pandas as pd
+    
+    if not indices:
+        return None
+    tabla = pd.DataFrame({'Alumno': [nombres[i] for i in indices],
+                          **{titulo: [valores[i] for i in indices] for titulo, valores in (columnas or {}).items()}},
+                         index=[i + 1 for i in indices])
+    st.dataframe(tabla, use_container_width=True, height=min(400, 38 + 35 * len(indices)))
+    
+    clave_selector = f"alumno_{clave}"
+    # Si la búsqueda dejó fuera al alumno elegido, pasar al primero de la lista
+    if st.session_state.get(clave_selector) not in indices:
+        st.session_state[clave_selector] = indices[0]
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        elegido = st.selectbox("👤 Alumno a atender:", indices, format_func=lambda i: f"{i + 1}. {nombres[i]}",
+                               key=clave_selector)
+    with col2:
+        st.button("⏭️ Siguiente", key=f"siguiente_{clave}", use_container_width=True,
+                  on_click=_siguiente_alumno, args=(clave_selector, indices))
+    return elegido
+
+def mostrar_panel_rendimiento():
+    """Tiempos por etapa acumulados desde el último reinicio (solo con la medición activada)"""
+    if not rendimiento.esta_activo():
+        return
+    import pandas as pd
     
-    for table_idx, table in enumerate(doc.tables):
-        # Saltar las primeras 3 tablas (encabezado, instrucciones, conjuntos base)
-        if table_idx < 3:
-            continue
+    with st.expander("⏱️ Rendimiento", expanded=False):
+        filas = rendimiento.resumen()
+        if filas:
+            st.dataframe(pd.DataFrame(filas), use_container_width=True, hide_index=True)
+        else:
+            st.info("Aún no hay mediciones. Procesa algún archivo con la medición activada.")
         
-        for row in table.rows:
-            for cell in row.cells:
-                texto_celda = cell.text.strip()
-                
-                # ÚNICA ESTRATEGIA: Buscar "Resultado de la operación:"
-                patron_resultado = re.search(r'Resultado\s+de\s+la\s+operaci[oó]n\s*:\s*', texto_celda, re.IGNORECASE)
-                
-                # Si NO tiene el patrón, ignorar completamente esta celda
-                if not patron_resultado:
-                    continue
-                
-                # Extraer texto después del patrón
-                inicio_resultado = patron_resultado.end()
-                texto_solo_resultado = texto_celda[inicio_resultado:].strip()
-                
-                # Verificar que tenga "="
-                if not texto_solo_resultado or '=' not in texto_solo_resultado:
-                    continue
-                
-                # Buscar el ÚLTIMO signo igual
-                ultimo_igual_idx = texto_solo_resultado.rfind('=')
-                if ultimo_igual_idx == -1:
-                    continue
-                
-                # Extraer texto después del último "="
-                texto_despues_igual = texto_solo_resultado[ultimo_igual_idx + 1:].strip()
-                
-                # Extraer números
-                numeros_resultado = extraer_numeros_de_texto(texto_despues_igual)
-                
-                if numeros_resultado:
-                    # Saltar la primera respuesta (ejemplo)
-                    if primera_respuesta:
-                        primera_respuesta = False
-                        continue
-                    
-                    # Agregar respuesta válida
-                    respuestas.append(numeros_resultado)
-                else:
-                    # Conjunto vacío (sin números después del "=")
-                    if not re.search(r'[\d\{\[\(]', texto_despues_igual):
-                        if primera_respuesta:
-                            primera_respuesta = False
-                            continue
-                        respuestas.append(set())
-    
-    return respuestas
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="📥 Descargar mediciones (JSON)",
+                data=rendimiento.exportar_json(),
+                file_name=f"rendimiento_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                mime="application/json",
+                use_container_width=True
+            )
+        with col2:
+            if st.button("🔄 Reiniciar mediciones", use_container_width=True):
+                rendimiento.reiniciar()
+                st.rerun()
+
+# ==================== TRABAJOS EN SEGUNDO PLANO ====================
 
-def extraer_todos_los_numeros(texto):
-    """Extrae TODOS los números de un texto, sin importar el formato"""
-    numeros = re.findall(r'\d+', texto)
-    if numeros:
-        return set(str(int(num)) for num in numeros)
-    return set()
+# Segundos entre consultas del avance de un trabajo activo
+INTERVALO_AVANCE = 2
 
-def extraer_conjunto_agresivo(texto):
+@st.fragment(run_every=INTERVALO_AVANCE)
+def mostrar_avance_trabajo(id_trabajo, clave_sesion):
     """
-    VERSIÓN V5 MEJORADA: Extrae conjuntos de CUALQUIER formato.
-    Detecta: [], {}, (), combinaciones mixtas, números con espacios, y toma el ÚLTIMO conjunto válido.
-    NUEVO V5: Soporta combinaciones mixtas de delimitadores.
+    Avance de un trabajo activo. Es un fragmento: solo este panel se vuelve a dibujar
+    cada INTERVALO_AVANCE segundos; al terminar el trabajo se redibuja la página completa.
     """
-    todos_conjuntos = []
-    
-    # PASO 1: Si hay múltiples "=", dividir y tomar solo lo que está después del último
-    if texto.count('=') > 1:
-        partes = texto.split('=')
-        # Tomar la última parte (después del último "=")
-        texto = partes[-1].strip()
-    
-    # PASO 2: Buscar en TODOS los formatos posibles y guardar todos los conjuntos
-    
-    # ============ COMBINACIONES MIXTAS DE DELIMITADORES ============
-    
-    # { ) - abre con llave, cierra con paréntesis
-    matches = re.finditer(r'\{([^\}\)]*)\)', texto)
-    for match in matches:
-        conjunto = extraer_todos_los_numeros(match.group(1))
-        if conjunto and len(conjunto) >= 2:
-            if conjunto not in [
-                {'1','2','3','4','5','6','7','8','9','10','11','12','13','14'},
-                {'2','4','6','8','10','12','14'},
-                {'1','2','3','5','8','13'},
-                {'1','2','4','6','7','10','11','13'},
-                {'4','6','7','9','10','11','12','14'}
-            ]:
-                todos_conjuntos.append(('mixto_llave_paren', conjunto))
-    
-    # { ] - abre con llave, cierra con corchete
-    matches = re.finditer(r'\{([^\}\]]*)\]', texto)
-    for match in matches:
-        conjunto = extraer_todos_los_numeros(match.group(1))
-        if conjunto and len(conjunto) >= 2:
-            if conjunto not in [
-                {'1','2','3','4','5','6','7','8','9','10','11','12','13','14'},
-                {'2','4','6','8','10','12','14'},
-                {'1','2','3','5','8','13'},
-                {'1','2','4','6','7','10','11','13'},
-                {'4','6','7','9','10','11','12','14'}
-            ]:
-                todos_conjuntos.append(('mixto_llave_corchete', conjunto))
-    
-    # [ } - abre con corchete, cierra con llave
-    matches = re.finditer(r'\[([^\]\}]*)\}', texto)
-    for match in matches:
-        conjunto = extraer_todos_los_numeros(match.group(1))
-        if conjunto and len(conjunto) >= 2:
-            if conjunto not in [
-                {'1','2','3','4','5','6','7','8','9','10','11','12','13','14'},
-                {'2','4','6','8','10','12','14'},
-                {'1','2','3','5','8','13'},
-                {'1','2','4','6','7','10','11','13'},
-                {'4','6','7','9','10','11','12','14'}
-            ]:
-                todos_conjuntos.append(('mixto_corchete_llave', conjunto))
-    
-    # [ ) - abre con corchete, cierra con paréntesis
-    matches = re.finditer(r'\[([^\]\)]*)\)', texto)
-    for match in matches:
-        conjunto = extraer_todos_los_numeros(match.group(1))
-        if conjunto and len(conjunto) >= 2:
-            if conjunto not in [
-                {'1','2','3','4','5','6','7','8','9','10','11','12','13','14'},
-                {'2','4','6','8','10','12','14'},
-                {'1','2','3','5','8','13'},
-                {'1','2','4','6','7','10','11','13'},
-                {'4','6','7','9','10','11','12','14'}
-            ]:
-                todos_conjuntos.append(('mixto_corchete_paren', conjunto))
-    
-    # ( } - abre con paréntesis, cierra con llave
-    matches = re.finditer(r'\(([^\)\}]*)\}', texto)
-    for match in matches:
-        conjunto = extraer_todos_los_numeros(match.group(1))
-        if conjunto and len(conjunto) >= 2:
-            if conjunto not in [
-                {'1','2','3','4','5','6','7','8','9','10','11','12','13','14'},
-                {'2','4','6','8','10','12','14'},
-                {'1','2','3','5','8','13'},
-                {'1','2','4','6','7','10','11','13'},
-                {'4','6','7','9','10','11','12','14'}
-            ]:
-                todos_conjuntos.append(('mixto_paren_llave', conjunto))
-    
-    # ( ] - abre con paréntesis, cierra con corchete
-    matches = re.finditer(r'\(([^\)\]]*)\]', texto)
-    for match in matches:
-        conjunto = extraer_todos_los_numeros(match.group(1))
-        if conjunto and len(conjunto) >= 2:
-            if conjunto not in [
-                {'1','2','3','4','5','6','7','8','9','10','11','12','13','14'},
-                {'2','4','6','8','10','12','14'},
-                {'1','2','3','5','8','13'},
-                {'1','2','4','6','7','10','11','13'},
-                {'4','6','7','9','10','11','12','14'}
-            ]:
-                todos_conjuntos.append(('mixto_paren_corchete', conjunto))
-    
-    # ============ COMBINACIONES ESTÁNDAR ============
-    
-    # Formato 1: Corchetes [] (común en el documento)
-    matches_corchetes = re.finditer(r'\[([^\]]+)\]', texto)
-    for match in matches_corchetes:
-        conjunto = extraer_todos_los_numeros(match.group(1))
-        if conjunto and len(conjunto) >= 2:
-            todos_conjuntos.append(('corchetes', conjunto))
-    
-    # Formato 2: Llaves {}
-    matches_llaves = re.finditer(r'\{([^}]+)\}', texto)
-    for match in matches_llaves:
-        conjunto = extraer_todos_los_numeros(match.group(1))
-        if conjunto and len(conjunto) >= 2:
-            # Filtrar conjuntos que son definiciones base
-            if conjunto not in [
-                {'1','2','3','4','5','6','7','8','9','10','11','12','13','14'},  # U
-                {'2','4','6','8','10','12','14'},  # A
-                {'1','2','3','5','8','13'},  # B
-                {'1','2','4','6','7','10','11','13'},  # C
-                {'4','6','7','9','10','11','12','14'}  # B' común
-            ]:
-                todos_conjuntos.append(('llaves', conjunto))
-    
-    # Formato 3: Paréntesis ()
-    matches_parentesis = re.finditer(r'\(([^)]+)\)', texto)
-    for match in matches_parentesis:
-        contenido = match.group(1)
-        # Filtrar si parece ser hora, fecha, etc.
-        if not re.search(r':\d{2}|Real|Máx', contenido):
-            numeros = extraer_todos_los_numeros(contenido)
-            if len(numeros) >= 2:
-                todos_conjuntos.append(('parentesis', numeros))
-    
-    # Formato 4: Números sueltos separados por comas (sin delimitadores)
-    # Ejemplo: "A Ո C = 2, 4, 6, 10"
-    if ',' in texto and not todos_conjuntos:
-        # Extraer solo la parte después del último "=" si existe
-        if '=' in texto:
-            texto_numeros = texto.split('=')[-1].strip()
-        else:
-            texto_numeros = texto
-        
-        numeros = extraer_todos_los_numeros(texto_numeros)
-        if len(numeros) >= 2:
-            # Verificar que no sea un conjunto base
-            if numeros not in [
-                {'1','2','3','4','5','6','7','8','9','10','11','12','13','14'},
-                {'2','4','6','8','10','12','14'},
-                {'1','2','3','5','8','13'},
-                {'1','2','4','6','7','10','11','13'}
-            ]:
-                todos_conjuntos.append(('sueltos', numeros))
-    
-    # PASO 3: Retornar el ÚLTIMO conjunto encontrado (el más probable de ser el resultado)
-    if todos_conjuntos:
-        return todos_conjuntos[-1][1]  # Retornar solo el conjunto, no el tipo
-    
-    return set()
-
-def buscar_conjunto_MAXIMA_AGRESIVIDAD(texto_completo, letra_inciso, conjunto_esperado):
+    trabajo = obtener_trabajo(id_trabajo)
+    if trabajo is None or not trabajo.activo:
+        st.rerun()
+    st.info(f"⚙️ Calificando en segundo plano: {trabajo.descripcion}. "
+            "Puedes seguir usando la página o recargarla; el lote no se interrumpe.")
+    st.progress(trabajo.hechos / trabajo.total if trabajo.total else 0.0,
+                text=f"{trabajo.hechos} de {trabajo.total}")
+    if st.button("⏹️ Cancelar trabajo", key=f"cancelar_{clave_sesion}"):
+        cancelar_trabajo(trabajo.id)
+
+def seguir_trabajo(tipo, clave_sesion):
     """
-    MÉTODO PARA PDF: VERSIÓN ULTRA MEJORADA V4
-    - Busca hasta 30 líneas después del inciso
-    - Concatena múltiples líneas para manejar operaciones complejas distribuidas
-    - Busca el patrón "Resultado de la operación:"
-    - Maneja casos donde la operación se extiende en varias líneas con múltiples "="
-    - Toma el ÚLTIMO conjunto cuando hay múltiples en la misma sección
-    - Mejor detección de fin de sección (siguiente inciso o créditos)
-    - ✨ NUEVO V4: Detecta tanto letras (a-g) como números (1-7) en los incisos
-    - ✨ Maneja respuestas en líneas separadas (típico de PDFs)
-    - ✨ Inicia búsqueda DESPUÉS de la definición de conjuntos base
+    Muestra el trabajo en segundo plano de esta página y su avance. Si la sesión es
+    nueva (página recargada, otra pestaña) se conecta al trabajo activo más reciente
+    del mismo tipo. Mientras corre, solo el panel de avance se vuelve a dibujar.
+    Retorna el Trabajo si ya terminó (para mostrar sus resultados), si no None.
     """
-    lineas = texto_completo.split('\n')
-    
-    # PASO 1: Encontrar dónde terminan las definiciones de conjuntos base
-    # Buscar la línea que contiene "C = " (último conjunto base definido)
-    inicio_busqueda = 0
-    for i, linea in enumerate(lineas):
-        if re.search(r'C\s*=\s*\{.*\d.*\}', linea):
-            inicio_busqueda = i + 1  # Empezar búsqueda después de esta línea
-            break
-    
-    # Convertir letra a número (a=1, b=2, etc.) para buscar también en formato numérico
-    numero_inciso = str(ord(letra_inciso.lower()) - ord('a') + 1)
-    
-    # Patrones para detectar el inciso (letras Y números)
-    patrones_inciso = [
-        # Patrones con LETRAS
-        rf"^{letra_inciso}[\)\.]",           # a) o a.
-        rf"\b{letra_inciso}[\)\.]",          # palabra a) o a.
-        rf"inciso\s+{letra_inciso}\b",       # inciso a
-        rf"^\s*{letra_inciso}\s*[\)\.]",     # a) con espacios
-        rf"^{letra_inciso}\s*$",              # solo "a" en una línea
-        # Patrones con NÚMEROS
-        rf"^{numero_inciso}[\)\.]",          # 1) o 1.
-        rf"\b{numero_inciso}[\)\.]",         # palabra 1) o 1.
-        rf"^\s*{numero_inciso}\s*[\)\.]",    # 1) con espacios
-        rf"^{numero_inciso}\s*$",             # solo "1" en una línea
-    ]
-    
-    for i, linea in enumerate(lineas[inicio_busqueda:], start=inicio_busqueda):
-        linea_limpia = linea.strip()
-        if not linea_limpia:
-            continue
-        
-        # Verificar si esta línea contiene el inciso
-        contiene_inciso = any(re.search(patron, linea_limpia, re.IGNORECASE) 
-                             for patron in patrones_inciso)
-        
-        # También verificar la línea anterior
-        if not contiene_inciso and i > 0:
-            linea_anterior = lineas[i-1].strip()
-            contiene_inciso = any(re.search(patron, linea_anterior, re.IGNORECASE) 
-                                 for patron in patrones_inciso)
-        
-        if contiene_inciso:
-            # BUSCAR en las siguientes 30 líneas (aumentado desde 15)
-            conjuntos_candidatos = []
-            
-            # ESTRATEGIA 1: Buscar "Resultado de la operación:" y concatenar líneas
-            resultado_encontrado = False
-            lineas_concatenadas = ""
-            inicio_resultado = i
-            
-            for j in range(i, min(i + 30, len(lineas))):
-                linea_a_evaluar = lineas[j].strip()
-                
-                # Detectar "Resultado de la operación:"
-                if 'resultado de la operación' in linea_a_evaluar.lower() or \
-                   'resultado de la operacion' in linea_a_evaluar.lower():
-                    resultado_encontrado = True
-                    inicio_resultado = j
-                    continue
-                
-                # Si ya encontramos "Resultado de la operación:", concatenar líneas
-                if resultado_encontrado:
-                    # Detectar si llegamos al siguiente inciso (cualquier letra seguida de ) o . O cualquier número seguido de ) o .)
-                    if j > inicio_resultado + 1:  # No verificar la línea inmediata después
-                        # Patrones para detectar CUALQUIER inciso (letras a-z O números 1-7)
-                        if (re.match(r'^[a-z][\)\.]', linea_a_evaluar.lower()) or 
-                            re.match(r'^[1-7][\)\.]', linea_a_evaluar)):
-                            # Encontramos el siguiente inciso, detenerse
-                            break
-                    
-                    # Si la línea contiene "CRÉDITOS" o similar, detenerse
-                    if 'créditos' in linea_a_evaluar.lower() or 'autor' in linea_a_evaluar.lower():
-                        break
-                    
-                    # Si la línea está vacía y ya tenemos contenido, puede ser fin de sección
-                    if not linea_a_evaluar and lineas_concatenadas:
-                        # Verificar si las próximas 2 líneas también están vacías
-                        proximas_vacias = sum(1 for k in range(j+1, min(j+3, len(lineas))) 
-                                             if not lineas[k].strip())
-                        if proximas_vacias >= 2:
-                            break
-                    
-                    # Concatenar esta línea
-                    if linea_a_evaluar:  # Solo si no está vacía
-                        lineas_concatenadas += " " + linea_a_evaluar
-                    
-                    # Extraer TODOS los conjuntos de la concatenación actual
-                    # Buscar con llaves primero (formato más común)
-                    patron_llaves = r'\{([^}]*)\}'
-                    matches = list(re.finditer(patron_llaves, lineas_concatenadas))
-                    
-                    # Si no se encontraron con llaves, buscar en la línea individual también
-                    # (para casos donde el conjunto está solo en una línea)
-                    if not matches and linea_a_evaluar:
-                        matches_linea = list(re.finditer(patron_llaves, linea_a_evaluar))
-                        if matches_linea:
-                            matches = matches_linea
-                    
-                    for match in matches:
-                        contenido = match.group(1).strip()
-                        numeros = re.findall(r'\d+', contenido)
-                        if numeros and len(numeros) >= 2:
-                            conjunto_temp = set(str(int(num)) for num in numeros)
-                            
-                            # Filtrar conjuntos base (las definiciones iniciales)
-                            if conjunto_temp not in [
-                                {'1','2','3','4','5','6','7','8','9','10','11','12','13','14'},
-                                {'2','4','6','8','10','12','14'},
-                                {'1','2','3','5','8','13'},
-                                {'1','2','4','6','7','10','11','13'},
-                                {'4','6','7','9','10','11','12','14'}
-                            ]:
-                                # Reemplazar si ya existe (mantener solo el último)
-                                # Filtrar candidatos previos del mismo conjunto
-                                conjuntos_candidatos = [c for c in conjuntos_candidatos if c[0] != conjunto_temp]
-                                # Agregar el nuevo (más reciente)
-                                conjuntos_candidatos.append((conjunto_temp, lineas_concatenadas.strip(), j - i))
-            
-            # Buscar el conjunto esperado en los candidatos (tomar el ÚLTIMO que coincida)
-            for conjunto_temp, linea_orig, distancia in reversed(conjuntos_candidatos):
-                if conjunto_temp == conjunto_esperado:
-                    return True, linea_orig[:300], distancia  # Limitar longitud del contexto
-            
-            # ESTRATEGIA 2: Búsqueda con concatenación de líneas sin "Resultado de la operación:"
-            if not conjuntos_candidatos:
-                for j in range(i, min(i + 30, len(lineas))):
-                    # Concatenar hasta 7 líneas para buscar el conjunto (aumentado desde 5)
-                    texto_multi_linea = " ".join([lineas[k].strip() for k in range(j, min(j + 7, len(lineas))) 
-                                                  if lineas[k].strip()])
-                    
-                    conjunto_encontrado = extraer_conjunto_agresivo(texto_multi_linea)
-                    
-                    if conjunto_encontrado and conjunto_encontrado == conjunto_esperado:
-                        return True, texto_multi_linea[:300], j - i
-            
-            # ESTRATEGIA 3: Búsqueda línea por línea individual
-            for j in range(i, min(i + 30, len(lineas))):
-                linea_a_evaluar = lineas[j].strip()
-                conjunto_encontrado = extraer_conjunto_agresivo(linea_a_evaluar)
-                
-                if conjunto_encontrado and conjunto_encontrado == conjunto_esperado:
-                    return True, linea_a_evaluar, j - i
-    
-    return False, "", -1
-
-# ========== FUNCIONES COMUNES ==========
-
-def extraer_nombre(texto):
-    """Extrae el nombre del documento de manera más flexible"""
-    # Patrón 1: "Nombre completo:"
-    match = re.search(r"(?i)nombre\s*completo[:\s]+([^\n\r]+)", texto)
-    if match:
-        nombre_completo = match.group(1).strip()
-        # Tomar solo la primera palabra (nombre)
-        primer_nombre = nombre_completo.split()[0] if nombre_completo else "Alumno"
-        return primer_nombre
-    
-    # Patrón 2: "Nombre:"
-    match = re.search(r"(?i)nombre[:\s]+([^\n\r]+)", texto)
-    if match:
-        nombre_completo = match.group(1).strip()
-        primer_nombre = nombre_completo.split()[0] if nombre_completo else "Alumno"
-        return primer_nombre
-    
-    return "Alumno"
-
-def extraer_conjunto_esperado(expresion_completa):
-    """Extrae el conjunto esperado de una expresión como 'B ∩ C = {1,2,13}'"""
-    if '=' in expresion_completa:
-        parte_conjunto = expresion_completa.split('=', 1)[1].strip()
-        # Usar la función agresiva para máxima compatibilidad
-        return extraer_conjunto_agresivo(parte_conjunto)
-    return set()
-
-def determinar_videos_necesarios(indices_incorrectos):
-    videos = []
-    if 6 in indices_incorrectos:
-        videos.append("https://youtu.be/-IHf20iF3Cg")
-    
-    otros_incorrectos = [i for i in indices_incorrectos if i != 6]
-    if otros_incorrectos:
-        videos.append("https://youtu.be/q5uYIWw7uD0")
-    
-    return videos
+    import pandas as pd
+
+    trabajos = listar_trabajos(tipo)
+    if clave_sesion not in st.session_state:
+        activos = [t for t in trabajos if t.activo]
+        if activos:
+            st.session_state[clave_sesion] = activos[0].id
+
+    if trabajos:
+        with st.expander(f"🗂️ Trabajos en segundo plano ({len(trabajos)})"):
+            st.dataframe(pd.DataFrame([{
+                'Creado': t.creado, 'Descripción': t.descripcion, 'Estado': t.estado,
+                'Avance': f"{t.hechos}/{t.total}", 'Recuperados': t.recuperados, 'ID': t.id
+            } for t in trabajos[:20]]), use_container_width=True, hide_index=True)
+            ids = [t.id for t in trabajos[:20]]
+            actual = st.session_state.get(clave_sesion)
+            elegido = st.selectbox("Ver trabajo", ids, index=ids.index(actual) if actual in ids else 0,
+                                   key=f"elegir_{clave_sesion}")
+            if elegido != actual and st.button("👁️ Ver este trabajo", key=f"ver_{clave_sesion}"):
+                st.session_state[clave_sesion] = elegido
+                st.rerun()
+
+    id_trabajo = st.session_state.get(clave_sesion)
+    trabajo = obtener_trabajo(id_trabajo) if id_trabajo else None
+    if trabajo is None:
+        return None
+
+    if trabajo.activo:
+        mostrar_avance_trabajo(trabajo.id, clave_sesion)
+        return None
+    if trabajo.estado == FALLIDO:
+        st.error(f"❌ El trabajo falló: {trabajo.error}")
+    elif trabajo.estado in (CANCELADO, INTERRUMPIDO):
+        st.warning(f"⚠️ Trabajo {trabajo.estado} después de {trabajo.hechos} de {trabajo.total}. "
+                   "Si vuelves a enviar el mismo lote, lo ya calificado se toma del punto de control.")
+    if trabajo.recuperados:
+        st.info(f"♻️ {trabajo.recuperados} elemento(s) recuperados del punto de control de una corrida interrumpida")
+    return trabajo if trabajo.estado == TERMINADO else None
+
+# ==================== R3MD - CONJUNTOS (VERSIÓN DEFINITIVA FUSIONADA) ====================
 
 def procesar_documento_r3md(documento_file, archivo_idx, EXPRESIONES_FIJAS,
-                              mensajes_exito, mensajes_error):
+                              mensajes_exito, mensajes_error, trazar=False, clave=None):
     """
     Procesa un único documento (Word o PDF) y muestra tabla comparativa + mensaje.
     archivo_idx se usa para hacer únicos todos los widget keys.
+    Con trazar=True la traza compacta del documento se guarda en session_state['trazas_r3'].
+    Con clave (ClaveR3) se califica contra la variante del alumno.
+    Retorna el texto extraído (None si no se pudo leer).
     """
-    import tempfile, os as _os
-
-    nombre = "Alumno"
-    texto_completo = ""
-    doc_object = None
-    es_word = False
+    import pandas as pd
 
     try:
         if documento_file.name.lower().endswith('.pdf'):
             if not PDF_AVAILABLE:
                 st.error("❌ No se pueden procesar archivos PDF.")
                 return
-            with st.spinner("📄 Extrayendo texto del PDF..."):
-                documento_file.seek(0)
-                raw = documento_file.read()
-                # Escribir a archivo temporal para máxima compatibilidad con pdfplumber
-                tmp_path = None
-                try:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                        tmp.write(raw)
-                        tmp_path = tmp.name
-                    texto_completo = extraer_texto_pdf(tmp_path)
-                finally:
-                    if tmp_path and _os.path.exists(tmp_path):
-                        _os.unlink(tmp_path)
-            es_word = False
+            mensaje_spinner = "📄 Extrayendo texto del PDF..."
         else:
-            with st.spinner("📄 Extrayendo texto del Word..."):
-                documento_file.seek(0)
-                texto_completo, doc_object = extraer_texto_docx_completo(documento_file)
-            es_word = True
+            mensaje_spinner = "📄 Extrayendo texto del Word..."
+        with st.spinner(mensaje_spinner):
+            texto_completo, doc_object = leer_documento(documento_file.name, documento_file.getvalue())
 
         nombre = extraer_nombre(texto_completo)
 
@@ -594,70 +244,39 @@ def procesar_documento_r3md(documento_file, archivo_idx, EXPRESIONES_FIJAS,
         return
 
     try:
-        conjuntos_esperados = [extraer_conjunto_esperado(expr) for expr in EXPRESIONES_FIJAS]
-        resultados = []
-        letras = "abcdefghijklmnopqrstuvwxyz"
+        resultado = evaluar_documento_r3md(texto_completo, doc_object, EXPRESIONES_FIJAS, trazar=trazar,
+                                           clave=clave)
+        if trazar:
+            st.session_state.setdefault('trazas_r3', {})[documento_file.name] = \
+                traza_compacta_r3md(documento_file.name, resultado)
 
         # ===== WORD: detección directa desde tablas =====
-        if es_word and doc_object:
+        if resultado.es_word:
             st.info("🎯 Usando método optimizado para WORD: Detección directa desde tablas")
-            respuestas_encontradas = extraer_respuestas_desde_doc(doc_object)
 
             with st.expander("📊 Ver respuestas extraídas del documento"):
-                for i, resp in enumerate(respuestas_encontradas):
-                    st.write(f"Respuesta {i+1}: {{{', '.join(sorted(resp, key=int))}}}")
-
-            for i, (expresion, conjunto_esperado) in enumerate(zip(EXPRESIONES_FIJAS, conjuntos_esperados)):
-                letra = letras[i]
-                if i < len(respuestas_encontradas):
-                    conjunto_encontrado = respuestas_encontradas[i]
-                    encontrado = (conjunto_esperado == conjunto_encontrado)
-                else:
-                    conjunto_encontrado = set()
-                    encontrado = False
-
-                resultados.append({
-                    'letra': letra, 'expresion': expresion,
-                    'conjunto_esperado': conjunto_esperado,
-                    'encontrado': encontrado,
-                    'conjunto_encontrado': conjunto_encontrado,
-                    'distancia': 0 if encontrado else -1
-                })
+                for i, resp in enumerate(resultado.respuestas_word):
+                    st.write(f"Respuesta {i+1}: {formatear_conjunto(resp)}")
 
         # ===== PDF: búsqueda agresiva =====
         else:
             st.info("🎯 Usando método optimizado para PDF: Búsqueda agresiva hasta 15 líneas")
 
-            for i, (expresion, conjunto_esperado) in enumerate(zip(EXPRESIONES_FIJAS, conjuntos_esperados)):
-                letra = letras[i]
-
-                with st.expander(f"🔎 Buscar {letra}) {expresion}"):
-                    st.write(f"**Conjunto esperado:** {{{', '.join(sorted(conjunto_esperado, key=int))}}}")
-                    encontrado, linea_encontrada, distancia = buscar_conjunto_MAXIMA_AGRESIVIDAD(
-                        texto_completo, letra, conjunto_esperado
-                    )
-                    if encontrado:
+            for r in resultado.incisos:
+                with st.expander(f"🔎 Buscar {r.letra}) {r.expresion}"):
+                    st.write(f"**Conjunto esperado:** {formatear_conjunto(r.conjunto_esperado)}")
+                    if r.encontrado:
                         st.success("✅ **ENCONTRADO**")
-                        st.code(f"Línea: {linea_encontrada}", language="text")
-                        st.info(f"📏 Distancia desde el inciso: {distancia} líneas")
-                        conjunto_encontrado = conjunto_esperado
+                        st.code(f"Línea: {r.linea}", language="text")
+                        st.info(f"📏 Distancia desde el inciso: {r.distancia} líneas")
                     else:
                         st.error("❌ **NO ENCONTRADO**")
                         st.warning("Posibles razones: conjunto incorrecto, demasiado lejos del inciso, o formato no reconocido")
-                        conjunto_encontrado = set()
-
-                resultados.append({
-                    'letra': letra, 'expresion': expresion,
-                    'conjunto_esperado': conjunto_esperado,
-                    'encontrado': encontrado,
-                    'conjunto_encontrado': conjunto_encontrado,
-                    'distancia': distancia if encontrado else -1
-                })
 
         # ===== RESULTADOS =====
-        coincidencias    = [r for r in resultados if r['encontrado']]
-        no_encontradas   = [r for r in resultados if not r['encontrado']]
-        indices_incorrectos = [i for i, r in enumerate(resultados) if not r['encontrado']]
+        resultados = resultado.incisos
+        coincidencias  = resultado.correctos
+        no_encontradas = resultado.incorrectos
 
         st.markdown("---")
         st.subheader("📊 Resumen de Resultados")
@@ -675,35 +294,7 @@ def procesar_documento_r3md(documento_file, archivo_idx, EXPRESIONES_FIJAS,
         st.markdown("---")
         st.subheader("📊 Tabla de Comparación Detallada: Esperado vs Obtenido")
 
-        comparacion_data = []
-        for r in resultados:
-            esperado_str = "{" + ", ".join(sorted(r['conjunto_esperado'], key=int)) + "}"
-            if r['encontrado']:
-                encontrado_str = "{" + ", ".join(sorted(r['conjunto_encontrado'], key=int)) + "}"
-                diferencias_str = "—"
-                estado = "✅ Correcto"
-            else:
-                encontrado_str = "❌ No encontrado"
-                diferencias_str = "No se encontró cerca del inciso"
-                estado = "❌ Incorrecto"
-
-            if r['conjunto_encontrado'] and r['conjunto_esperado'] != r['conjunto_encontrado']:
-                faltantes = r['conjunto_esperado'] - r['conjunto_encontrado']
-                extras    = r['conjunto_encontrado'] - r['conjunto_esperado']
-                diferencias_str = ""
-                if faltantes:
-                    diferencias_str += f"Faltan: {{{', '.join(sorted(faltantes, key=int))}}}"
-                if extras:
-                    if diferencias_str: diferencias_str += " | "
-                    diferencias_str += f"Sobran: {{{', '.join(sorted(extras, key=int))}}}"
-
-            comparacion_data.append({
-                'Inciso': r['letra'], 'Expresión': r['expresion'],
-                'Esperado': esperado_str, 'Obtenido': encontrado_str,
-                'Diferencias': diferencias_str, 'Estado': estado
-            })
-
-        df_comparacion = pd.DataFrame(comparacion_data)
+        df_comparacion = pd.DataFrame(tabla_comparacion_r3md(resultado))
 
         def colorear_fila(row):
             if '✅' in row['Estado']:
@@ -728,27 +319,7 @@ def procesar_documento_r3md(documento_file, archivo_idx, EXPRESIONES_FIJAS,
         st.markdown("---")
 
         # Mensaje de retroalimentación
-        mensaje_limpio = ""
-        if len(no_encontradas) == 0:
-            encabezado = random.choice(mensajes_exito).format(nombre=nombre)
-            mensaje_limpio += f"{encabezado}\n\n"
-            for r in resultados:
-                mensaje_limpio += f"{r['letra']}) {r['expresion']} - correcto\n"
-        else:
-            encabezado = random.choice(mensajes_error).format(nombre=nombre)
-            mensaje_limpio += f"{encabezado}\n"
-            videos = determinar_videos_necesarios(indices_incorrectos)
-            if videos:
-                mensaje_limpio += ("Revisa el siguiente video:\n" if len(videos) == 1
-                                   else "Revisa los siguientes videos:\n")
-                for v in videos:
-                    mensaje_limpio += f"{v}\n"
-                mensaje_limpio += "\n"
-            for r in resultados:
-                if r['encontrado']:
-                    mensaje_limpio += f"{r['letra']}) {r['expresion']} - correcto\n"
-                else:
-                    mensaje_limpio += f"{r['letra']}) - incorrecto\n"
+        mensaje_limpio = generar_mensaje_r3md(resultado, mensajes_exito, mensajes_error)
 
         st.subheader("📝 Mensaje Final de Retroalimentación")
         st.text_area("Mensaje generado para copiar:", value=mensaje_limpio, height=300,
@@ -771,6 +342,83 @@ def procesar_documento_r3md(documento_file, archivo_idx, EXPRESIONES_FIJAS,
         import traceback
         st.code(traceback.format_exc())
 
+    return texto_completo
+
+def mostrar_similitud_r3md(textos):
+    """Grupos de documentos casi idénticos entre los cargados (posibles copias)"""
+    import pandas as pd
+
+    st.markdown("---")
+    st.subheader("🕵️ Documentos similares")
+    umbral = st.slider("Similitud mínima", 0.5, 1.0, 0.8, 0.05, key="umbral_similitud_r3",
+                       help="Proporción de fragmentos de 5 palabras en común, sin contar el enunciado "
+                            "que comparten todas las entregas")
+    grupos = agrupar_similares(textos, umbral=umbral)
+    if not grupos:
+        st.success("✅ No se encontraron documentos casi idénticos")
+        return
+    st.warning(f"⚠️ {len(grupos)} grupo(s) de documentos casi idénticos")
+    for i, grupo in enumerate(grupos, 1):
+        with st.expander(f"Grupo {i}: {len(grupo.documentos)} documentos — hasta {grupo.similitud_maxima:.0%}"):
+            st.dataframe(pd.DataFrame([{'Documento A': par.documento_a, 'Documento B': par.documento_b,
+                                        'Similitud': f"{par.similitud:.0%}"} for par in grupo.pares]),
+                         use_container_width=True, hide_index=True)
+
+def similares_lote_r3md(filas):
+    """Resultado final de un lote en segundo plano: grupos de documentos casi idénticos"""
+    textos = {fila['archivo']: fila['texto'] for fila in filas if 'texto' in fila}
+    return {'similares': [{'documentos': grupo.documentos, 'similitud': grupo.similitud_maxima}
+                          for grupo in agrupar_similares(textos)]}
+
+def mostrar_lote_r3md(trabajo):
+    """Resultados de un lote de R3MD calificado en segundo plano"""
+    import pandas as pd
+
+    filas = [fila for fila in trabajo.resultados if 'error' not in fila]
+    errores = len(trabajo.resultados) - len(filas)
+    st.success(f"✅ Lote terminado: {len(filas)} documento(s) calificados"
+               + (f", {errores} con error" if errores else ""))
+    if not filas:
+        return
+    df_lote = pd.DataFrame([{
+        'Archivo': fila['archivo'], 'Nombre': fila['nombre'],
+        'Correctos': f"{fila['correctos']}/{fila['total']}", 'Incorrectos': fila['incorrectos'],
+        'Mensaje': fila['mensaje']
+    } for fila in filas])
+    st.dataframe(df_lote, use_container_width=True, hide_index=True)
+    st.download_button("📥 Descargar calificaciones y mensajes (CSV)", df_lote.to_csv(index=False).encode('utf-8'),
+                       file_name=f"lote_r3md_{trabajo.id}.csv", mime="text/csv", key=f"dl_lote_{trabajo.id}")
+
+    similares = (trabajo.resultado or {}).get('similares', [])
+    if similares:
+        st.warning(f"🕵️ {len(similares)} grupo(s) de documentos casi idénticos")
+        for grupo in similares:
+            st.caption(f"{', '.join(grupo['documentos'])} — hasta {grupo['similitud']:.0%}")
+
+def mostrar_trazas_r3md():
+    """Trazas guardadas de los documentos evaluados, del más lento al más rápido"""
+    import pandas as pd
+    
+    trazas = sorted(st.session_state.get('trazas_r3', {}).values(), key=lambda t: t['ms'], reverse=True)
+    if not trazas:
+        return
+    
+    with st.expander(f"🧭 Trazas de calificación ({len(trazas)} documento(s))"):
+        st.dataframe(pd.DataFrame([{
+            'Archivo': t['archivo'],
+            'Tipo': "Word" if t['es_word'] else "PDF",
+            'Caracteres': t['caracteres'],
+            'ms': t['ms'],
+            'Regex': t['regex'],
+            'Estrategias': " ".join(f"{letra}:{estrategia}" for letra, estrategia, *_ in t['incisos'])
+        } for t in trazas]), use_container_width=True, hide_index=True)
+        st.caption("Por inciso: [letra, estrategia, líneas revisadas, pasadas de regex, ms]")
+        st.download_button(
+            label="📥 Descargar trazas (JSON)",
+            data=json.dumps(trazas, ensure_ascii=False),
+            file_name=f"trazas_r3md_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json"
+        )
 
 def mostrar_r3md():
     if 'uploader_counter_r3' not in st.session_state:
@@ -783,50 +431,36 @@ def mostrar_r3md():
         st.warning("⚠️ Las librerías de PDF no están instaladas. Solo se podrán procesar archivos Word (.docx)")
         st.info("Para habilitar soporte PDF, instala: pip install PyPDF2 pdfplumber")
 
-    mensajes_exito = [
-        "Excelente trabajo, {nombre}. El último ejercicio de este reto demuestra claramente tu dominio y comprensión profunda de los conjuntos. Felicidades por tu esfuerzo. Saludos.",
-        "Muy bien hecho, {nombre}. Tus respuestas son precisas, completas y demuestran que has comprendido perfectamente el tema. Sigue trabajando con esa misma dedicación.",
-        "Perfecto, {nombre}. Se nota que comprendiste el tema de conjuntos de manera integral. Tu trabajo refleja compromiso y entendimiento. Continúa así.",
-        "Buen trabajo, {nombre}. Has resuelto correctamente todos los incisos del reto, mostrando un manejo adecuado de las operaciones con conjuntos. Felicidades.",
-        "Todo correcto, {nombre}. Tu trabajo refleja que has dominado completamente el concepto de operaciones con conjuntos. Excelente desempeño en este reto.",
-        "Felicidades, {nombre}. El ejercicio está resuelto sin errores, lo cual demuestra tu dedicación y comprensión del tema. Sigue adelante con ese nivel.",
-        "Gran resultado, {nombre}. El dominio del tema es evidente en cada una de tus respuestas. Tu esfuerzo y dedicación se reflejan en este trabajo.",
-        "Correcto en todos los puntos, {nombre}. Tu desempeño ha sido sobresaliente en este ejercicio. Sigue manteniendo ese nivel de excelencia.",
-        "Buen cierre del reto, {nombre}. Todas las respuestas son válidas y están correctamente fundamentadas. Felicidades por tu logro.",
-        "Excelente resolución, {nombre}. Cada conjunto está trabajado con precisión y demuestra tu comprensión clara del tema. Muy buen trabajo."
-    ]
-
-    mensajes_error = [
-        "Buen trabajo, {nombre}. Aunque hay algunos detalles que necesitan revisión. Por favor revisa y corrige los puntos señalados, luego reenvía tu trabajo.",
-        "Estás muy cerca del objetivo, {nombre}. Revisa con atención las operaciones que te señalo abajo y realiza los ajustes necesarios.",
-        "Tu avance es bueno, {nombre}, sin embargo hay algunas expresiones que requieren corrección. Te invito a revisar cuidadosamente cada inciso marcado.",
-        "Vamos por buen camino, {nombre}, pero algunos incisos necesitan revisión adicional. Analiza los puntos señalados y realiza las correcciones correspondientes.",
-        "Buen intento, {nombre}, aunque faltan algunos ajustes en ciertas expresiones. Revisa los incisos marcados y corrige según sea necesario.",
-        "Estás entendiendo el tema, {nombre}, pero hay algunos errores que necesitan corrección. Revisa con calma y ajusta donde sea necesario.",
-        "Revisa con atención los conjuntos indicados abajo, {nombre}. Con un poco más de cuidado puedes mejorar significativamente tu resultado.",
-        "Vamos por buen camino, {nombre}, pero aún hay algunas inconsistencias que resolver. Analiza cada punto señalado y realiza las correcciones.",
-        "Casi lo tienes completo, {nombre}. Corrige los puntos marcados como incorrectos y estarás listo. Ánimo, vas muy bien.",
-        "Un pequeño esfuerzo más, {nombre}, y tu trabajo estará perfecto. Revisa los detalles señalados y realiza los ajustes necesarios."
-    ]
-
-    EXPRESIONES_FIJAS = [
-        "B ∩ C = {1,2,13}",
-        "C′ = {3,5,8,9,12,14}",
-        "B ∪ C = {1,2,3,4,5,6,7,8,10,11,13}",
-        "A ∩ C = {2,4,6,10}",
-        "A′ = {1,3,5,7,9,11,13}",
-        "B – A = {1,3,5,13}",
-        "C – B′ = {1,2,13}"
-    ]
-
     tipos_archivo = ["docx"]
     if PDF_AVAILABLE:
         tipos_archivo.append("pdf")
 
+    en_segundo_plano = st.checkbox("⚙️ Calificar en segundo plano",
+                                   help="El lote sigue corriendo en el servidor aunque recargues la página o "
+                                        "cambies de sección; al terminar se muestra una tabla con todos los mensajes")
+    trazar = st.checkbox("🧭 Registrar traza de calificación",
+                         help="Guarda por inciso la estrategia que encontró la respuesta, "
+                              "las líneas y regex revisadas y el tiempo, para detectar documentos lentos o mal calificados")
+
+    with st.expander("🎲 Variantes por alumno"):
+        usar_variantes = st.checkbox("Calificar cada documento con la variante de su alumno",
+                                     help="A, B y C se sortean por alumno a partir de la semilla y el ID "
+                                          "de participante de Moodle (el número en el nombre del archivo)")
+        semilla = st.text_input("Semilla del grupo", value="R3MD", key="semilla_r3")
+        ids_texto = st.text_area("IDs de participante (uno por línea) para descargar sus variantes",
+                                 key="ids_variantes_r3")
+        ids_lista = [linea.strip() for linea in ids_texto.splitlines() if linea.strip()]
+        if ids_lista:
+            import pandas as pd
+            df_claves = pd.DataFrame(tabla_claves_r3md(generar_claves_r3md(ids_lista, semilla=semilla)))
+            st.dataframe(df_claves, use_container_width=True, hide_index=True)
+            st.download_button("📥 Descargar variantes (CSV)", df_claves.to_csv(index=False).encode('utf-8'),
+                               file_name=f"variantes_r3md_{semilla}.csv", mime="text/csv")
+
     with st.expander("📝 Ver expresiones predefinidas que se evaluarán"):
-        for i, expr in enumerate(EXPRESIONES_FIJAS):
-            conjunto_esp = extraer_conjunto_esperado(expr)
-            st.write(f"{chr(97+i)}) {expr} → Esperado: {{{', '.join(sorted(conjunto_esp, key=int))}}}")
+        expresiones, conjuntos_esperados = preparar_expresiones_r3md(EXPRESIONES_FIJAS)
+        for i, (expr, conjunto_esp) in enumerate(zip(expresiones, conjuntos_esperados)):
+            st.write(f"{chr(97+i)}) {expr} → Esperado: {formatear_conjunto(conjunto_esp)}")
 
     # ---- Carga de MÚLTIPLES documentos ----
     documentos_files = st.file_uploader(
@@ -840,16 +474,55 @@ def mostrar_r3md():
         st.markdown("---")
         st.subheader(f"📂 {len(documentos_files)} documento(s) cargado(s) — Resultados individuales")
 
+        claves = {}
+        if usar_variantes:
+            ids_archivos = {f.name: id_alumno_desde_archivo(f.name) for f in documentos_files}
+            claves = generar_claves_r3md([i for i in ids_archivos.values() if i], semilla=semilla)
+            sin_id = [nombre for nombre, id_alumno in ids_archivos.items() if not id_alumno]
+            if sin_id:
+                st.warning(f"⚠️ Sin ID de participante en el nombre, se califican con las expresiones fijas: "
+                           f"{', '.join(sin_id)}")
+
+        if en_segundo_plano:
+            if st.button("🚀 Calificar lote en segundo plano", type="primary"):
+                elementos = [(f.name, f.getvalue(), claves.get(id_alumno_desde_archivo(f.name) or ""))
+                             for f in documentos_files]
+                trabajo = enviar_lote(
+                    "r3md", f"{len(elementos)} documento(s) de R3MD", elementos,
+                    lambda elemento: fila_calificacion_r3md(*elemento, MENSAJES_EXITO_R3, MENSAJES_ERROR_R3),
+                    al_terminar=similares_lote_r3md,
+                    omitir=('texto',),
+                    punto_control=PuntoControl("r3md"),
+                    clave_de=lambda elemento: huella_documento_r3md(*elemento)
+                )
+                st.session_state['trabajo_r3'] = trabajo.id
+                st.rerun()
+            documentos_files = []
+
+    trabajo = seguir_trabajo("r3md", "trabajo_r3")
+    if trabajo is not None:
+        mostrar_lote_r3md(trabajo)
+
+    if documentos_files:
         etiquetas = [f.name[:35] for f in documentos_files]
         tabs = st.tabs(etiquetas)
 
+        textos = {}
         for idx, (tab, doc_file) in enumerate(zip(tabs, documentos_files)):
             with tab:
                 st.markdown(f"#### 📄 {doc_file.name}")
-                procesar_documento_r3md(
-                    doc_file, idx, EXPRESIONES_FIJAS,
-                    mensajes_exito, mensajes_error
-                )
+                with rendimiento.etapa("r3md.documento", doc_file.size):
+                    textos[doc_file.name] = procesar_documento_r3md(
+                        doc_file, idx, EXPRESIONES_FIJAS,
+                        MENSAJES_EXITO_R3, MENSAJES_ERROR_R3, trazar,
+                        claves.get(id_alumno_desde_archivo(doc_file.name) or "")
+                    )
+        if len(textos) > 1:
+            mostrar_similitud_r3md({nombre: texto for nombre, texto in textos.items() if texto})
+        rendimiento.registrar_en_log("R3MD")
+
+        if trazar:
+            mostrar_trazas_r3md()
 
         # Botón para limpiar y empezar de nuevo
         st.markdown("---")
@@ -858,414 +531,85 @@ def mostrar_r3md():
             if st.button("🗑️ Limpiar y cargar nuevos archivos", type="secondary",
                          use_container_width=True):
                 st.session_state['uploader_counter_r3'] += 1
+                st.session_state.pop('trazas_r3', None)
                 st.rerun()
 
+# ==================== R4MD - PROPOSICIONES LÓGICAS ====================
 
-HISTORIAL_FILE_R4 = "historial_calificaciones_r4.json"
-
-def cargar_historial_r4():
-    """Carga el historial de alumnos ya calificados"""
-    if os.path.exists(HISTORIAL_FILE_R4):
-        with open(HISTORIAL_FILE_R4, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
-
-def guardar_historial_r4(historial):
-    """Guarda el historial de alumnos calificados"""
-    with open(HISTORIAL_FILE_R4, 'w', encoding='utf-8') as f:
-        json.dump(historial, f, ensure_ascii=False, indent=2)
-
-def similitud_nombres(nombre1, nombre2):
-    """Calcula la similitud entre dos nombres usando SequenceMatcher"""
-    return SequenceMatcher(None, nombre1.upper(), nombre2.upper()).ratio()
-
-def extraer_participaciones_html(html_content):
-    """Extrae las participaciones del HTML del foro"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    participaciones = []
-    
-    # Buscar todos los artículos del foro con ID que empiece con 'p' seguido de números
-    articles = soup.find_all('article', id=re.compile(r'^p\d+'))
-    
-    for article in articles:
-        try:
-            # Buscar el address con clase author
-            author_address = article.find('address', class_='author')
-            if not author_address:
-                continue
-            
-            # Extraer el link del autor
-            author_link = author_address.find('a', href=re.compile(r'user/view\.php'))
-            if not author_link:
-                continue
-                
-            nombre_completo = author_link.get_text().strip()
-            
-            # Separar nombre en partes
-            partes = nombre_completo.split()
-            if len(partes) < 2:
-                continue
-                
-            primer_nombre = partes[0]
-            segundo_nombre = partes[1] if len(partes) > 1 else ""
-            
-            # Extraer apellidos (asumiendo que son las últimas palabras del nombre completo)
-            # Típicamente: Primer_Nombre Segundo_Nombre Apellido1 Apellido2
-            apellidos = " ".join(partes[2:]) if len(partes) > 2 else ""
-            
-            # Extraer fecha
-            time_tag = author_address.find('time')
-            fecha = time_tag.get('datetime', '') if time_tag else ''
-            
-            # Buscar el contenido en la estructura: div.content > div.posting
-            content_div = article.find('div', class_='content')
-            if not content_div:
-                continue
-            
-            posting_div = content_div.find('div', class_='posting')
-            if not posting_div:
-                continue
-            
-            # Extraer todo el texto del contenido
-            contenido = posting_div.get_text(separator=' ', strip=True)
-            
-            # Filtrar contenido muy corto o vacío
-            if contenido and len(contenido) > 50:
-                participaciones.append({
-                    'nombre_completo': nombre_completo,
-                    'primer_nombre': primer_nombre,
-                    'segundo_nombre': segundo_nombre,
-                    'apellidos': apellidos,
-                    'fecha': fecha,
-                    'contenido': contenido
-                })
-                
-        except Exception as e:
-            # Silenciosamente continuar con el siguiente
-            continue
-    
-    return participaciones
-
-def buscar_alumno_en_excel(df, nombre_completo_html, primer_nombre, segundo_nombre, apellidos):
-    """
-    Busca un alumno en el DataFrame del Excel con validación mejorada
-    Compara el nombre completo del HTML con el nombre completo del Excel (Nombre + Apellido(s))
-    """
-    # Normalizar el nombre completo del HTML
-    nombre_completo_html_upper = nombre_completo_html.upper().strip()
-    primer_nombre_upper = primer_nombre.upper().strip()
-    segundo_nombre_upper = segundo_nombre.upper().strip()
-    apellidos_upper = apellidos.upper().strip()
-    
-    mejor_match = None
-    mejor_similitud = 0.0
-    umbral_similitud = 0.75  # Umbral de similitud mínimo (75%)
-    
-    # Iterar sobre todos los registros del Excel
-    for idx, row in df.iterrows():
-        # Construir nombre completo del Excel
-        nombre_excel = str(row['Nombre']).strip()
-        apellido_excel = str(row['Apellido(s)']).strip() if 'Apellido(s)' in row else ""
-        nombre_completo_excel = f"{nombre_excel} {apellido_excel}".upper().strip()
-        
-        # Método 1: Coincidencia exacta de nombre completo
-        if nombre_completo_html_upper == nombre_completo_excel:
-            return idx
-        
-        # Método 2: Calcular similitud del nombre completo
-        similitud = similitud_nombres(nombre_completo_html, nombre_completo_excel)
-        if similitud > mejor_similitud:
-            mejor_similitud = similitud
-            mejor_match = idx
-        
-        # Método 3: Verificación específica - nombre y al menos un apellido coinciden
-        if primer_nombre_upper in nombre_excel.upper():
-            # Si tenemos apellidos, verificar que al menos uno coincida
-            if apellidos_upper:
-                apellidos_html_lista = apellidos_upper.split()
-                apellidos_excel_lista = apellido_excel.upper().split()
-                
-                # Verificar si hay coincidencia de apellidos
-                coincidencia_apellido = any(
-                    ap_html in ap_excel or ap_excel in ap_html 
-                    for ap_html in apellidos_html_lista 
-                    for ap_excel in apellidos_excel_lista
-                )
-                
-                # Si hay coincidencia de primer nombre Y apellido, es un match fuerte
-                if coincidencia_apellido:
-                    # Calcular similitud para este caso específico
-                    similitud_especifica = similitud_nombres(nombre_completo_html, nombre_completo_excel)
-                    if similitud_especifica > mejor_similitud:
-                        mejor_similitud = similitud_especifica
-                        mejor_match = idx
-    
-    # Retornar el mejor match solo si supera el umbral de similitud
-    if mejor_similitud >= umbral_similitud:
-        return mejor_match
-    
-    return None
-
-def limpiar_texto_para_moodle(texto):
+def calificar_lote_r4(df, participaciones, curso, actividad, marca, al_avanzar=None, cancelado=None):
     """
-    Limpia el texto para que sea compatible con Moodle.
-    Remueve caracteres problemáticos y normaliza el texto.
+    Califica un lote del foro y guarda el historial y la marca del curso y actividad.
+    Retorna un dict (JSON) con lo que muestran las pestañas, así sirve igual para el
+    procesamiento directo que para un trabajo en segundo plano.
+    Cada participación calculada queda en un punto de control hasta que se guarda el
+    historial: si el lote se interrumpe, volver a procesarlo retoma desde ahí.
+    Si cancelado() retorna True (trabajo cancelado) el lote se detiene y retorna None
+    sin guardar historial, marca ni publicaciones y sin borrar el punto de control.
     """
-    import unicodedata
-    
-    # Normalizar caracteres Unicode (convierte acentos a forma estándar)
-    texto = unicodedata.normalize('NFKD', texto)
-    
-    # Remover caracteres de control y no imprimibles
-    texto = ''.join(char for char in texto if unicodedata.category(char)[0] != 'C')
-    
-    # Reemplazar comillas especiales por comillas simples
-    texto = texto.replace('"', '"').replace('"', '"')
-    texto = texto.replace(''', "'").replace(''', "'")
-    
-    # Remover saltos de línea múltiples
-    while '  ' in texto:
-        texto = texto.replace('  ', ' ')
-    
-    # Asegurar que no hay caracteres especiales problemáticos
-    texto = texto.strip()
-    
-    return texto
-
-def generar_retroalimentacion_r4(nombre_completo, primer_nombre, contenido):
-    """Genera retroalimentación personalizada basada en el contenido"""
-    
-    contenido_lower = contenido.lower()
-    comentarios = []
-    
-    # === SALUDOS INICIALES VARIADOS ===
-    saludos_iniciales = [
-        f"Excelente participación, {primer_nombre}.",
-        f"Muy bien, {primer_nombre}, tu aportación es valiosa.",
-        f"Felicidades, {primer_nombre}, excelente trabajo.",
-        f"{primer_nombre}, tu participación demuestra dedicación.",
-        f"Hola {primer_nombre}, que buena contribución al foro.",
-        f"Muy buena aportación, {primer_nombre}.",
-        f"Gracias por tu participación, {primer_nombre}.",
-        f"{primer_nombre}, tu trabajo refleja compromiso con el tema."
-    ]
-    comentarios.append(random.choice(saludos_iniciales))
-    
-    # === PRESENTACIÓN (variaciones) ===
-    if any(palabra in contenido_lower for palabra in ["mi nombre es", "me presento", "soy", "tengo", "buenas", "hola", "saludos"]):
-        frases_presentacion = [
-            "Me encantó tu presentación al inicio, es importante conocernos.",
-            "Tu presentación fue muy cordial y apropiada.",
-            "Agradezco tu presentación, eso fortalece nuestra comunidad de aprendizaje.",
-            "Me gustó como te presentaste, es valioso saber quien esta detrás de cada participación.",
-            "Tu saludo inicial fue muy amable y profesional.",
-            "La manera en que te presentaste fue excelente.",
-            "Tu introducción personal aporta calidez al foro."
-        ]
-        if random.random() < 0.85:  # 85% de probabilidad
-            comentarios.append(random.choice(frases_presentacion))
-    
-    # === PROPOSICIONES SIMPLES (variaciones) ===
-    if any(palabra in contenido_lower for palabra in ["proposición lógica simple", "proposiciones simples", "proposición simple", "proposición atómica", "atómica"]):
-        frases_simples = [
-            "Tus definiciones sobre proposiciones lógicas simples son muy claras y precisas.",
-            "Explicaste de manera excelente que es una proposición simple.",
-            "Tu comprensión de las proposiciones atómicas es evidente y bien fundamentada.",
-            "Las proposiciones simples quedaron muy bien explicadas en tu aporte.",
-            "Demuestras claridad al definir las proposiciones lógicas simples.",
-            "Tu explicacion sobre proposiciones simples es clara y correcta.",
-            "El concepto de proposición simple esta muy bien desarrollado.",
-            "Tus definiciones de proposiciones atómicas son precisas y completas."
-        ]
-        if random.random() < 0.9:  # 90% de probabilidad
-            comentarios.append(random.choice(frases_simples))
-    
-    # === PROPOSICIONES COMPUESTAS (variaciones) ===
-    if any(palabra in contenido_lower for palabra in ["proposición lógica compuesta", "proposiciones compuestas", "proposición compuesta", "molecular"]):
-        frases_compuestas = [
-            "Explicaste muy bien las proposiciones compuestas y el uso de conectores lógicos.",
-            "Tu análisis de las proposiciones moleculares es correcto y detallado.",
-            "Las proposiciones compuestas están bien desarrolladas en tu participación.",
-            "Comprendes claramente como se forman las proposiciones compuestas.",
-            "Excelente explicación sobre proposiciones compuestas y sus conectivos.",
-            "Tu manejo de las proposiciones compuestas refleja buen estudio del tema.",
-            "Las proposiciones moleculares fueron abordadas con precisión.",
-            "Tu comprensión de como combinar proposiciones es notable."
-        ]
-        if random.random() < 0.9:  # 90% de probabilidad
-            comentarios.append(random.choice(frases_compuestas))
-    
-    # === CANTIDAD Y CALIDAD DE EJEMPLOS ===
-    num_puntos = contenido.count(".")
-    if num_puntos > 15:
-        frases_ejemplos_muchos = [
-            "Los ejemplos que compartiste son muy variados y demuestran una comprensión profunda del tema.",
-            "Tu aportación incluye numerosos ejemplos que enriquecen la discusión.",
-            "La cantidad de ejemplos que proporcionaste refleja tu dedicación al tema.",
-            "Tus múltiples ejemplos ayudan a comprender mejor los conceptos.",
-            "La diversidad de ejemplos en tu participación es impresionante.",
-            "Has proporcionado una excelente variedad de ejemplos ilustrativos."
-        ]
-        comentarios.append(random.choice(frases_ejemplos_muchos))
-    elif num_puntos > 10:
-        frases_ejemplos_buenos = [
-            "Los ejemplos que compartiste son apropiados y claros.",
-            "Tus ejemplos ilustran bien los conceptos explicados.",
-            "Proporcionaste buenos ejemplos que ayudan a la comprensión.",
-            "Los ejemplos que incluiste son pertinentes y útiles.",
-            "Tus ejemplos son claros y bien elegidos.",
-            "Los casos que presentaste facilitan el entendimiento."
-        ]
-        if random.random() < 0.8:  # 80% de probabilidad
-            comentarios.append(random.choice(frases_ejemplos_buenos))
-    
-    # === CONECTORES LÓGICOS (variaciones) ===
-    conectores = [" y ", " o ", "si ", "entonces", "solo si", "si y solo si"]
-    conectores_encontrados = [c for c in conectores if c in contenido_lower]
-    if len(conectores_encontrados) >= 4:
-        frases_conectores_muchos = [
-            "Identificaste correctamente el uso de diversos conectores lógicos.",
-            "Tu manejo de los diferentes conectores lógicos es excelente.",
-            "Demuestras dominio de los conectivos lógicos fundamentales.",
-            "Aplicaste correctamente una gran variedad de conectores.",
-            "El uso que haces de los conectivos es muy apropiado.",
-            "Muestras buen dominio de los operadores lógicos."
-        ]
-        comentarios.append(random.choice(frases_conectores_muchos))
-    elif len(conectores_encontrados) >= 2:
-        frases_conectores_algunos = [
-            "Usaste apropiadamente varios conectores lógicos.",
-            "Los conectores lógicos estan bien aplicados en tus ejemplos.",
-            "Tu uso de conectivos es correcto y apropiado.",
-            "Los operadores lógicos fueron bien utilizados.",
-            "Tus conectores lógicos estan correctamente empleados."
-        ]
-        if random.random() < 0.75:  # 75% de probabilidad
-            comentarios.append(random.choice(frases_conectores_algunos))
-    
-    # === EJEMPLOS COTIDIANOS (variaciones) ===
-    if any(palabra in contenido_lower for palabra in ["celular", "llueve", "clase", "estudio", "trabajo", "examen", "computadora", "tierra", "sol", "luna", "agua", "auto", "carro", "casa", "familia", "comida", "perro", "gato", "telefono", "internet"]):
-        frases_cotidianas = [
-            "Me gusto que uses ejemplos de la vida cotidiana, eso facilita la comprensión.",
-            "Tus ejemplos cercanos a la realidad hacen el tema más accesible.",
-            "Usar situaciones cotidianas para ejemplificar es una excelente estratégia.",
-            "Los ejemplos de la vida diaria que elegiste son muy efectivos.",
-            "Aprecio que hayas relacionado el tema con situaciones cotidianas.",
-            "Tus ejemplos practicos ayudan a conectar la teoría con la realidad.",
-            "Es valioso que uses contextos familiares para explicar los conceptos.",
-            "Los ejemplos que tomaste de situaciones comunes son muy útiles."
-        ]
-        if random.random() < 0.85:  # 85% de probabilidad
-            comentarios.append(random.choice(frases_cotidianas))
-    
-    # === VALORES DE VERDAD (variaciones) ===
-    if any(palabra in contenido_lower for palabra in ["verdadero", "falso", "verdad", "valor de verdad"]):
-        frases_verdad = [
-            "Comprendes bien el concepto de valor de verdad en las proposiciones.",
-            "Tu análisis de los valores de verdad es correcto.",
-            "Demuestras claridad al evaluar la veracidad de las proposiciones.",
-            "El manejo de valores de verdad en tu trabajo es apropiado.",
-            "Tu comprensión sobre verdadero y falso en lógica es evidente.",
-            "Los valores de verdad fueron correctamente analizados.",
-            "Tu evaluación de proposiciones verdaderas y falsas es acertada."
-        ]
-        if random.random() < 0.8:  # 80% de probabilidad
-            comentarios.append(random.choice(frases_verdad))
-    
-    # === ESTRUCTURA Y ORGANIZACIÓN ===
-    if ":" in contenido or contenido.count("\n") > 5:
-        frases_organizacion = [
-            "Tu participación esta bien organizada y estructurada.",
-            "La manera en que organizaste tu información es clara.",
-            "Aprecio la estructura ordenada de tu aportación.",
-            "Tu trabajo muestra una buena organización de ideas."
-        ]
-        if random.random() < 0.6:  # 60% de probabilidad
-            comentarios.append(random.choice(frases_organizacion))
-    
-    # === PROFUNDIDAD DEL CONTENIDO ===
-    longitud_contenido = len(contenido)
-    if longitud_contenido > 1800:
-        frases_profundidad = [
-            "Tu análisis es profundo y completo.",
-            "La extensión y detalle de tu participación es destacable.",
-            "Tu desarrollo del tema es exhaustivo y bien estructurado.",
-            "La profundidad de tu aporte refleja un excelente estudio.",
-            "Tu trabajo demuestra una investigación seria del tema.",
-            "El nivel de detalle en tu participación es admirable."
-        ]
-        if random.random() < 0.7:  # 70% de probabilidad
-            comentarios.append(random.choice(frases_profundidad))
-    elif longitud_contenido > 1200:
-        frases_buen_desarrollo = [
-            "Tu desarrollo del tema es completo.",
-            "Tu aportación tiene un buen nivel de detalle.",
-            "El contenido que compartiste es sustancial."
-        ]
-        if random.random() < 0.5:  # 50% de probabilidad
-            comentarios.append(random.choice(frases_buen_desarrollo))
-    
-    # === MENSAJES FINALES MOTIVACIONALES (más variados) ===
-    mensajes_finales = [
-        "Tu comprensión del tema demuestra un excelente trabajo de estudio. Sigue así.",
-        "Tu participación refleja dedicación y esfuerzo. Muy bien.",
-        "Excelente trabajo, tu aportación enriquece el foro. Felicidades.",
-        "Tu análisis es muy completo y bien fundamentado. Continúa con ese nivel.",
-        "Demuestras dominio del tema. Excelente aportación.",
-        "Sigue participando con este nivel de calidad. Felicidades.",
-        "Tu esfuerzo es evidente y muy valorado. Excelente.",
-        "Continúa trabajando con esta dedicación. Muy bien hecho.",
-        "Tu aporte es significativo para el aprendizaje colectivo. Gracias.",
-        "Excelente nivel de análisis. Te felicito.",
-        "Tu compromiso con el tema es admirable. Adelante.",
-        "Muy buen trabajo. Sigue así.",
-        "Tu participación es de calidad. Felicidades.",
-        "Gracias por tu valiosa contribución.",
-        "Tu trabajo refleja profesionalismo. Excelente.",
-        "Felicidades por tu dedicación al tema.",
-        "Sigue con ese entusiasmo por aprender.",
-        "Tu aportación es muy valiosa para todos."
-    ]
-    
-    # Agregar mensaje final (75% de probabilidad para no ser tan predecible)
-    if random.random() < 0.75:
-        comentarios.append(random.choice(mensajes_finales))
-    
-    # Unir todos los comentarios con espacio
-    retroalimentacion = " ".join(comentarios)
-    
-    # Limpiar el texto para que sea compatible con Moodle
-    retroalimentacion = limpiar_texto_para_moodle(retroalimentacion)
-    
-    return retroalimentacion
-
-def buscar_columna_flexible(df, nombres_posibles):
-    """
-    Busca una columna de manera flexible, considerando diferentes variaciones de mayúsculas/minúsculas
-    y espacios
-    """
-    columnas_df = df.columns.tolist()
-    
-    for nombre_buscado in nombres_posibles:
-        # Búsqueda exacta
-        if nombre_buscado in columnas_df:
-            return nombre_buscado
-        
-        # Búsqueda insensible a mayúsculas/minúsculas
-        for col in columnas_df:
-            if col.lower() == nombre_buscado.lower():
-                return col
-        
-        # Búsqueda con normalización de espacios
-        nombre_normalizado = nombre_buscado.lower().strip()
-        for col in columnas_df:
-            col_normalizada = col.lower().strip()
-            if col_normalizada == nombre_normalizado:
-                return col
-    
-    return None
+    historial = cargar_historial_r4(curso, actividad)
+    cargado = dict(historial)
+    punto_control = punto_control_lote_r4(df, curso, actividad)
+    recuperados = punto_control.cantidad()
+    with rendimiento.etapa("r4md.lote"):
+        duplicados = marcar_duplicados_r4(participaciones, anteriores=cargar_publicaciones_r4(curso, actividad))
+        resultado = calificar_participaciones_r4(df, participaciones, historial, al_avanzar=al_avanzar,
+                                                 punto_control=punto_control, cancelado=cancelado)
+    if resultado.interrumpido:
+        return None
+    
+    # Guardar historial actualizado y la marca del foro
+    conflictos = guardar_historial_r4(historial, curso, actividad, cargado=cargado)
+    if marca is not None:
+        # Las publicaciones sin alumno en el Excel se vuelven a procesar la próxima vez
+        marca['pendientes'] = resultado.pendientes
+        guardar_marca_r4(marca, curso, actividad)
+    guardar_publicaciones_r4(participaciones, curso, actividad)
+    punto_control.borrar()
+    rendimiento.registrar_en_log("R4MD")
+    
+    df_resultados = resultado.df_resultados
+    return {
+        'filas': df_resultados.index.tolist(),
+        'registros': df_resultados.to_dict('records'),
+        'nuevos_calificados': resultado.nuevos_calificados,
+        'ya_calificados': resultado.ya_calificados,
+        'no_encontrados': resultado.no_encontrados,
+        'total_participaciones': resultado.total_participaciones,
+        'debug_info': resultado.debug_info,
+        'duplicados': duplicados,
+        'conflictos': conflictos,
+        'recuperados': recuperados,
+    }
+
+def aplicar_resultado_r4(datos):
+    """Pasa el resultado de calificar_lote_r4 a session_state (pestañas de resultados, historial y debug)"""
+    import pandas as pd
+    
+    if datos['conflictos']:
+        st.warning("⚠️ Otra sesión calificó al mismo tiempo a: " + ", ".join(datos['conflictos'])
+                   + ". En el historial se conservó su retroalimentación; revisa "
+                     "que no se publiquen dos mensajes.")
+    if datos.get('recuperados'):
+        st.info(f"♻️ {datos['recuperados']} participación(es) retomadas del punto de control "
+                "de una corrida interrumpida")
+    df_resultados = pd.DataFrame(datos['registros'], index=datos['filas'], columns=['Nombre', 'Retroalimentación'])
+    st.session_state['df_resultados_r4'] = df_resultados
+    st.session_state['exportaciones_r4'] = construir_exportaciones_r4(df_resultados)
+    # Excel del que salen estos resultados (para escribir el libro de Moodle)
+    st.session_state['libro_origen_r4'] = st.session_state.get('excel_bytes_r4')
+    st.session_state['columna_origen_r4'] = (st.session_state.get('columna_calificacion_excel_r4')
+                                             or COLUMNA_CALIFICACION_R4)
+    st.session_state.pop('libro_moodle_r4', None)
+    st.session_state['nuevos_calificados_r4'] = datos['nuevos_calificados']
+    st.session_state['ya_calificados_r4'] = datos['ya_calificados']
+    st.session_state['no_encontrados_r4'] = datos['no_encontrados']
+    st.session_state['total_participaciones_r4'] = datos['total_participaciones']
+    st.session_state['debug_info_r4'] = datos['debug_info']
+    st.session_state['duplicados_r4'] = datos['duplicados']
 
 def mostrar_r4md():
+    import pandas as pd
+    
     st.title("🧠 R4MD - Proposiciones Lógicas")
     
     # Tabs para organizar mejor el contenido
@@ -1280,16 +624,43 @@ def mostrar_r4md():
         with st.sidebar:
             st.header("⚙️ Configuración")
             
-            # Opción para limpiar historial
-            if st.button("🗑️ Limpiar Historial", help="Elimina el registro de alumnos ya calificados"):
-                if os.path.exists(HISTORIAL_FILE_R4):
-                    os.remove(HISTORIAL_FILE_R4)
-                    st.success("Historial eliminado")
-                    st.rerun()
+            # Curso y actividad: cada par tiene su propio historial y marca del foro
+            curso = st.text_input("🏫 Curso / grupo", value=CURSO_PREDETERMINADO_R4, key="curso_r4")
+            actividad = st.text_input("📝 Actividad (columna de calificación)", value=COLUMNA_CALIFICACION_R4,
+                                      key="actividad_r4")
+            otras = [p for p in particiones_r4() if (p['curso'], p['actividad']) != (curso, actividad)]
+            if otras:
+                with st.expander(f"📚 Otros historiales ({len(otras)})"):
+                    for particion in otras:
+                        st.caption(f"{particion['curso']} — {particion['actividad']}: "
+                                   f"{particion['alumnos']} alumnos ({particion['actualizado']})")
+            
+            # Opción para limpiar historial (compartido con los demás tutores del servidor)
+            confirmar_limpieza = st.checkbox("Confirmo vaciar este historial para todos los tutores",
+                                             key="confirmar_limpieza_r4")
+            if st.button("🗑️ Limpiar Historial", disabled=not confirmar_limpieza,
+                         help="Vacía el registro de alumnos ya calificados de este curso y actividad "
+                              "y reinicia la marca del foro (se conserva una copia .bak)"):
+                borrar_historial_r4(curso, actividad)
+                st.success("Historial eliminado")
+                st.rerun()
             
             # Mostrar estadísticas del historial
-            historial = cargar_historial_r4()
-            st.metric("Alumnos en historial", len(historial))
+            st.metric("Alumnos en historial", contar_historial_r4(curso, actividad))
+            
+            # Procesamiento incremental del foro
+            solo_nuevas = st.checkbox("⏩ Solo participaciones nuevas", value=True, key="solo_nuevas_r4",
+                                      help="Omite las publicaciones anteriores a la última procesada; "
+                                           "útil al subir cada semana la exportación completa del foro")
+            marca_guardada = cargar_marca_r4(curso, actividad)
+            if marca_guardada.get('fecha'):
+                st.caption(f"Última publicación procesada: {marca_guardada['fecha']}")
+                if marca_guardada.get('pendientes'):
+                    st.caption(f"{len(marca_guardada['pendientes'])} publicación(es) sin alumno en el Excel "
+                               "se vuelven a procesar en la próxima carga")
+                if st.button("🔄 Reiniciar marca del foro", help="La próxima carga procesa todo el foro"):
+                    borrar_marca_r4(curso, actividad)
+                    st.rerun()
             
             st.markdown("---")
             st.markdown("### 📋 Requisitos del foro")
@@ -1331,15 +702,29 @@ def mostrar_r4md():
                 if excel_file:
                     st.success("✅ Archivo Excel cargado")
                     try:
-                        df = pd.read_excel(excel_file)
-                        st.session_state['df_excel_r4'] = df
+                        # Cada rerun trae el mismo archivo: se lee solo si cambió (o cambió la actividad)
+                        huella_excel = huella(excel_file.getvalue(), actividad)
+                        if st.session_state.get('huella_excel_r4') != huella_excel:
+                            st.session_state.pop('huella_excel_r4', None)
+                            df, columnas_excel, _ = cargar_excel_proyectado(excel_file, {
+                                'Nombre': ['Nombre'],
+                                'Apellido(s)': ['Apellido(s)'],
+                                COLUMNA_CALIFICACION_R4: [actividad]
+                            })
+                            # Usar los nombres canónicos aunque en el archivo varíen mayúsculas/espacios
+                            df = df.rename(columns={real: clave for clave, real in columnas_excel.items() if real})
+                            st.session_state['df_excel_r4'] = df
+                            st.session_state['columna_calificacion_excel_r4'] = columnas_excel[COLUMNA_CALIFICACION_R4]
+                            st.session_state['excel_bytes_r4'] = excel_file.getvalue()
+                            st.session_state['huella_excel_r4'] = huella_excel
+                        df = st.session_state['df_excel_r4']
                         st.info(f"📊 Total de alumnos: {len(df)}")
                         
                         # Verificar que exista la columna necesaria
-                        if 'Tarea:R4. Proposiciones lógicas (Real)' in df.columns:
+                        if COLUMNA_CALIFICACION_R4 in df.columns:
                             st.success("✅ Columna de calificaciones encontrada")
                         else:
-                            st.error("❌ No se encontró la columna 'Tarea:R4. Proposiciones lógicas (Real)'")
+                            st.error(f"❌ No se encontró la columna '{actividad}'")
                         
                         # Verificar columnas de nombre y apellido
                         if 'Nombre' in df.columns and 'Apellido(s)' in df.columns:
@@ -1350,8 +735,8 @@ def mostrar_r4md():
                         # Mostrar preview
                         with st.expander("Ver preview del Excel"):
                             cols_preview = ['Nombre', 'Apellido(s)']
-                            if 'Tarea:R4. Proposiciones lógicas (Real)' in df.columns:
-                                cols_preview.append('Tarea:R4. Proposiciones lógicas (Real)')
+                            if COLUMNA_CALIFICACION_R4 in df.columns:
+                                cols_preview.append(COLUMNA_CALIFICACION_R4)
                             st.dataframe(df[cols_preview].head(10))
                     except Exception as e:
                         st.error(f"Error al leer el Excel: {e}")
@@ -1368,22 +753,33 @@ def mostrar_r4md():
                 if html_file:
                     st.success("✅ Archivo HTML cargado")
                     try:
-                        html_content = html_file.read().decode('utf-8')
-                        participaciones = extraer_participaciones_html(html_content)
-                        
-                        # Guardar en session_state
-                        st.session_state['participaciones_r4'] = participaciones
-                        st.session_state['html_cargado_r4'] = True
+                        # La marca se guarda hasta que el lote se califica
+                        marca = cargar_marca_r4(curso, actividad) if solo_nuevas else None
+                        # Se vuelve a extraer solo si cambió el archivo o la marca
+                        huella_html = huella(html_file.getvalue(), json.dumps(marca, sort_keys=True, default=str))
+                        if st.session_state.get('huella_html_r4') != huella_html:
+                            st.session_state.pop('huella_html_r4', None)
+                            html_content = html_file.getvalue().decode('utf-8')
+                            
+                            # Guardar en session_state
+                            st.session_state['participaciones_r4'] = extraer_participaciones_html(html_content, marca)
+                            st.session_state['marca_r4'] = marca
+                            st.session_state['html_cargado_r4'] = True
+                            st.session_state['huella_html_r4'] = huella_html
+                        participaciones = st.session_state['participaciones_r4']
                         
-                        st.info(f"💬 Participaciones encontradas: {len(participaciones)}")
+                        if marca is not None:
+                            st.info(f"💬 Participaciones nuevas desde la última calificación: {len(participaciones)}")
+                        else:
+                            st.info(f"💬 Participaciones encontradas: {len(participaciones)}")
                         
                         # Mostrar preview
                         with st.expander("Ver preview de participaciones"):
                             if len(participaciones) > 0:
                                 for i, p in enumerate(participaciones[:5]):
-                                    st.markdown(f"**{p['nombre_completo']}**")
-                                    st.caption(f"Primer nombre: {p['primer_nombre']} | Segundo nombre: {p['segundo_nombre']} | Apellidos: {p['apellidos']}")
-                                    st.caption(f"Contenido: {p['contenido'][:150]}...")
+                                    st.markdown(f"**{p.nombre_completo}**")
+                                    st.caption(f"Primer nombre: {p.primer_nombre} | Segundo nombre: {p.segundo_nombre} | Apellidos: {p.apellidos}")
+                                    st.caption(f"Contenido: {p.contenido[:150]}...")
                                     if i < min(len(participaciones) - 1, 4):
                                         st.markdown("---")
                             else:
@@ -1402,117 +798,47 @@ def mostrar_r4md():
                                st.session_state.get('html_cargado_r4', False))
             
             if archivos_listos:
+                en_segundo_plano = st.checkbox(
+                    "⚙️ Procesar en segundo plano", key="segundo_plano_r4",
+                    help="El lote sigue corriendo en el servidor aunque recargues la página; "
+                         "los resultados aparecen en las pestañas al terminar")
                 if st.button("🚀 Procesar y Generar Retroalimentaciones", type="primary", use_container_width=True):
+                    # Obtener datos de session_state
+                    df = st.session_state['df_excel_r4']
+                    participaciones = st.session_state['participaciones_r4']
+                    marca = st.session_state.get('marca_r4')
+                    
+                    if len(participaciones) == 0:
+                        st.error("❌ No se encontraron participaciones para procesar.")
+                        st.stop()
+                    
+                    if en_segundo_plano:
+                        trabajo = enviar_trabajo(
+                            "r4md", f"{curso} — {actividad}: {len(participaciones)} participaciones",
+                            len(participaciones),
+                            lambda trabajo: calificar_lote_r4(df, participaciones, curso, actividad, marca,
+                                                              al_avanzar=lambda i, total, p: trabajo.avanzar(),
+                                                              cancelado=lambda: trabajo.cancelado)
+                        )
+                        st.session_state['trabajo_r4'] = trabajo.id
+                        st.rerun()
+                    
                     with st.spinner("Procesando participaciones..."):
                         try:
-                            # Obtener datos de session_state
-                            df = st.session_state['df_excel_r4']
-                            participaciones = st.session_state['participaciones_r4']
-                            
-                            if len(participaciones) == 0:
-                                st.error("❌ No se encontraron participaciones para procesar.")
-                                st.stop()
-                            
-                            # Cargar historial
-                            historial = cargar_historial_r4()
-                            
-                            # Crear DataFrame de resultados
-                            resultados = []
-                            nuevos_calificados = 0
-                            ya_calificados = 0
-                            no_encontrados = 0
-                            
-                            # Para debug: guardar información de matching
-                            debug_info = []
-                            
                             # Procesar cada participación
                             progress_bar = st.progress(0)
                             status_text = st.empty()
                             
-                            for i, p in enumerate(participaciones):
-                                progress_bar.progress((i + 1) / len(participaciones))
-                                status_text.text(f"Procesando: {p['nombre_completo']}")
-                                
-                                # Buscar alumno en Excel con validación mejorada
-                                idx = buscar_alumno_en_excel(
-                                    df, 
-                                    p['nombre_completo'],
-                                    p['primer_nombre'], 
-                                    p['segundo_nombre'],
-                                    p['apellidos']
-                                )
-                                
-                                if idx is not None:
-                                    nombre_excel = str(df.loc[idx, 'Nombre'])
-                                    apellido_excel = str(df.loc[idx, 'Apellido(s)'])
-                                    nombre_completo_excel = f"{nombre_excel} {apellido_excel}"
-                                    primer_nombre_excel = nombre_excel.split()[0]  # Extraer primer nombre
-                                    calificacion_actual = df.loc[idx, 'Tarea:R4. Proposiciones lógicas (Real)']
-                                    
-                                    # Guardar info de debug
-                                    similitud = similitud_nombres(p['nombre_completo'], nombre_completo_excel)
-                                    debug_info.append({
-                                        'HTML': p['nombre_completo'],
-                                        'Excel': nombre_completo_excel,
-                                        'Similitud': f"{similitud:.2%}",
-                                        'Match': '✅'
-                                    })
-                                    
-                                    # Verificar si tiene "-" (sin calificar)
-                                    necesita_calificacion = (pd.isna(calificacion_actual) or 
-                                                            str(calificacion_actual).strip() == "-" or 
-                                                            str(calificacion_actual).strip() == "")
-                                    
-                                    # Verificar si ya está en historial
-                                    en_historial = nombre_completo_excel in historial
-                                    
-                                    if necesita_calificacion and not en_historial:
-                                        # Generar retroalimentación con nombre completo y primer nombre
-                                        retroalimentacion = generar_retroalimentacion_r4(nombre_completo_excel, primer_nombre_excel, p['contenido'])
-                                        
-                                        # Agregar al historial
-                                        historial[nombre_completo_excel] = {
-                                            'fecha': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                            'retroalimentacion': retroalimentacion
-                                        }
-                                        
-                                        resultados.append({
-                                            'Nombre': nombre_completo_excel,
-                                            'Retroalimentación': retroalimentacion
-                                        })
-                                        
-                                        nuevos_calificados += 1
-                                    else:
-                                        ya_calificados += 1
-                                else:
-                                    no_encontrados += 1
-                                    debug_info.append({
-                                        'HTML': p['nombre_completo'],
-                                        'Excel': 'No encontrado',
-                                        'Similitud': 'N/A',
-                                        'Match': '❌'
-                                    })
+                            def al_avanzar(i, total, p):
+                                progress_bar.progress((i + 1) / total)
+                                status_text.text(f"Procesando: {p.nombre_completo}")
+                            
+                            datos = calificar_lote_r4(df, participaciones, curso, actividad, marca, al_avanzar)
                             
                             progress_bar.empty()
                             status_text.empty()
                             
-                            # Guardar historial actualizado
-                            guardar_historial_r4(historial)
-                            
-                            # Crear DataFrame de resultados
-                            if resultados:
-                                df_resultados = pd.DataFrame(resultados)
-                            else:
-                                df_resultados = pd.DataFrame(columns=['Nombre', 'Retroalimentación'])
-                            
-                            # Guardar en session_state
-                            st.session_state['df_resultados_r4'] = df_resultados
-                            st.session_state['nuevos_calificados_r4'] = nuevos_calificados
-                            st.session_state['ya_calificados_r4'] = ya_calificados
-                            st.session_state['no_encontrados_r4'] = no_encontrados
-                            st.session_state['total_participaciones_r4'] = len(participaciones)
-                            st.session_state['debug_info_r4'] = debug_info
-                            
+                            aplicar_resultado_r4(datos)
                             st.success(f"✅ Procesamiento completado!")
                             st.balloons()
                             
@@ -1522,6 +848,13 @@ def mostrar_r4md():
                             st.code(traceback.format_exc())
             else:
                 st.info("👆 Por favor, carga ambos archivos (Excel y HTML) para continuar")
+            
+            # Lote en segundo plano: sus resultados se pasan a las pestañas una sola vez
+            trabajo = seguir_trabajo("r4md", "trabajo_r4")
+            if trabajo is not None and st.session_state.get('trabajo_r4_aplicado') != trabajo.id:
+                aplicar_resultado_r4(trabajo.resultado)
+                st.session_state['trabajo_r4_aplicado'] = trabajo.id
+                st.success("✅ Procesamiento en segundo plano completado")
         
         with tab2:
             st.header("Resultados del Procesamiento")
@@ -1555,29 +888,66 @@ def mostrar_r4md():
                     st.markdown("---")
                     st.subheader("💬 Detalle de Retroalimentaciones")
                     
-                    for idx, row in df_resultado.iterrows():
-                        with st.expander(f"👤 {row['Nombre']}"):
-                            st.info(row['Retroalimentación'])
+                    for nombre, retro in zip(df_resultado['Nombre'], df_resultado['Retroalimentación']):
+                        with st.expander(f"👤 {nombre}"):
+                            st.info(retro)
+                    
+                    # Salidas precalculadas al procesar (se reconstruyen solo si faltan)
+                    if 'exportaciones_r4' not in st.session_state:
+                        st.session_state['exportaciones_r4'] = construir_exportaciones_r4(df_resultado)
+                    exportaciones = st.session_state['exportaciones_r4']
                     
                     # Botón de descarga
                     st.markdown("---")
                     st.subheader("💾 Descargar Resultados")
                     
-                    # Preparar archivo para descarga
-                    output = io.BytesIO()
-                    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                        df_resultado.to_excel(writer, index=False, sheet_name='Retroalimentaciones')
-                    output.seek(0)
-                    
                     st.download_button(
                         label="📥 Descargar Excel con Retroalimentaciones",
-                        data=output,
+                        data=exportaciones['excel'],
                         file_name=f"Retroalimentaciones_R4_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                         type="primary",
                         use_container_width=True
                     )
                     
+                    # Libro de calificaciones listo para importar en Moodle
+                    if st.session_state.get('libro_origen_r4'):
+                        st.markdown("---")
+                        st.subheader("📤 Libro de Calificaciones para Moodle")
+                        st.caption("Copia del Excel original con las retroalimentaciones escritas en las filas de cada alumno. Las demás columnas no se modifican.")
+                        
+                        escribir_calificacion = st.checkbox(
+                            "Escribir también la calificación",
+                            value=False,
+                            key="escribir_calificacion_r4"
+                        )
+                        calificacion = None
+                        if escribir_calificacion:
+                            calificacion = st.number_input(
+                                "Calificación a asignar:",
+                                min_value=0.0, value=100.0, step=1.0,
+                                key="calificacion_libro_r4"
+                            )
+                        
+                        # Se genera una sola vez por procesamiento y calificación elegida
+                        libro_cache = st.session_state.get('libro_moodle_r4')
+                        if libro_cache is None or libro_cache[0] != calificacion:
+                            libro_bytes = exportar_libro_moodle_r4(
+                                st.session_state['libro_origen_r4'],
+                                df_resultado,
+                                st.session_state.get('columna_origen_r4', COLUMNA_CALIFICACION_R4),
+                                calificacion
+                            )
+                            st.session_state['libro_moodle_r4'] = (calificacion, libro_bytes)
+                        
+                        st.download_button(
+                            label="📥 Descargar libro de calificaciones para Moodle",
+                            data=st.session_state['libro_moodle_r4'][1],
+                            file_name=f"Calificaciones_Moodle_R4_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                            use_container_width=True
+                        )
+                    
                     # Sección de texto plano para Moodle
                     st.markdown("---")
                     st.subheader("📋 Texto Plano para Moodle")
@@ -1586,15 +956,7 @@ def mostrar_r4md():
                     y pégalo directamente en Moodle. Este formato está limpio y no causará errores de JSON.
                     """)
                     
-                    # Crear formato de texto plano
-                    texto_plano = ""
-                    for idx, row in df_resultado.iterrows():
-                        nombre = row['Nombre']
-                        retro = row['Retroalimentación']
-                        
-                        texto_plano += f"{nombre}\n"
-                        texto_plano += f"{retro}\n"
-                        texto_plano += "\n" + "="*80 + "\n\n"
+                    texto_plano = exportaciones['texto_plano']
                     
                     # Mostrar en un text_area para fácil copiado
                     st.text_area(
@@ -1623,9 +985,7 @@ def mostrar_r4md():
                     st.subheader("📝 Formato Simple (Alternativo)")
                     st.caption("Si el formato anterior causa problemas, usa este formato más simple:")
                     
-                    texto_simple = ""
-                    for idx, row in df_resultado.iterrows():
-                        texto_simple += f"{row['Nombre']}: {row['Retroalimentación']}\n\n"
+                    texto_simple = exportaciones['texto_simple']
                     
                     st.text_area(
                         "Texto simple sin formato:",
@@ -1654,8 +1014,9 @@ def mostrar_r4md():
         
         with tab3:
             st.header("Historial de Calificaciones")
+            st.caption(f"{curso} — {actividad}")
             
-            historial = cargar_historial_r4()
+            historial = cargar_historial_r4(curso, actividad)
             
             if historial:
                 st.success(f"📊 Total de alumnos en historial: {len(historial)}")
@@ -1675,7 +1036,8 @@ def mostrar_r4md():
                 buscar = st.text_input("🔍 Buscar alumno en historial:", placeholder="Escribe el nombre...")
                 
                 if buscar:
-                    df_filtrado = df_historial[df_historial['Nombre'].str.contains(buscar, case=False, na=False)]
+                    df_filtrado = df_historial[normalizar_serie_nombres(df_historial['Nombre'])
+                                               .str.contains(normalizar_nombre(buscar), regex=False)]
                     st.dataframe(df_filtrado, use_container_width=True, hide_index=True)
                     
                     # Mostrar retroalimentación completa
@@ -1781,6 +1143,17 @@ def mostrar_r4md():
                     for nombre in no_encontrados_lista:
                         st.text(f"• {nombre}")
                 
+                # Participaciones casi idénticas a las de otro alumno
+                if 'Duplicado' in df_debug and (df_debug['Duplicado'] != '').any():
+                    st.markdown("---")
+                    st.subheader("🕵️ Participaciones casi idénticas")
+                    st.warning(f"{st.session_state.get('duplicados_r4', 0)} participación(es) coinciden casi "
+                               "textualmente con la de otro alumno (de este lote o de uno ya "
+                               "procesado en esta actividad); su retroalimentación no elogia las "
+                               "definiciones ni los ejemplos y pide redactarlos con sus propias palabras.")
+                    st.dataframe(df_debug[df_debug['Duplicado'] != ''][['HTML', 'Excel', 'Duplicado']],
+                                 use_container_width=True, hide_index=True)
+                
             else:
                 st.info("👆 Procesa archivos en la pestaña 'Cargar Archivos' para ver información de debug.")
     
@@ -1789,31 +1162,10 @@ def mostrar_r4md():
         st.markdown("### Mensajes Simples desde Excel")
         st.markdown("---")
         
-        mensajes_r4 = [
-            "Buen día {nombre}. He tenido la oportunidad de revisar tu participación en el foro y quiero felicitarte, ya que has abordado todos los puntos de manera adecuada, cumpliendo con los criterios de la rúbrica. Ahora, aguardamos los comentarios de tus compañeros para enriquecer el intercambio. Te sugiero considerar sus observaciones y sacar provecho de esta oportunidad. ¡Saludos!",
-            
-            "Hola {nombre}, qué gusto saludarte. Revisé tu trabajo en el foro y quiero felicitarte por cumplir con los puntos solicitados en la rúbrica. Ahora esperemos la retroalimentación de tus compañeros, ya que el foro está diseñado para promover este intercambio de ideas. Aprovecha los comentarios recibidos para potenciar tu aprendizaje. Saludos.",
-            
-            "Gracias por tu aporte {nombre}. He revisado con detalle tu participación en el foro y quiero reconocerte el haber cumplido con todos los criterios establecidos. Ahora, esperamos las observaciones de tus compañeros, que enriquecerán la discusión y te brindarán nuevos puntos de vista. Aprovecha esta oportunidad para fortalecer tus conocimientos. Saludos cordiales.",
-            
-            "Excelente trabajo {nombre}. Al revisar tu contribución en el foro, pude ver que has cumplido con todos los aspectos solicitados en la rúbrica, ¡felicidades! Ahora queda por esperar los comentarios de tus compañeros, quienes podrán ofrecerte nuevas perspectivas. Considera sus observaciones para sacar el mayor provecho de esta actividad. Saludos.",
-            
-            "¿Qué tal? {nombre}. Muy bien hecho. Tu participación en el foro ha sido revisada, y es evidente que has cumplido con los puntos solicitados de forma satisfactoria. Ahora, espera la retroalimentación de tus compañeros, ya que el intercambio de ideas es el objetivo de este espacio. Aprovecha sus comentarios para fortalecer tu aprendizaje. ¡Saludos!"
-        ]
-        
         excel_file = st.file_uploader("📊 Carga el archivo Excel", type=["xlsx"], key="excel_r4_simple")
         
         if excel_file:
             try:
-                df = pd.read_excel(excel_file)
-                
-                # Mostrar información del archivo
-                st.info(f"📋 Archivo cargado: {len(df)} filas, {len(df.columns)} columnas")
-                
-                # Mostrar columnas disponibles
-                with st.expander("👁️ Ver columnas disponibles"):
-                    st.write(list(df.columns))
-                
                 # Buscar columnas de manera flexible
                 nombres_columna_objetivo = [
                     "Tarea:R4. Proposiciones lógicas (Real)",
@@ -1829,72 +1181,70 @@ def mostrar_r4md():
                     "nombre completo"
                 ]
                 
-                columna_objetivo = buscar_columna_flexible(df, nombres_columna_objetivo)
-                columna_nombre = buscar_columna_flexible(df, nombres_columna_nombre)
+                # Solo se cargan las dos columnas necesarias
+                df, columnas_excel, encabezado = cargar_excel_proyectado(excel_file, {
+                    'objetivo': nombres_columna_objetivo,
+                    'nombre': nombres_columna_nombre
+                })
+                columna_objetivo = columnas_excel['objetivo']
+                columna_nombre = columnas_excel['nombre']
+                
+                # Mostrar información del archivo
+                st.info(f"📋 Archivo cargado: {len(df)} filas, {len(encabezado)} columnas")
+                
+                # Mostrar columnas disponibles
+                with st.expander("👁️ Ver columnas disponibles"):
+                    st.write(encabezado)
                 
                 if columna_objetivo:
                     st.success(f"✅ Columna objetivo encontrada: '{columna_objetivo}'")
                     
                     # Filtrar filas con "-"
-                    filas_con_guion = df[df[columna_objetivo] == "-"]
+                    total_con_guion = int((df[columna_objetivo] == "-").sum())
                     
-                    if len(filas_con_guion) > 0:
-                        st.info(f"🔍 Encontradas {len(filas_con_guion)} filas con '-'")
+                    if total_con_guion > 0:
+                        st.info(f"🔍 Encontradas {total_con_guion} filas con '-'")
                         
                         if columna_nombre:
                             st.success(f"✅ Columna nombre encontrada: '{columna_nombre}'")
                             
-                            # Obtener nombres
-                            nombres = filas_con_guion[columna_nombre].tolist()
-                            
-                            # Limpiar nombres (quitar espacios extra, NaN, etc.)
-                            nombres_limpios = []
-                            for nombre in nombres:
-                                if pd.notna(nombre) and str(nombre).strip():
-                                    nombres_limpios.append(str(nombre).strip())
+                            # Obtener nombres limpios (sin NaN ni vacíos)
+                            nombres_limpios = nombres_sin_calificar(df, columna_objetivo, columna_nombre).tolist()
                             
                             if nombres_limpios:
-                                # Crear mensajes balanceados
-                                mensajes_finales = []
-                                datos_para_excel = []
+                                # Crear mensajes balanceados: módulo para distribuir de manera equilibrada
+                                mensajes_finales = generar_mensajes_simples_r4(nombres_limpios)
                                 
                                 st.markdown("---")
                                 st.subheader("📝 Mensajes Generados")
                                 
-                                for i, nombre in enumerate(nombres_limpios):
-                                    # Usar módulo para distribuir mensajes de manera equilibrada
-                                    mensaje_idx = i % len(mensajes_r4)
-                                    mensaje_completo = mensajes_r4[mensaje_idx].format(nombre=nombre)
-                                    mensajes_finales.append(mensaje_completo)
+                                # Lista compacta; solo el alumno elegido tiene su área de texto y botón
+                                indices = filtrar_por_busqueda(nombres_limpios, "simple_r4")
+                                if not indices:
+                                    st.warning("⚠️ Ningún alumno coincide con la búsqueda")
+                                i = elegir_alumno(nombres_limpios, indices, "simple_r4",
+                                                  {'Mensaje': mensajes_finales})
+                                
+                                if i is not None:
+                                    nombre = nombres_limpios[i]
+                                    mensaje_completo = mensajes_finales[i]
+                                    st.text_area(
+                                        f"Mensaje para {nombre}:", 
+                                        value=mensaje_completo, 
+                                        height=120, 
+                                        key=f"mensaje_simple_{i}",
+                                        label_visibility="collapsed"
+                                    )
                                     
-                                    # Datos para Excel (nombre y mensaje en columnas separadas)
-                                    datos_para_excel.append({
-                                        'Nombre': nombre,
-                                        'Mensaje': mensaje_completo
-                                    })
+                                    # Botón para copiar mensaje individual
+                                    if st.button(f"📋 Copiar mensaje de {nombre}", key=f"copy_individual_simple_{i}"):
+                                        components.html(copy_to_clipboard_js(mensaje_completo), height=0)
+                                        st.success(f"✅ ¡Mensaje de {nombre} copiado!")
                                     
-                                    # Mostrar cada mensaje con su botón individual
-                                    with st.container():
-                                        st.markdown(f"**{i+1}. {nombre}**")
-                                        
-                                        # Mostrar el mensaje en un área de texto pequeña
-                                        st.text_area(
-                                            f"Mensaje para {nombre}:", 
-                                            value=mensaje_completo, 
-                                            height=120, 
-                                            key=f"mensaje_simple_{i}",
-                                            label_visibility="collapsed"
-                                        )
-                                        
-                                        # Botón para copiar mensaje individual
-                                        if st.button(f"📋 Copiar mensaje de {nombre}", key=f"copy_individual_simple_{i}"):
-                                            components.html(copy_to_clipboard_js(mensaje_completo), height=0)
-                                            st.success(f"✅ ¡Mensaje de {nombre} copiado!")
-                                        
-                                        st.markdown("---")
+                                    st.markdown("---")
                                 
-                                # Crear DataFrame para Excel con estructura solicitada
-                                df_resultado = pd.DataFrame(datos_para_excel)
+                                # Crear DataFrame para Excel con estructura solicitada (nombre y mensaje)
+                                df_resultado = pd.DataFrame({'Nombre': nombres_limpios, 'Mensaje': mensajes_finales})
                                 
                                 st.success(f"✅ Procesados {len(mensajes_finales)} mensajes")
                                 
@@ -1938,7 +1288,7 @@ def mostrar_r4md():
                                 with st.expander("📊 Distribución de mensajes"):
                                     distribucion = {}
                                     for i in range(len(mensajes_finales)):
-                                        mensaje_tipo = f"Mensaje {(i % len(mensajes_r4)) + 1}"
+                                        mensaje_tipo = f"Mensaje {(i % len(MENSAJES_SIMPLES_R4)) + 1}"
                                         distribucion[mensaje_tipo] = distribucion.get(mensaje_tipo, 0) + 1
                                     
                                     for tipo, cantidad in distribucion.items():
@@ -1950,12 +1300,12 @@ def mostrar_r4md():
                         else:
                             st.error(f"❌ No se encontró ninguna columna de nombres")
                             st.write("**Columnas buscadas:** ", nombres_columna_nombre)
-                            st.write("**Columnas disponibles:** ", list(df.columns))
+                            st.write("**Columnas disponibles:** ", encabezado)
                             
                             # Sugerir columnas similares
                             st.write("**💡 Sugerencias de columnas que podrían contener nombres:**")
-                            for col in df.columns:
-                                if any(palabra in col.lower() for palabra in ['nombre', 'name', 'alumno', 'estudiante']):
+                            for col in encabezado:
+                                if any(palabra in str(col).lower() for palabra in ['nombre', 'name', 'alumno', 'estudiante']):
                                     st.write(f"   - {col}")
                     
                     else:
@@ -1969,97 +1319,23 @@ def mostrar_r4md():
                 else:
                     st.error(f"❌ No se encontró la columna objetivo")
                     st.write("**Columnas buscadas:** ", nombres_columna_objetivo)
-                    st.write("**Columnas disponibles:** ", list(df.columns))
+                    st.write("**Columnas disponibles:** ", encabezado)
                     
                     # Sugerir columnas similares
                     st.write("**💡 Sugerencias de columnas que podrían ser la objetivo:**")
-                    for col in df.columns:
-                        if any(palabra in col.lower() for palabra in ['tarea', 'r4', 'proposiciones', 'logicas']):
+                    for col in encabezado:
+                        if any(palabra in str(col).lower() for palabra in ['tarea', 'r4', 'proposiciones', 'logicas']):
                             st.write(f"   - {col}")
             
             except Exception as e:
                 st.error(f"❌ Error al procesar el archivo Excel: {str(e)}")
 
-# ==================== R7MD - MENSAJES PREDEFINIDOS ====================
-
-
-# ==================== R7MD - FUNCIONES AUXILIARES ====================
-
-def limpiar_nombre(nombre_raw):
-    """
-    Limpia el nombre extraído del texto, eliminando prefijos comunes
-    y caracteres no deseados.
-    """
-    if not nombre_raw:
-        return ""
-    
-    # Patrones comunes a eliminar
-    patrones_a_eliminar = [
-        r'^\s*Nombre\s*del\s*estudiante[:\s]*',
-        r'^\s*Nombre\s*[:\s]*',
-        r'^\s*Estudiante\s*[:\s]*',
-        r'^\s*Alumno\s*[:\s]*',
-    ]
-    
-    nombre_limpio = nombre_raw
-    for patron in patrones_a_eliminar:
-        nombre_limpio = re.sub(patron, '', nombre_limpio, flags=re.IGNORECASE)
-    
-    # Eliminar espacios extras
-    nombre_limpio = ' '.join(nombre_limpio.split())
-    
-    # Capitalizar correctamente
-    nombre_limpio = nombre_limpio.title()
-    
-    return nombre_limpio.strip()
-
-def extraer_alumnos_desde_html(html_content):
-    """
-    Extrae los nombres de los alumnos desde un HTML de Moodle que tienen
-    status "Enviado para calificar".
-    
-    Busca la estructura:
-    <td class="cell c2"><a ...>NOMBRE DEL ALUMNO</a></td>
-    <td class="cell c3 email">email@uveg.edu.mx</td>
-    <td class="cell c4"><div class="submissionstatussubmitted">Enviado para calificar</div></td>
-    
-    Retorna una lista de nombres encontrados.
-    """
-    try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        alumnos_encontrados = []
-        
-        # Buscar todas las filas de la tabla
-        rows = soup.find_all('tr')
-        
-        for row in rows:
-            # Buscar si esta fila contiene "Enviado para calificar"
-            status_cell = row.find('div', class_='submissionstatussubmitted')
-            
-            if status_cell and 'enviado para calificar' in status_cell.get_text().lower():
-                # Si encontramos el status, buscar el nombre en esta fila
-                # El nombre está en la celda con class "cell c2"
-                nombre_cell = row.find('td', class_='cell c2')
-                
-                if nombre_cell:
-                    nombre_link = nombre_cell.find('a')
-                    if nombre_link:
-                        nombre = nombre_link.get_text().strip()
-                        # Limpiar el nombre y agregarlo si no está vacío
-                        nombre_limpio = limpiar_nombre(nombre)
-                        if nombre_limpio and nombre_limpio not in alumnos_encontrados:
-                            alumnos_encontrados.append(nombre_limpio)
-        
-        return alumnos_encontrados
-        
-    except Exception as e:
-        st.error(f"Error al extraer alumnos del HTML: {str(e)}")
-        return []
-
 # ==================== R7MD - MENSAJES PREDEFINIDOS (NUEVA VERSIÓN) ====================
 
 def mostrar_r7md():
     """Interfaz principal para R7MD - Mensajes Predefinidos"""
+    import pandas as pd
+    
     st.title("💬 R7MD - Mensajes Predefinidos")
     st.markdown("---")
     
@@ -2103,17 +1379,54 @@ def mostrar_r7md():
     if archivo_html:
         try:
             html_content = archivo_html.read().decode('utf-8', errors='ignore')
-            alumnos_extraidos = extraer_alumnos_desde_html(html_content)
+            entregas = extraer_entregas_desde_html(html_content)
+            
+            if entregas:
+                # Filtro por status: por defecto solo "Enviado para calificar"
+                estados = list(dict.fromkeys(e.estado for e in entregas))
+                estados_default = [e for e in estados if 'enviado para calificar' in e.lower()] or estados
+                col1, col2 = st.columns([2, 1])
+                with col1:
+                    estados_elegidos = st.multiselect(
+                        "Status a incluir:", estados, default=estados_default, key="estados_r7md"
+                    )
+                with col2:
+                    solo_pendientes = st.checkbox(
+                        "Solo entregas nuevas o actualizadas", value=True, key="solo_pendientes_r7md",
+                        help="Oculta a los alumnos que ya recibieron mensaje y no han cambiado su entrega"
+                    )
+                
+                cola = cargar_cola_r7()
+                seleccion = [e for e in entregas if e.estado in estados_elegidos]
+                total_seleccion = len(seleccion)
+                if solo_pendientes:
+                    seleccion = entregas_pendientes_r7(seleccion, cola)
+                alumnos_extraidos = alumnos_de_entregas_r7(seleccion)
+                
+                st.info(f"📋 {len(entregas)} fila(s) en el HTML | {total_seleccion} con el status elegido | "
+                        f"{len(alumnos_extraidos)} por atender")
             
             if alumnos_extraidos:
-                st.success(f"✅ Se encontraron {len(alumnos_extraidos)} alumno(s) con status 'Enviado para calificar'")
+                st.success(f"✅ Se encontraron {len(alumnos_extraidos)} alumno(s) por atender")
                 
-                # Mostrar lista de alumnos encontrados
+                # Mostrar lista de alumnos encontrados en una tabla compacta
                 with st.expander(f"👥 Ver alumnos encontrados ({len(alumnos_extraidos)})", expanded=True):
-                    for i, alumno in enumerate(alumnos_extraidos, 1):
-                        st.write(f"{i}. **{alumno}**")
+                    df_entregas = pd.DataFrame(seleccion).rename(columns={
+                        'nombre': 'Alumno', 'email': 'Email', 'estado': 'Status',
+                        'modificado': 'Última modificación', 'calificacion': 'Calificación'
+                    })
+                    df_entregas.index = range(1, len(df_entregas) + 1)
+                    st.dataframe(df_entregas, use_container_width=True)
+                
+                if st.button("✅ Marcar estos alumnos como ya notificados", key="marcar_cola_r7md",
+                             help="En las siguientes cargas del mismo HTML solo aparecerán entregas nuevas o actualizadas"):
+                    guardar_cola_r7(registrar_en_cola_r7(cola, seleccion))
+                    st.rerun()
+                st.caption(f"📬 Alumnos ya notificados en la cola: {len(cola)}")
+            elif entregas:
+                st.info("📭 No hay entregas nuevas o actualizadas con el status elegido.")
             else:
-                st.warning("⚠️ No se encontraron alumnos con status 'Enviado para calificar' en el HTML.")
+                st.warning("⚠️ No se encontraron entregas en el HTML.")
         
         except Exception as e:
             st.error(f"❌ Error al procesar el archivo HTML: {str(e)}")
@@ -2152,9 +1465,16 @@ def mostrar_r7md():
     
     # Si hay nombres para procesar, generar mensajes para cada uno
     if nombres_a_procesar:
-        # Procesar cada alumno
-        for idx_alumno, nombre_actual in enumerate(nombres_a_procesar):
-            # Si hay más de un alumno, mostrar separador
+        # Con varios alumnos: lista compacta y los mensajes solo del alumno elegido
+        idx_alumno = 0
+        if len(nombres_a_procesar) > 1:
+            indices = filtrar_por_busqueda(nombres_a_procesar, "alumnos_r7")
+            if not indices:
+                st.warning("⚠️ Ningún alumno coincide con la búsqueda")
+            idx_alumno = elegir_alumno(nombres_a_procesar, indices, "alumnos_r7")
+        
+        if idx_alumno is not None:
+            nombre_actual = nombres_a_procesar[idx_alumno]
             if len(nombres_a_procesar) > 1:
                 st.markdown("---")
                 st.markdown(f"### 👤 Alumno {idx_alumno + 1}: {nombre_actual}")
@@ -2171,106 +1491,9 @@ def mostrar_mensajes_para_alumno(nombre_alumno, indice_alumno):
     Si nombre_alumno está vacío, muestra los mensajes con el placeholder {nombre}.
     """
     
-    # Mensajes CORRECTOS (7 mensajes)
-    mensajes_correcto = [
-        """Excelente trabajo {nombre}, he podido ver que has identificado de manera adecuada las propiedades de la relación, además de mostrar de manera correcta los diagramas, el de Hasse y el dígrafo.
-
-Me da gusto haberte acompañado en este proceso de aprendizaje. Éxito en tus siguientes módulos.
-
-Saludos.""",
-
-        """Buen trabajo {nombre}, tu actividad ha sido resuelta de manera adecuada, las propiedades que corresponden a ambas relaciones las has identificado de manera correcta, así como los diagramas solicitados.
-
-Éxito en tus siguientes retos.
-
-Me da gusto haberte acompañado en este proceso de aprendizaje.
-
-Saludos.""",
-
-        """Buen trabajo {nombre}, tu actividad ha sido resuelta de manera adecuada, las propiedades que corresponden a ambas relaciones las has identificado de manera correcta, así como los diagramas solicitados.
-
-Éxito en tus siguientes retos.
-
-Saludos.""",
-
-        """Buen trabajo {nombre}, tu actividad ha sido resuelta de manera adecuada, las propiedades que corresponden a ambas relaciones las has identificado de manera correcta, así como los diagramas solicitados.
-
-Éxito en tus siguientes retos y me da gusto haberte acompañado en este proceso de aprendizaje.
-
-Saludos.""",
-
-        """Buen trabajo {nombre}, tu actividad ha sido resuelta de manera adecuada, las propiedades que corresponden a ambas relaciones las has identificado de manera correcta, así como los diagramas solicitados.
-
-Me da gusto haberte acompañado en este proceso de aprendizaje.
-
-Saludos.""",
-
-        """Buen trabajo {nombre}, tu actividad ha sido resuelta de manera adecuada, las propiedades que corresponden a ambas relaciones las has identificado de manera correcta, así como los diagramas solicitados. Me da gusto haberte acompañado en este proceso de aprendizaje. Éxito en tus siguientes retos.
-
-Saludos.""",
-
-        """Excelente trabajo {nombre}, tu actividad ha sido resuelta de manera adecuada, las propiedades que corresponden a ambas relaciones las has identificado de manera correcta, así como los diagramas solicitados.
-
-Me da gusto haberte acompañado en este proceso de aprendizaje.
-
-Saludos."""
-    ]
-    
-    # Mensajes INCORRECTOS (4 mensajes)
-    mensajes_incorrecto = [
-        """Buen trabajo {nombre}, lo que corresponde a tu primera tabla es correcto, identificas de manera adecuada las propiedades, la segunda tabla no se ha realizado, de ahí tu calificación, te dejo un video que he realizado con el objetivo de poder darte claridad para resolver el ejercicio.
-
-https://youtu.be/naYR2TQ84L0
-
-Corrige y reenvía.
-
-Saludos.""",
-
-        """Buen trabajo {nombre}, lo que corresponde a tu primera tabla es correcto, identificas de manera adecuada las propiedades, en la segunda tabla la que corresponde al diagrama de Hasse, es correcta hasta el paso 3, ya que en el paso 4, a pesar que identificas de manera correcta cada una de las relaciones transitivas, hay un cambio de dirección de la arista de "c" a "b", ya que la dirección en un paso anterior lo manejas de "b" a "c", de ahí la calificación, si pudieras argumentar dicho cambio de dirección podría corregir la calificación, quedo al pendiente.
-
-Aquí un video que te puede ayudar.
-
-https://youtu.be/WTGkSBsLX34
-
-Saludos.""",
-
-        """Buen trabajo {nombre}, lo que corresponde a tu primera tabla es correcto, identificas de manera adecuada las propiedades, en la segunda tabla la que corresponde al diagrama de Hasse, es correcta hasta el paso 2, ya que en el paso 3, no identificas en su totalidad las relaciones transitivas, situación que te lleva al error en tu diagrama final, te dejo un video que he realizado con el objetivo de poder darte claridad para resolver el ejercicio.
-
-https://youtu.be/naYR2TQ84L0
-
-Corrige y reenvía.
-
-Saludos.""",
-
-        """Buen trabajo {nombre}, la primera tabla es correcta, en la parte que corresponde al dígrafo faltó eliminar la totalidad de las relaciones transitivas, hecho que no te permite alcanzar el 100% de la calificación.
-
-Te dejo la resolución del ejercicio y quedo a disposición por si hubiera alguna duda más, aprovecho para preguntar, con todo respeto ¿Viste el video que te envíe en la realimentación anterior?
-
-Saludos.
-
-https://youtu.be/WTGkSBsLX34"""
-    ]
-    
-    # Mensajes ALTERNOS (3 mensajes)
-    mensajes_alternos = [
-        """Buen trabajo {nombre}, un detalle en el dígrafo de la primera tabla, en particular en la relación transitiva, ya que no corresponde la notación matemática y el dígrafo, se otorga la mayor calificación esperando tomes en consideración la observación.
-
-Saludos.""",
-
-        """Buen trabajo {nombre}, lo que corresponde a tu primera tabla es correcto, identificas de manera adecuada las propiedades, en la segunda tabla la que corresponde al diagrama de Hasse, es correcta hasta el paso 3, ya que en el paso 4, estás realizando un acomodo incorrecto, situación que te lleva al error en tu diagrama final, te dejo un video que he realizado con el objetivo de poder darte claridad para resolver el ejercicio. Esperando tomes en consideración la recomendación, para evitar suspicacia en futuros trabajo, se asigna la mayor calificación.
-
-https://youtu.be/WTGkSBsLX34
-
-Éxito en tus subsecuentes retos.
-
-Me da gusto haberte acompañado en este proceso de aprendizaje. Te deseo mucho éxito en tus subsecuentes módulos.
-
-Saludos.""",
-
-        """Buen trabajo {nombre}, desafortunadamente este trabajo lo he visto en entregas anteriores, de hecho veo que es prácticamente el mismo trabajo que compañeros tuyos están entregando, estoy llegando a la conclusión que es un trabajo que aparece en Internet. Me hubiera gustado que generarás tu propio diseño y con ello, adueñarte del conocimiento, ya que en este caso, solo terminas copiando y pegando, sin reflexionar lo que implica este ejercicio. Por cualquier duda quedo a disposición.
-
-Saludos."""
-    ]
+    mensajes_correcto = MENSAJES_CORRECTO_R7
+    mensajes_incorrecto = MENSAJES_INCORRECTO_R7
+    mensajes_alternos = MENSAJES_ALTERNOS_R7
     
     # Mostrar en tres columnas
     col1, col2, col3 = st.columns(3)
@@ -2288,11 +1511,7 @@ Saludos."""
             indice_destacado = (st.session_state['mensaje_correcto_aleatorio_r7'] + indice_alumno) % len(mensajes_correcto)
         
         # Mostrar primero el mensaje aleatorio seleccionado
-        mensaje_destacado = mensajes_correcto[indice_destacado]
-        if nombre_alumno:
-            mensaje_destacado_personalizado = mensaje_destacado.replace("{nombre}", nombre_alumno)
-        else:
-            mensaje_destacado_personalizado = mensaje_destacado
+        mensaje_destacado_personalizado = personalizar_mensaje_r7(mensajes_correcto[indice_destacado], nombre_alumno)
         
         st.markdown(f"**⭐ Mensaje Sugerido (Variante {indice_destacado + 1}):**")
         st.text_area(
@@ -2310,10 +1529,7 @@ Saludos."""
         st.subheader("🔴 INCORRECTOS")
         for i, mensaje in enumerate(mensajes_incorrecto, 1):
             # Reemplazar {nombre} con el nombre capturado si existe
-            if nombre_alumno:
-                mensaje_personalizado = mensaje.replace("{nombre}", nombre_alumno)
-            else:
-                mensaje_personalizado = mensaje
+            mensaje_personalizado = personalizar_mensaje_r7(mensaje, nombre_alumno)
             
             with st.expander(f"Mensaje {i} - Incorrecto"):
                 st.text_area(
@@ -2330,10 +1546,7 @@ Saludos."""
         st.subheader("🟡 ALTERNOS")
         for i, mensaje in enumerate(mensajes_alternos, 1):
             # Reemplazar {nombre} con el nombre capturado si existe
-            if nombre_alumno:
-                mensaje_personalizado = mensaje.replace("{nombre}", nombre_alumno)
-            else:
-                mensaje_personalizado = mensaje
+            mensaje_personalizado = personalizar_mensaje_r7(mensaje, nombre_alumno)
             
             with st.expander(f"Mensaje {i} - Alterno"):
                 st.text_area(
@@ -2355,10 +1568,7 @@ Saludos."""
         st.markdown("**🔴 Mensajes Incorrectos**")
         if st.button("📋 Copiar TODOS INCORRECTOS", type="secondary", use_container_width=True, key=f"copy_all_incorrectos_{indice_alumno}"):
             # Personalizar todos los mensajes antes de copiar
-            if nombre_alumno:
-                mensajes_personalizados = [msg.replace("{nombre}", nombre_alumno) for msg in mensajes_incorrecto]
-            else:
-                mensajes_personalizados = mensajes_incorrecto
+            mensajes_personalizados = [personalizar_mensaje_r7(msg, nombre_alumno) for msg in mensajes_incorrecto]
             todos_incorrectos = "\n\n" + "="*50 + "\n\n".join([f"MENSAJE {i+1} - INCORRECTO:\n\n{msg}" for i, msg in enumerate(mensajes_personalizados)])
             components.html(copy_to_clipboard_js(todos_incorrectos), height=0)
             st.success("✅ Todos los mensajes incorrectos copiados!")
@@ -2367,22 +1577,22 @@ Saludos."""
         st.markdown("**🟡 Mensajes Alternos**")
         if st.button("📋 Copiar TODOS ALTERNOS", type="secondary", use_container_width=True, key=f"copy_all_alternos_{indice_alumno}"):
             # Personalizar todos los mensajes antes de copiar
-            if nombre_alumno:
-                mensajes_personalizados = [msg.replace("{nombre}", nombre_alumno) for msg in mensajes_alternos]
-            else:
-                mensajes_personalizados = mensajes_alternos
+            mensajes_personalizados = [personalizar_mensaje_r7(msg, nombre_alumno) for msg in mensajes_alternos]
             todos_alternos = "\n\n" + "="*50 + "\n\n".join([f"MENSAJE {i+1} - ALTERNO:\n\n{msg}" for i, msg in enumerate(mensajes_personalizados)])
             components.html(copy_to_clipboard_js(todos_alternos), height=0)
             st.success("✅ Todos los mensajes alternos copiados!")
 
 # ==================== NAVEGACIÓN PRINCIPAL ====================
 
-if menu_option == "R3MD - Conjuntos":
-    mostrar_r3md()
-elif menu_option == "R4MD - Proposiciones Lógicas":
-    mostrar_r4md()
-elif menu_option == "R7MD - Mensajes Predefinidos":
-    mostrar_r7md()
+with rendimiento.etapa(f"app.{menu_option.split(' ')[0]}"):
+    if menu_option == "R3MD - Conjuntos":
+        mostrar_r3md()
+    elif menu_option == "R4MD - Proposiciones Lógicas":
+        mostrar_r4md()
+    elif menu_option == "R7MD - Mensajes Predefinidos":
+        mostrar_r7md()
+
+mostrar_panel_rendimiento()
 
 # Footer
 st.markdown("---")
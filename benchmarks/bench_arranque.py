@@ -0,0 +1,68 @@
+"""
+Benchmark del tiempo de importación de app_v10_multi (arranque en frío).
+
+Cada medición corre en un intérprete nuevo, que es lo que paga Streamlit al
+levantar la app. Se compara la importación actual (dependencias pesadas
+cargadas al usar cada sección) contra la importación anticipada de todas ellas,
+equivalente a tenerlas al inicio del módulo, y se listan las dependencias
+pesadas que quedaron cargadas después de importar la app.
+
+Uso:
+    python benchmarks/bench_arranque.py [repeticiones]
+"""
+import json
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencias que solo usa alguna sección de la app
+DEPENDENCIAS_PESADAS = ["pandas", "docx", "bs4", "openpyxl", "pdfplumber", "PyPDF2", "python_calamine"]
+
+SCRIPT_MEDICION = """
+import importlib.util, json, sys, time
+sys.path.insert(0, {raiz!r})
+precargar = {precargar!r}
+inicio = time.perf_counter()
+for modulo in precargar:
+    if importlib.util.find_spec(modulo) is not None:
+        __import__(modulo)
+import app_v10_multi
+total = time.perf_counter() - inicio
+cargadas = [m for m in {pesadas!r} if m in sys.modules]
+print(json.dumps({{"segundos": total, "cargadas": cargadas}}))
+"""
+
+
+def medir_importacion(precargar, repeticiones):
+    """Mejor tiempo de importación (segundos) y dependencias pesadas cargadas"""
+    codigo = SCRIPT_MEDICION.format(raiz=RAIZ, precargar=precargar, pesadas=DEPENDENCIAS_PESADAS)
+    mejor = float('inf')
+    cargadas = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True,
+                                text=True, check=True, cwd=RAIZ)
+        # Streamlit en modo "bare" imprime avisos; el resultado es la última línea
+        resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+        mejor = min(mejor, resultado["segundos"])
+        cargadas = resultado["cargadas"]
+    return mejor, cargadas
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    t_diferida, cargadas_diferida = medir_importacion([], repeticiones)
+    t_anticipada, cargadas_anticipada = medir_importacion(DEPENDENCIAS_PESADAS, repeticiones)
+
+    print(f"Importación diferida (actual):  {t_diferida * 1000:8.1f} ms")
+    print(f"   cargadas: {', '.join(cargadas_diferida) or 'ninguna'}")
+    print(f"Importación anticipada:         {t_anticipada * 1000:8.1f} ms")
+    print(f"   cargadas: {', '.join(cargadas_anticipada) or 'ninguna'}")
+    print(f"Ahorro en el arranque:          {(t_anticipada - t_diferida) * 1000:8.1f} ms "
+          f"({1 - t_diferida / t_anticipada:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark de la extracción de alumnos de R7MD sobre una exportación sintética
+de la tabla de entregas de Moodle.
+
+Compara el camino de la app (extraer_entregas_desde_html con lxml/XPath, filtro
+por status "Enviado para calificar" y alumnos_de_entregas_r7) contra la
+implementación anterior con BeautifulSoup y verifica que ambos devuelvan los
+mismos nombres.
+
+Uso:
+    python benchmarks/bench_extraccion_r7md.py [filas]
+"""
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retroalimentacion.nombres import limpiar_nombre  # noqa: E402
+from retroalimentacion.r7md import alumnos_de_entregas_r7, extraer_entregas_desde_html  # noqa: E402
+
+NOMBRES = ["JUAN", "MARÍA", "JOSÉ", "ANA", "LUIS", "SOFÍA", "CARLOS", "LUCÍA"]
+APELLIDOS = ["PÉREZ", "GARCÍA", "LÓPEZ", "HERNÁNDEZ", "MARTÍNEZ", "NÚÑEZ", "RUIZ", "DÍAZ"]
+
+
+def generar_html_entregas(filas):
+    """Genera una tabla de entregas con ~50% de filas "Enviado para calificar" y algunos repetidos"""
+    renglones = []
+    for i in range(filas):
+        nombre = f"{NOMBRES[i % 8]} {APELLIDOS[(i // 8) % 8]} {APELLIDOS[(i // 64) % 8]} {i // 5}"
+        if i % 2 == 0:
+            estado = '<div class="submissionstatussubmitted">Enviado para calificar</div>'
+        else:
+            estado = '<div class="submissionstatus">No entregado</div>'
+        renglones.append(
+            f'<tr class="r{i % 2}"><td class="cell c0"><input type="checkbox"></td>'
+            f'<td class="cell c1"><img src="u{i}.png"></td>'
+            f'<td class="cell c2"><a href="https://moodle/user/view.php?id={i}">{nombre}</a></td>'
+            f'<td class="cell c3 email">alumno{i}@uveg.edu.mx</td>'
+            f'<td class="cell c4">{estado}</td>'
+            f'<td class="cell c5"><a href="grade.php?id={i}">Calificación</a></td>'
+            f'<td class="cell c6">-</td>'
+            f'<td class="cell c7">lunes, 1 de septiembre de 2025, 10:{i % 60:02d}</td></tr>'
+        )
+    return ("<html><body><table class=\"flexible generaltable\"><tbody>"
+            + "".join(renglones) + "</tbody></table></body></html>")
+
+
+def extraer_con_beautifulsoup(html_content):
+    """Implementación anterior (html.parser + find_all + lista para repetidos), como referencia"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    alumnos_encontrados = []
+    for row in soup.find_all('tr'):
+        status_cell = row.find('div', class_='submissionstatussubmitted')
+        if status_cell and 'enviado para calificar' in status_cell.get_text().lower():
+            nombre_cell = row.find('td', class_='cell c2')
+            if nombre_cell:
+                nombre_link = nombre_cell.find('a')
+                if nombre_link:
+                    nombre_limpio = limpiar_nombre(nombre_link.get_text().strip())
+                    if nombre_limpio and nombre_limpio not in alumnos_encontrados:
+                        alumnos_encontrados.append(nombre_limpio)
+    return alumnos_encontrados
+
+
+def extraer_alumnos_enviados(html_content):
+    """Alumnos con status "Enviado para calificar", como los lista la app por omisión"""
+    entregas = extraer_entregas_desde_html(html_content)
+    return alumnos_de_entregas_r7([e for e in entregas if 'enviado para calificar' in e.estado.lower()])
+
+
+def medir(funcion, argumento, repeticiones=5):
+    """Mejor tiempo (segundos) de varias repeticiones"""
+    mejor = float('inf')
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(argumento)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    html_content = generar_html_entregas(filas)
+    print(f"HTML sintético: {filas} filas, {len(html_content) / 1024:.0f} KiB")
+
+    t_lxml, nombres_lxml = medir(extraer_alumnos_enviados, html_content)
+    t_bs, nombres_bs = medir(extraer_con_beautifulsoup, html_content)
+
+    if nombres_lxml != nombres_bs:
+        print("❌ Los resultados no coinciden")
+        sys.exit(1)
+
+    print(f"Alumnos encontrados: {len(nombres_lxml)}")
+    print(f"lxml/XPath:     {t_lxml * 1000:8.1f} ms")
+    print(f"BeautifulSoup:  {t_bs * 1000:8.1f} ms")
+    print(f"Aceleración:    {t_bs / t_lxml:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
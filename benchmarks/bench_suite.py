@@ -0,0 +1,309 @@
+"""
+Suite de benchmarks de las rutas críticas de calificación, con línea base.
+
+Genera corpus sintéticos (ver corpus_sintetico.py) a varias escalas y mide:
+- R3MD: extracción de texto de Word y PDF, detección de conjuntos (Word y PDF)
+  y generación del mensaje
+- R4MD: extracción del foro, lectura del libro .xlsx, emparejamiento de nombres,
+  generación de retroalimentación y exportaciones
+- R7MD: extracción de la tabla de entregas
+
+Cada etapa devuelve además un resultado (conteos o una suma de verificación)
+que se compara contra la línea base guardada (linea_base.json, en el repositorio),
+así un cambio que acelere pero altere la salida también se detecta. Las etapas de
+similitud y duplicados reportan "aciertos/esperados+falsos" sobre las copias que
+siembra el corpus. Los resultados son deterministas y se comparan en cualquier
+máquina; los tiempos de la base son de la máquina que la guardó, así que en otra
+conviene --sin-tiempos (o guardar una base propia). Termina con código 1 si hay
+regresiones.
+
+Uso:
+    python benchmarks/bench_suite.py                       # escalas 10, 100, 1000
+    python benchmarks/bench_suite.py --escalas 10 100 1000 10000
+    python benchmarks/bench_suite.py --etapas r4 --escalas 100
+    python benchmarks/bench_suite.py --sin-tiempos         # solo revisa los resultados
+    python benchmarks/bench_suite.py --guardar             # actualiza la línea base
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import corpus_sintetico as corpus  # noqa: E402
+from retroalimentacion.excel import cargar_excel_proyectado  # noqa: E402
+from retroalimentacion.r3md import evaluar_documento_r3md, generar_claves_r3md, generar_mensaje_r3md  # noqa: E402
+from retroalimentacion.r4md import (  # noqa: E402
+    COLUMNA_CALIFICACION_R4, buscar_alumno_en_excel, calificar_participaciones_r4,
+    construir_exportaciones_r4, exportar_libro_moodle_r4, extraer_participaciones_html,
+    generar_retroalimentacion_r4, marcar_duplicados_r4, preparar_nombres_excel
+)
+from retroalimentacion.r7md import extraer_entregas_desde_html  # noqa: E402
+from retroalimentacion.similitud import agrupar_similares  # noqa: E402
+from retroalimentacion.texto import leer_documento  # noqa: E402
+
+LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "linea_base.json")
+
+# Un documento de python-docx ya leído ocupa ~4 MB; las etapas que reciben documentos
+# Word leídos usan a lo más estos distintos y los repiten hasta completar la escala
+MAX_DOCUMENTOS_WORD = 100
+
+
+def _suma_verificacion(textos):
+    """CRC32 de una secuencia de textos, para comparar salidas sin guardarlas completas"""
+    crc = 0
+    for texto in textos:
+        crc = zlib.crc32(texto.encode('utf-8'), crc)
+    return f"{crc:08x}"
+
+
+def _detectados(encontrados, esperados):
+    """'aciertos/esperados+falsos' de un conjunto de detecciones contra las esperadas"""
+    return f"{len(encontrados & esperados)}/{len(esperados)}+{len(encontrados - esperados)}"
+
+
+def _leer_libro(xlsx):
+    """Libro de calificaciones con las columnas canónicas, como lo carga la app"""
+    df, columnas, _ = cargar_excel_proyectado(io.BytesIO(xlsx), {
+        'Nombre': ['Nombre'],
+        'Apellido(s)': ['Apellido(s)'],
+        COLUMNA_CALIFICACION_R4: [COLUMNA_CALIFICACION_R4]
+    })
+    return df.rename(columns={real: clave for clave, real in columnas.items() if real})
+
+
+# ==================== ETAPAS ====================
+# Cada etapa tiene preparar(escala) -> datos (fuera de la medición)
+# y ejecutar(datos) -> resultado comparable (lo que se mide).
+
+def preparar_r3_docx(escala):
+    return corpus.generar_entregas_r3(escala, "docx")
+
+def preparar_r3_pdf(escala):
+    return corpus.generar_entregas_r3(escala, "pdf")
+
+def ejecutar_r3_extraccion(entregas):
+    return sum(len(leer_documento(e['nombre_archivo'], e['contenido'])[0]) for e in entregas)
+
+def preparar_r3_deteccion_word(escala):
+    documentos = [leer_documento(e['nombre_archivo'], e['contenido'])
+                  for e in preparar_r3_docx(min(escala, MAX_DOCUMENTOS_WORD))]
+    return [documentos[i % len(documentos)] for i in range(escala)]
+
+def preparar_r3_deteccion_pdf(escala):
+    # El texto escrito en el PDF, sin pasar por pdfplumber: solo se mide la detección
+    return [(e['texto'], None) for e in preparar_r3_pdf(escala)]
+
+def ejecutar_r3_deteccion(documentos):
+    resultados = [evaluar_documento_r3md(texto, doc) for texto, doc in documentos]
+    return sum(len(r.correctos) for r in resultados)
+
+def preparar_r3_mensajes(escala):
+    return [evaluar_documento_r3md(texto, doc) for texto, doc in preparar_r3_deteccion_word(escala)]
+
+def ejecutar_r3_mensajes(resultados):
+    random.seed(0)
+    return _suma_verificacion(generar_mensaje_r3md(r) for r in resultados)
+
+def preparar_r3_claves(escala):
+    return [f"{100000 + i}" for i in range(escala)]
+
+def ejecutar_r3_claves(ids):
+    claves = generar_claves_r3md(ids)
+    return _suma_verificacion(" ".join(clave.expresiones) for clave in claves.values())
+
+def preparar_r3_similitud(escala):
+    entregas = preparar_r3_pdf(escala)
+    copias = {frozenset((e['nombre_archivo'], e['copia_de'])) for e in entregas if e['copia_de']}
+    return {e['nombre_archivo']: e['texto'] for e in entregas}, copias
+
+def ejecutar_r3_similitud(datos):
+    textos, copias = datos
+    pares = {frozenset((par.documento_a, par.documento_b))
+             for grupo in agrupar_similares(textos) for par in grupo.pares}
+    return _detectados(pares, copias)
+
+def preparar_r4_foro(escala):
+    return corpus.generar_html_foro(escala)
+
+def ejecutar_r4_foro(html_content):
+    return len(extraer_participaciones_html(html_content))
+
+def preparar_r4_incremental(escala):
+    # Exportación acumulada ya procesada la semana anterior: todo se omite salvo lo nuevo
+    html_content = corpus.generar_html_foro(escala)
+    marca = {'fecha': '', 'ids': []}
+    extraer_participaciones_html(html_content, marca)
+    return html_content, marca
+
+def ejecutar_r4_incremental(datos):
+    html_content, marca = datos
+    return len(extraer_participaciones_html(html_content, dict(marca)))
+
+def preparar_r4_libro(escala):
+    return corpus.generar_libro_xlsx(escala)
+
+def ejecutar_r4_libro(xlsx):
+    return len(_leer_libro(xlsx))
+
+def preparar_r4_duplicados(escala):
+    # Cada copia y la participación que copia quedan marcadas
+    copias = {i for i in range(escala) if i % corpus.COPIAS_CADA == corpus.COPIAS_CADA - 1}
+    return extraer_participaciones_html(corpus.generar_html_foro(escala)), copias | {i - 1 for i in copias}
+
+def ejecutar_r4_duplicados(datos):
+    participaciones, esperadas = datos
+    marcar_duplicados_r4(participaciones)
+    return _detectados({i for i, p in enumerate(participaciones) if p.similares}, esperadas)
+
+def preparar_r4_emparejamiento(escala):
+    return _leer_libro(corpus.generar_libro_xlsx(escala)), extraer_participaciones_html(corpus.generar_html_foro(escala))
+
+def ejecutar_r4_emparejamiento(datos):
+    df, participaciones = datos
+    nombres_excel = preparar_nombres_excel(df)
+    encontrados = 0
+    for p in participaciones:
+        idx = buscar_alumno_en_excel(df, p.nombre_completo, p.primer_nombre, p.segundo_nombre,
+                                     p.apellidos, nombres_excel)
+        encontrados += idx is not None
+    return encontrados
+
+def preparar_r4_retroalimentacion(escala):
+    return extraer_participaciones_html(corpus.generar_html_foro(escala))
+
+def ejecutar_r4_retroalimentacion(participaciones):
+    random.seed(0)
+    return _suma_verificacion(generar_retroalimentacion_r4(p.nombre_completo, p.primer_nombre, p.contenido)
+                              for p in participaciones)
+
+def preparar_r4_exportacion(escala):
+    xlsx = corpus.generar_libro_xlsx(escala)
+    participaciones = extraer_participaciones_html(corpus.generar_html_foro(escala))
+    random.seed(0)
+    resultado = calificar_participaciones_r4(_leer_libro(xlsx), participaciones, {})
+    return xlsx, resultado.df_resultados
+
+def ejecutar_r4_exportacion(datos):
+    xlsx, df_resultados = datos
+    exportaciones = construir_exportaciones_r4(df_resultados)
+    exportar_libro_moodle_r4(xlsx, df_resultados, COLUMNA_CALIFICACION_R4, 100)
+    return f"{len(df_resultados)}:{_suma_verificacion([exportaciones['texto_plano']])}"
+
+def preparar_r7_entregas(escala):
+    return corpus.generar_html_entregas(escala)
+
+def ejecutar_r7_entregas(html_content):
+    return len(extraer_entregas_desde_html(html_content))
+
+
+ETAPAS = [
+    ("r3_extraccion_docx", preparar_r3_docx, ejecutar_r3_extraccion),
+    ("r3_extraccion_pdf", preparar_r3_pdf, ejecutar_r3_extraccion),
+    ("r3_deteccion_word", preparar_r3_deteccion_word, ejecutar_r3_deteccion),
+    ("r3_deteccion_pdf", preparar_r3_deteccion_pdf, ejecutar_r3_deteccion),
+    ("r3_mensajes", preparar_r3_mensajes, ejecutar_r3_mensajes),
+    ("r3_claves_variantes", preparar_r3_claves, ejecutar_r3_claves),
+    ("r3_similitud", preparar_r3_similitud, ejecutar_r3_similitud),
+    ("r4_extraccion_foro", preparar_r4_foro, ejecutar_r4_foro),
+    ("r4_extraccion_incremental", preparar_r4_incremental, ejecutar_r4_incremental),
+    ("r4_lectura_libro", preparar_r4_libro, ejecutar_r4_libro),
+    ("r4_duplicados", preparar_r4_duplicados, ejecutar_r4_duplicados),
+    ("r4_emparejamiento", preparar_r4_emparejamiento, ejecutar_r4_emparejamiento),
+    ("r4_retroalimentacion", preparar_r4_retroalimentacion, ejecutar_r4_retroalimentacion),
+    ("r4_exportacion", preparar_r4_exportacion, ejecutar_r4_exportacion),
+    ("r7_extraccion_entregas", preparar_r7_entregas, ejecutar_r7_entregas),
+]
+
+
+def calentar():
+    """Importa de antemano las dependencias que la app carga de forma diferida"""
+    from importlib.util import find_spec
+    for modulo in ("pandas", "docx", "bs4", "openpyxl", "pdfplumber", "PyPDF2", "python_calamine"):
+        if find_spec(modulo) is not None:
+            __import__(modulo)
+
+
+def medir(ejecutar, datos, repeticiones):
+    """Mejor tiempo (segundos) y resultado; deja de repetir si una corrida pasa de 2 s"""
+    mejor = float('inf')
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = ejecutar(datos)
+        transcurrido = time.perf_counter() - inicio
+        mejor = min(mejor, transcurrido)
+        if transcurrido > 2:
+            break
+    return mejor, resultado
+
+
+def comparar(nombre, escala, segundos, resultado, base, tolerancia, tiempos=True):
+    """Texto de estado y si hay regresión respecto a la línea base"""
+    registro = base.get(nombre, {}).get(str(escala))
+    if registro is None:
+        return "sin línea base", False
+    if registro['resultado'] != resultado:
+        return f"❌ resultado distinto (base: {registro['resultado']})", True
+    if not tiempos:
+        return "✅ mismo resultado", False
+    # Diferencias menores a 5 ms se consideran ruido
+    if segundos > registro['segundos'] * (1 + tolerancia) and segundos - registro['segundos'] > 0.005:
+        return f"❌ más lento ({segundos / registro['segundos']:.2f}x la base)", True
+    return f"✅ {segundos / registro['segundos']:.2f}x la base", False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de calificación con línea base")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--etapas", nargs="+", default=None,
+                        help="prefijos de las etapas a correr (p. ej. r3 r4_exportacion)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--tolerancia", type=float, default=0.5,
+                        help="aumento de tiempo permitido sobre la base (0.5 = 50%%)")
+    parser.add_argument("--sin-tiempos", action="store_true",
+                        help="compara solo los resultados (p. ej. en otra máquina que la de la base)")
+    parser.add_argument("--linea-base", default=LINEA_BASE)
+    parser.add_argument("--guardar", action="store_true", help="guarda los resultados como nueva línea base")
+    args = parser.parse_args()
+
+    base = {}
+    if os.path.exists(args.linea_base):
+        with open(args.linea_base, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+
+    calentar()
+    etapas = [e for e in ETAPAS if not args.etapas or any(e[0].startswith(p) for p in args.etapas)]
+    medidos = {}
+    regresiones = 0
+    print(f"{'etapa':<24}{'escala':>8}{'tiempo':>12}{'por elemento':>15}  resultado / comparación")
+    for nombre, preparar, ejecutar in etapas:
+        for escala in args.escalas:
+            datos = preparar(escala)
+            segundos, resultado = medir(ejecutar, datos, args.repeticiones)
+            estado, regresion = comparar(nombre, escala, segundos, resultado, base, args.tolerancia,
+                                         tiempos=not args.sin_tiempos)
+            regresiones += regresion
+            medidos.setdefault(nombre, {})[str(escala)] = {'segundos': round(segundos, 6), 'resultado': resultado}
+            print(f"{nombre:<24}{escala:>8}{segundos * 1000:>10.1f}ms{segundos / escala * 1e6:>13.1f}µs  "
+                  f"{resultado} | {estado}", flush=True)
+            datos = None  # liberar antes de preparar la siguiente escala
+
+    if args.guardar:
+        for nombre, escalas in medidos.items():
+            base.setdefault(nombre, {}).update(escalas)
+        with open(args.linea_base, 'w', encoding='utf-8') as f:
+            json.dump(base, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"Línea base guardada en {args.linea_base}")
+    elif regresiones:
+        print(f"{regresiones} regresión(es) respecto a la línea base")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Corpus de regresión de los detectores de conjuntos de R3MD.
+
+Casos escritos a mano con los formatos que llegan en las entregas reales:
+delimitadores mezclados como "{1,2)", respuestas partidas en varias líneas,
+incisos numéricos, varios "=" en la misma operación, celdas combinadas en Word...
+Cada caso trae la verdad (lo que calificaría una persona); lo que devuelven hoy
+los detectores se guarda aparte como salida de referencia (ver regresion_r3md.py).
+
+- CASOS_CONJUNTO: texto suelto para extraer_conjunto_agresivo -> conjunto correcto
+- DOCUMENTOS_PDF: texto completo de un PDF -> qué incisos están bien resueltos
+- DOCUMENTOS_WORD: tablas de un documento Word -> qué incisos están bien resueltos
+"""
+from corpus_sintetico import RESPUESTAS_R3
+
+ENCABEZADO_PDF = [
+    "Universidad Virtual del Estado de Guanajuato",
+    "Reto 3. Conjuntos",
+    "Nombre completo: Mariana López Núñez",
+    "U = {1,2,3,4,5,6,7,8,9,10,11,12,13,14}",
+    "A = {2,4,6,8,10,12,14}",
+    "B = {1,2,3,5,8,13}",
+    "C = {1,2,4,6,7,10,11,13}",
+    "",
+]
+
+OPERACIONES = [operacion for operacion, _ in RESPUESTAS_R3]
+CORRECTAS = [", ".join(numeros) for _, numeros in RESPUESTAS_R3]
+TODOS_CORRECTOS = [True] * len(RESPUESTAS_R3)
+
+
+def _texto_pdf(incisos, encabezado=ENCABEZADO_PDF, pie=("Créditos: elaborado por el alumno",)):
+    """Texto de un PDF: encabezado, las líneas de cada inciso y el pie"""
+    lineas = list(encabezado)
+    for bloque in incisos:
+        lineas.extend(bloque)
+        lineas.append("")
+    lineas.extend(pie)
+    return "\n".join(lineas)
+
+
+def _incisos_estandar(conjuntos, etiquetas="abcdefg", frase="Resultado de la operación:"):
+    """Un bloque por inciso: "a) B ∩ C", la frase de resultado y "B ∩ C = <conjunto>" """
+    return [[f"{etiqueta}) {operacion}", frase, f"{operacion} = {conjunto}"]
+            for etiqueta, operacion, conjunto in zip(etiquetas, OPERACIONES, conjuntos)]
+
+
+# ==================== extraer_conjunto_agresivo ====================
+# (id, texto, conjunto correcto como lista de números en texto)
+
+CASOS_CONJUNTO = [
+    ("llaves", "B ∩ C = {1, 2, 13}", ["1", "2", "13"]),
+    ("corchetes", "B ∩ C = [1, 2, 13]", ["1", "2", "13"]),
+    ("parentesis", "B ∩ C = (1, 2, 13)", ["1", "2", "13"]),
+    ("llave_paren", "B ∩ C = {1,2,13)", ["1", "2", "13"]),
+    ("llave_corchete", "A ∩ C = {2, 4, 6, 10]", ["2", "4", "6", "10"]),
+    ("corchete_llave", "C′ = [3, 5, 8, 9, 12, 14}", ["3", "5", "8", "9", "12", "14"]),
+    ("corchete_paren", "B – A = [1, 3, 5, 13)", ["1", "3", "5", "13"]),
+    ("paren_llave", "A′ = (1, 3, 5, 7, 9, 11, 13}", ["1", "3", "5", "7", "9", "11", "13"]),
+    ("paren_corchete", "B – A = (1, 3, 5, 13]", ["1", "3", "5", "13"]),
+    ("sueltos", "A ∩ C = 2, 4, 6, 10", ["2", "4", "6", "10"]),
+    ("sin_espacios", "B∩C={1,2,13}", ["1", "2", "13"]),
+    ("ceros_izquierda", "B ∩ C = {01, 02, 13}", ["1", "2", "13"]),
+    ("varios_iguales",
+     "C – B′ = C ∩ B = {1,2,4,6,7,10,11,13} ∩ {1,2,3,5,8,13} = {1,2,13}", ["1", "2", "13"]),
+    ("desarrollo_y_resultado",
+     "B ∪ C = {1,2,3,5,8,13} ∪ {1,2,4,6,7,10,11,13} = {1,2,3,4,5,6,7,8,10,11,13}",
+     ["1", "2", "3", "4", "5", "6", "7", "8", "10", "11", "13"]),
+    ("solo_conjunto_base", "C = {1,2,4,6,7,10,11,13}", []),
+    ("complemento_de_b", "B′ = {4,6,7,9,10,11,12,14}", ["4", "6", "7", "9", "10", "11", "12", "14"]),
+    ("hora_entre_parentesis", "Entregado (10:35, 2 de septiembre)", []),
+    ("un_elemento", "B ∩ C = {13}", ["13"]),
+    ("vacio", "B ∩ C = { }", []),
+    ("simbolo_vacio", "B ∩ C = ∅", []),
+]
+
+
+# ==================== PDF ====================
+# dicts con id, texto y correctos (lista de bool, uno por inciso)
+
+DOCUMENTOS_PDF = [
+    {
+        'id': "llaves_incisos_letra",
+        'texto': _texto_pdf(_incisos_estandar([f"{{{c}}}" for c in CORRECTAS])),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "incisos_numericos",
+        'texto': _texto_pdf(_incisos_estandar([f"{{{c}}}" for c in CORRECTAS], etiquetas="1234567")),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "incisos_con_punto",
+        'texto': _texto_pdf([[f"{e}. {op}", "Resultado de la operación:", f"{op} = {{{c}}}"]
+                             for e, op, c in zip("abcdefg", OPERACIONES, CORRECTAS)]),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "delimitadores_mixtos",
+        'texto': _texto_pdf(_incisos_estandar([
+            f"{{{CORRECTAS[0]})", f"[{CORRECTAS[1]}}}", f"({CORRECTAS[2]}]", f"{{{CORRECTAS[3]}]",
+            f"({CORRECTAS[4]}}}", f"[{CORRECTAS[5]})", f"{{{CORRECTAS[6]})",
+        ])),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "corchetes_y_parentesis",
+        'texto': _texto_pdf(_incisos_estandar(
+            [f"[{c}]" if i % 2 == 0 else f"({c})" for i, c in enumerate(CORRECTAS)])),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "sin_delimitadores",
+        'texto': _texto_pdf(_incisos_estandar(CORRECTAS)),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "respuesta_partida_en_lineas",
+        'texto': _texto_pdf([
+            [f"{e}) {op}", "Resultado de la operación:",
+             f"{op} = {{{', '.join(numeros[:len(numeros) // 2])},",
+             f"{', '.join(numeros[len(numeros) // 2:])}}}"]
+            for e, (op, numeros) in zip("abcdefg", RESPUESTAS_R3)
+        ]),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "operacion_en_varios_pasos",
+        'texto': _texto_pdf(_incisos_estandar([f"{{{c}}}" for c in CORRECTAS[:6]]) + [[
+            "g) C – B′",
+            "Resultado de la operación:",
+            "C – B′ = C ∩ B",
+            "= {1,2,4,6,7,10,11,13} ∩ {1,2,3,5,8,13}",
+            "= {1,2,13}",
+        ]]),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "sin_frase_resultado",
+        'texto': _texto_pdf([[f"{e}) {op} = {{{c}}}"]
+                             for e, op, c in zip("abcdefg", OPERACIONES, CORRECTAS)]),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "frase_sin_acento",
+        'texto': _texto_pdf(_incisos_estandar([f"{{{c}}}" for c in CORRECTAS],
+                                              frase="Resultado de la operacion:")),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "con_errores",
+        'texto': _texto_pdf(_incisos_estandar([
+            f"{{{CORRECTAS[0]}}}",
+            "{3,5,8,9,12}",                      # falta el 14
+            f"{{{CORRECTAS[2]}}}",
+            "{2,4,6,8,10}",                      # sobra el 8
+            f"{{{CORRECTAS[4]}}}",
+            "{2,4,6,8,10,12,14}",                # escribió A
+            "{4,6,7,10,11}",                     # confundió C – B′ con C – B
+        ])),
+        'correctos': [True, False, True, False, True, False, False],
+    },
+    {
+        'id': "incompleto",
+        'texto': _texto_pdf(_incisos_estandar([f"{{{c}}}" for c in CORRECTAS[:4]])
+                            + [[f"{e}) {op}", "Resultado de la operación:", f"{op} ="]
+                               for e, op in zip("efg", OPERACIONES[4:])]),
+        'correctos': [True, True, True, True, False, False, False],
+    },
+    {
+        'id': "respuesta_g_igual_a_inciso_a",
+        # a) y g) tienen el mismo resultado; g) está mal y no debe tomarse la respuesta de a)
+        'texto': _texto_pdf(_incisos_estandar([f"{{{c}}}" for c in CORRECTAS[:6]] + ["{2,4,6,10}"])),
+        'correctos': [True, True, True, True, True, True, False],
+    },
+]
+
+
+# ==================== WORD ====================
+# Cada tabla es una lista de filas y cada fila una lista de textos de celda.
+# None en una celda significa que está combinada con la celda anterior de la fila
+# (python-docx devuelve la misma celda dos veces en row.cells).
+
+TABLAS_ENCABEZADO_WORD = [
+    [["Datos generales"], ["Nombre completo: Mariana López Núñez"]],
+    [["Instrucciones: resuelve cada operación y escribe el resultado"]],
+    [["U = {1,2,3,4,5,6,7,8,9,10,11,12,13,14}"], ["A = {2,4,6,8,10,12,14}"],
+     ["B = {1,2,3,5,8,13}"], ["C = {1,2,4,6,7,10,11,13}"]],
+]
+
+TABLA_EJEMPLO_WORD = [["Ejemplo"], ["Resultado de la operación: A ∪ B = {1,2,3,4,5,6,8,10,12,13,14}"]]
+
+
+def _tablas_word(resultados, ejemplo=True, combinadas=False):
+    """Encabezado, ejemplo y una tabla por inciso con el texto de resultado indicado"""
+    tablas = [list(t) for t in TABLAS_ENCABEZADO_WORD]
+    if ejemplo:
+        tablas.append(TABLA_EJEMPLO_WORD)
+    for operacion, resultado in zip(OPERACIONES, resultados):
+        celda = f"Resultado de la operación: {operacion} = {resultado}"
+        if combinadas:
+            tablas.append([[f"Operación {operacion}", "Procedimiento"], [celda, None]])
+        else:
+            tablas.append([[f"Operación {operacion}"], [celda]])
+    return tablas
+
+
+DOCUMENTOS_WORD = [
+    {
+        'id': "estandar",
+        'tablas': _tablas_word([f"{{{c}}}" for c in CORRECTAS]),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "delimitadores_mixtos",
+        'tablas': _tablas_word([f"{{{c})" if i % 2 else f"[{c}]" for i, c in enumerate(CORRECTAS)]),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "varios_iguales",
+        'tablas': _tablas_word([f"{{{c}}}" for c in CORRECTAS[:6]]
+                               + ["C ∩ B = {1,2,4,6,7,10,11,13} ∩ {1,2,3,5,8,13} = {1,2,13}"]),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "ceros_y_espacios",
+        'tablas': _tablas_word(["{ 01 , 02 , 13 }"] + [f"{{{c}}}" for c in CORRECTAS[1:]]),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "con_errores",
+        'tablas': _tablas_word([f"{{{CORRECTAS[0]}}}", "{3,5,8,9,12}", f"{{{CORRECTAS[2]}}}",
+                                "{2,4,6,8,10}", f"{{{CORRECTAS[4]}}}", "{2,4,6,8,10,12,14}",
+                                "{4,6,7,10,11}"]),
+        'correctos': [True, False, True, False, True, False, False],
+    },
+    {
+        'id': "conjunto_vacio",
+        # Respuesta vacía en b): es incorrecta, pero no debe recorrer las siguientes
+        'tablas': _tablas_word([f"{{{CORRECTAS[0]}}}", "{ }"] + [f"{{{c}}}" for c in CORRECTAS[2:]]),
+        'correctos': [True, False, True, True, True, True, True],
+    },
+    {
+        'id': "sin_ejemplo",
+        # El alumno borró la tabla de ejemplo
+        'tablas': _tablas_word([f"{{{c}}}" for c in CORRECTAS], ejemplo=False),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "celdas_combinadas",
+        'tablas': _tablas_word([f"{{{c}}}" for c in CORRECTAS], combinadas=True),
+        'correctos': TODOS_CORRECTOS,
+    },
+    {
+        'id': "sin_responder",
+        'tablas': _tablas_word([f"{{{c}}}" for c in CORRECTAS[:5]] + ["", ""]),
+        'correctos': [True, True, True, True, True, False, False],
+    },
+]
+
+
+def construir_docx(tablas):
+    """Documento de python-docx con las tablas indicadas (ver formato arriba)"""
+    from docx import Document
+
+    doc = Document()
+    for filas in tablas:
+        columnas = max(len(fila) for fila in filas)
+        tabla = doc.add_table(rows=len(filas), cols=columnas)
+        for i, fila in enumerate(filas):
+            for j, texto in enumerate(fila):
+                if texto is None:
+                    tabla.cell(i, j - 1).merge(tabla.cell(i, j))
+                else:
+                    tabla.cell(i, j).text = texto
+    return doc
@@ -0,0 +1,321 @@
+"""
+Generadores de corpus sintéticos para los benchmarks.
+
+Todo es determinista (random.Random con semilla), así dos corridas con la misma
+escala producen exactamente los mismos archivos y los resultados se pueden
+comparar contra la línea base.
+
+- Entregas R3MD en Word con el formato de tablas "Resultado de la operación:"
+- Entregas R3MD en PDF con los estilos de delimitadores que reconoce extraer_conjunto_agresivo
+- HTML del foro de Moodle (R4MD)
+- Libro de calificaciones .xlsx de Moodle (R4MD)
+- Tabla de entregas de Moodle en HTML (R7MD)
+
+En las entregas R3MD y el foro, una de cada COPIAS_CADA es copia de la anterior
+(mismas respuestas o mismo texto, otro alumno), para que las etapas de
+similitud y duplicados tengan qué detectar.
+"""
+import io
+import random
+import zlib
+
+NOMBRES = ["JUAN", "MARÍA", "JOSÉ", "ANA", "LUIS", "SOFÍA", "CARLOS", "LUCÍA", "PEDRO", "ELENA",
+           "MIGUEL", "ROSA", "JORGE", "PAOLA", "DIEGO", "VALERIA"]
+APELLIDOS = ["PÉREZ", "GARCÍA", "LÓPEZ", "HERNÁNDEZ", "MARTÍNEZ", "NÚÑEZ", "RUIZ", "DÍAZ",
+             "TORRES", "RAMÍREZ", "FLORES", "GÓMEZ", "CRUZ", "MORALES", "REYES", "ORTIZ"]
+
+COLUMNA_CALIFICACION = "Tarea:R4. Proposiciones lógicas (Real)"
+
+# Expresiones de R3MD con su resultado correcto (mismo orden que EXPRESIONES_FIJAS)
+RESPUESTAS_R3 = [
+    ("B ∩ C", ["1", "2", "13"]),
+    ("C′", ["3", "5", "8", "9", "12", "14"]),
+    ("B ∪ C", ["1", "2", "3", "4", "5", "6", "7", "8", "10", "11", "13"]),
+    ("A ∩ C", ["2", "4", "6", "10"]),
+    ("A′", ["1", "3", "5", "7", "9", "11", "13"]),
+    ("B – A", ["1", "3", "5", "13"]),
+    ("C – B′", ["1", "2", "13"]),
+]
+
+# Cada COPIAS_CADA elementos, el último copia al anterior (i % COPIAS_CADA == COPIAS_CADA - 1)
+COPIAS_CADA = 10
+
+# Palabras para el texto propio de cada alumno (procedimiento, ejemplo): es lo que
+# distingue a una entrega de otra una vez que se descarta la plantilla común
+VOCABULARIO = ["primero", "tomo", "elementos", "conjunto", "reviso", "cada", "número", "universo",
+               "comparo", "después", "anoto", "los", "que", "quedan", "fuera", "dentro", "tabla",
+               "diagrama", "círculo", "marco", "resultado", "final", "verifico", "otra", "vez",
+               "parte", "común", "sobra", "falta", "agrego", "quito", "lista", "orden", "mayor",
+               "menor", "igual", "pares", "impares", "clase", "ejercicio"]
+
+# Estilos de escritura del conjunto en los PDF
+ESTILOS_PDF = ["llaves", "corchetes", "parentesis", "llave_paren", "corchete_llave", "sueltos", "partido"]
+
+
+def nombre_alumno(i):
+    """Nombre completo (nombre, apellidos) del alumno i, único para cada i"""
+    nombre = NOMBRES[i % len(NOMBRES)]
+    if (i // len(NOMBRES)) % 3 == 0:
+        nombre += " " + NOMBRES[(i * 7 + 3) % len(NOMBRES)]
+    bloque = i // len(NOMBRES)
+    apellidos = (f"{APELLIDOS[bloque % len(APELLIDOS)]} "
+                 f"{APELLIDOS[(bloque // len(APELLIDOS)) % len(APELLIDOS)]}")
+    if i >= len(NOMBRES) * len(APELLIDOS) ** 2:
+        apellidos += f" {i}"
+    return nombre, apellidos
+
+
+def respuestas_alumno(rng, proporcion_errores=0.2):
+    """
+    Respuestas de un alumno: lista de (operación, números, correcta).
+    Una respuesta incorrecta pierde su último elemento.
+    """
+    respuestas = []
+    for operacion, numeros in RESPUESTAS_R3:
+        correcta = rng.random() >= proporcion_errores
+        respuestas.append((operacion, numeros if correcta else numeros[:-1], correcta))
+    return respuestas
+
+
+# ==================== R3MD - WORD ====================
+
+def generar_docx_r3(nombre, respuestas):
+    """Documento Word con 3 tablas de encabezado, una de ejemplo y una tabla por inciso"""
+    from docx import Document
+
+    doc = Document()
+    doc.add_paragraph(f"Nombre completo: {nombre}")
+    for titulo in ("Datos generales", "Instrucciones", "U = {1,...,14}  A = {2,4,...,14}"):
+        doc.add_table(rows=1, cols=1).cell(0, 0).text = titulo
+    doc.add_table(rows=1, cols=1).cell(0, 0).text = (
+        "Ejemplo\nResultado de la operación: A ∪ B = {1,2,3,4,5,6,8,10,12,13,14}")
+    for operacion, numeros, _ in respuestas:
+        tabla = doc.add_table(rows=2, cols=1)
+        tabla.cell(0, 0).text = f"Operación {operacion}"
+        tabla.cell(1, 0).text = f"Resultado de la operación: {operacion} = {{{','.join(numeros)}}}"
+    salida = io.BytesIO()
+    doc.save(salida)
+    return salida.getvalue()
+
+
+# ==================== R3MD - PDF ====================
+
+def _escribir_conjunto(numeros, estilo):
+    """Líneas de texto de un conjunto en el estilo de delimitadores indicado"""
+    lista = ", ".join(numeros)
+    if estilo == "llaves":
+        return [f"{{{lista}}}"]
+    if estilo == "corchetes":
+        return [f"[{lista}]"]
+    if estilo == "parentesis":
+        return [f"({lista})"]
+    if estilo == "llave_paren":
+        return [f"{{{lista})"]
+    if estilo == "corchete_llave":
+        return [f"[{lista}}}"]
+    if estilo == "sueltos":
+        return [lista]
+    # "partido": la respuesta queda repartida en dos líneas
+    mitad = max(1, len(numeros) // 2)
+    return [f"{{{', '.join(numeros[:mitad])},", f"{', '.join(numeros[mitad:])}}}"]
+
+
+def texto_propio(rng, palabras=60, por_linea=10):
+    """Líneas de palabras al azar del VOCABULARIO: la redacción propia de un alumno"""
+    elegidas = [rng.choice(VOCABULARIO) for _ in range(palabras)]
+    return [" ".join(elegidas[i:i + por_linea]) for i in range(0, palabras, por_linea)]
+
+
+def lineas_pdf_r3(nombre, respuestas, rng):
+    """Texto del PDF de una entrega, línea por línea (operadores escritos con palabras)"""
+    lineas = [
+        "Universidad Virtual - Matematicas Discretas",
+        f"Nombre completo: {nombre}",
+        "U = {1,2,3,4,5,6,7,8,9,10,11,12,13,14}",
+        "A = {2,4,6,8,10,12,14}",
+        "B = {1,2,3,5,8,13}",
+        "C = {1,2,4,6,7,10,11,13}",
+        "",
+    ]
+    for i, (operacion, numeros, _) in enumerate(respuestas):
+        operacion_texto = (operacion.replace("∩", "interseccion").replace("∪", "union")
+                           .replace("′", "'").replace("–", "-"))
+        estilo = ESTILOS_PDF[rng.randrange(len(ESTILOS_PDF))]
+        inciso = chr(ord('a') + i) if rng.random() < 0.7 else str(i + 1)
+        lineas.append(f"{inciso}) {operacion_texto}")
+        lineas.append("Resultado de la operación:")
+        conjunto = _escribir_conjunto(numeros, estilo)
+        conjunto[0] = f"{operacion_texto} = {conjunto[0]}"
+        lineas.extend(conjunto)
+        lineas.append("")
+    lineas.append("Procedimiento:")
+    lineas.extend(texto_propio(rng))
+    lineas.append("Créditos: elaborado por el alumno")
+    return lineas
+
+
+def _texto_pdf(texto):
+    """Cadena literal de PDF (WinAnsi) con paréntesis y barras escapados"""
+    datos = texto.encode('cp1252', errors='replace')
+    return datos.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def generar_pdf(lineas, lineas_por_pagina=45):
+    """PDF mínimo (Helvetica, sin dependencias) con una línea de texto por renglón"""
+    paginas = [lineas[i:i + lineas_por_pagina] for i in range(0, len(lineas), lineas_por_pagina)] or [[]]
+    objetos = []  # contenido de los objetos 1..n
+
+    def agregar(contenido):
+        objetos.append(contenido)
+        return len(objetos)
+
+    catalogo = agregar(None)
+    raiz_paginas = agregar(None)
+    fuente = agregar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    hijos = []
+    for renglones in paginas:
+        flujo = [b"BT /F1 11 Tf 14 TL 50 800 Td"]
+        for renglon in renglones:
+            flujo.append(b"(" + _texto_pdf(renglon) + b") Tj T*")
+        flujo.append(b"ET")
+        comprimido = zlib.compress(b"\n".join(flujo))
+        contenido = agregar(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(comprimido)
+                            + comprimido + b"\nendstream")
+        hijos.append(agregar(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (raiz_paginas, fuente, contenido)))
+    objetos[catalogo - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % raiz_paginas
+    objetos[raiz_paginas - 1] = (b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % h for h in hijos)
+                                 + b"] /Count %d >>" % len(hijos))
+
+    salida = io.BytesIO()
+    salida.write(b"%PDF-1.4\n")
+    posiciones = []
+    for numero, contenido in enumerate(objetos, start=1):
+        posiciones.append(salida.tell())
+        salida.write(b"%d 0 obj\n" % numero + contenido + b"\nendobj\n")
+    inicio_xref = salida.tell()
+    salida.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1))
+    for posicion in posiciones:
+        salida.write(b"%010d 00000 n \n" % posicion)
+    salida.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                 % (len(objetos) + 1, catalogo, inicio_xref))
+    return salida.getvalue()
+
+
+def generar_entregas_r3(cantidad, formato, semilla=0):
+    """
+    Lista de entregas R3MD sintéticas: dicts con nombre_archivo, contenido (bytes),
+    texto (solo PDF, el texto que se escribió), incisos_correctos (lista de bool)
+    y copia_de (nombre_archivo de la entrega copiada, o None).
+    """
+    rng = random.Random(semilla)
+    entregas = []
+    lineas = respuestas = None
+    for i in range(cantidad):
+        nombre = " ".join(nombre_alumno(i)).title()
+        copia = i % COPIAS_CADA == COPIAS_CADA - 1
+        if not copia:
+            respuestas = respuestas_alumno(rng)
+        if formato == "docx":
+            contenido = generar_docx_r3(nombre, respuestas)
+            texto = None
+        else:
+            # La copia conserva todo el texto de la anterior salvo el nombre
+            lineas = ([f"Nombre completo: {nombre}" if linea.startswith("Nombre completo:") else linea
+                       for linea in lineas] if copia else lineas_pdf_r3(nombre, respuestas, rng))
+            contenido = generar_pdf(lineas)
+            texto = "\n".join(lineas)
+        entregas.append({
+            'nombre_archivo': f"entrega_{i:05d}.{formato}",
+            'contenido': contenido,
+            'texto': texto,
+            'incisos_correctos': [correcta for _, _, correcta in respuestas],
+            'copia_de': entregas[-1]['nombre_archivo'] if copia else None,
+        })
+    return entregas
+
+
+# ==================== R4MD - FORO Y LIBRO DE CALIFICACIONES ====================
+
+FRASES_FORO = [
+    "Hola a todos, mi nombre es {nombre} y estudio desde casa.",
+    "Una proposición simple es un enunciado que puede ser verdadero o falso.",
+    "Ejemplo de proposición simple: El sol es una estrella.",
+    "La proposición atómica no tiene conectores lógicos.",
+    "Una proposición compuesta se forma con conectores como y, o, si entonces.",
+    "Ejemplo: Si llueve entonces llevo paraguas.",
+    "Estudio en la clase de matemáticas o trabajo en la computadora.",
+    "El valor de verdad de una proposición molecular depende de sus partes.",
+    "El perro ladra y el gato duerme.",
+    "Solo si termino el examen saldré con mi familia.",
+]
+
+
+def generar_html_foro(cantidad, semilla=0):
+    """
+    HTML del foro con `cantidad` participaciones (article id="pNNN") de alumnos distintos.
+    Una de cada COPIAS_CADA repite las frases de la anterior (salvo el nombre del saludo).
+    """
+    rng = random.Random(semilla)
+    articulos = []
+    plantillas = []
+    for i in range(cantidad):
+        nombre, apellidos = nombre_alumno(i)
+        if i % COPIAS_CADA != COPIAS_CADA - 1:
+            plantillas = rng.sample(FRASES_FORO, rng.randint(4, len(FRASES_FORO)))
+            plantillas.append("Mi ejemplo: " + " ".join(texto_propio(rng, palabras=40)) + ".")
+        frases = [f.format(nombre=nombre.title()) for f in plantillas]
+        contenido = "".join(f"<p>{f}</p>" for f in frases)
+        articulos.append(
+            f'<article id="p{1000 + i}" class="forum-post-container">'
+            f'<header><address class="author">Por <a href="https://moodle/user/view.php?id={i}">'
+            f'{nombre.title()} {apellidos.title()}</a> - '
+            f'<time datetime="2025-09-{1 + i % 28:02d}T10:{i % 60:02d}:00-06:00">fecha</time></address></header>'
+            f'<div class="content"><div class="posting">{contenido}</div></div></article>'
+        )
+    return "<html><body><div class='forum'>" + "".join(articulos) + "</div></body></html>"
+
+
+def generar_libro_xlsx(cantidad, columnas_extra=20, proporcion_calificados=0.3, semilla=0):
+    """Libro de calificaciones de Moodle con `cantidad` alumnos y columnas de otras actividades"""
+    from openpyxl import Workbook
+
+    rng = random.Random(semilla)
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Calificaciones")
+    extras = [f"Tarea:R{k}. Actividad {k} (Real)" for k in range(5, 5 + columnas_extra)]
+    hoja.append(["Nombre", "Apellido(s)", "Número de ID", "Dirección de correo", COLUMNA_CALIFICACION] + extras)
+    for i in range(cantidad):
+        nombre, apellidos = nombre_alumno(i)
+        calificacion = 100.0 if rng.random() < proporcion_calificados else "-"
+        hoja.append([nombre, apellidos, f"{i:08d}", f"alumno{i}@uveg.edu.mx", calificacion]
+                    + [rng.choice([100.0, 80.0, "-"]) for _ in extras])
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+# ==================== R7MD - TABLA DE ENTREGAS ====================
+
+def generar_html_entregas(cantidad):
+    """Tabla de entregas de Moodle: ~50% "Enviado para calificar", el resto sin entrega"""
+    renglones = []
+    for i in range(cantidad):
+        nombre = " ".join(nombre_alumno(i))
+        if i % 2 == 0:
+            estado = '<div class="submissionstatussubmitted">Enviado para calificar</div>'
+        else:
+            estado = '<div class="submissionstatus">No entregado</div>'
+        renglones.append(
+            f'<tr class="r{i % 2}"><td class="cell c0"><input type="checkbox"></td>'
+            f'<td class="cell c1"><img src="u{i}.png"></td>'
+            f'<td class="cell c2"><a href="https://moodle/user/view.php?id={i}">{nombre}</a></td>'
+            f'<td class="cell c3 email">alumno{i}@uveg.edu.mx</td>'
+            f'<td class="cell c4">{estado}</td>'
+            f'<td class="cell c5"><a href="grade.php?id={i}">Calificación</a></td>'
+            f'<td class="cell c6">-</td>'
+            f'<td class="cell c7">lunes, 1 de septiembre de 2025, 10:{i % 60:02d}</td></tr>'
+        )
+    return ("<html><body><table class=\"flexible generaltable\"><tbody>"
+            + "".join(renglones) + "</tbody></table></body></html>")
@@ -0,0 +1,92 @@
+"""
+Equivalencia de limpiar_texto_para_moodle con la implementación original.
+
+La versión actual (una tabla de str.translate y una expresión regular) debe dar
+lo mismo que la original: normalizar NFKD, quitar caracteres de control uno por
+uno con unicodedata.category y colapsar espacios con replace en un ciclo. La
+referencia de abajo es esa versión, con el reemplazo de comillas tipográficas
+que su comentario pretendía (en el original esas líneas no hacían nada porque
+las comillas se habían convertido en comillas simples).
+
+Se prueba con textos al azar (semilla fija) armados de pedazos de ASCII,
+acentos precompuestos y combinantes, caracteres de control y de formato,
+espacios raros, comillas, emojis y otros alfabetos, más casos escritos a mano.
+Termina con código 1 si algún texto difiere.
+
+Uso:
+    python benchmarks/equivalencia_limpiar_moodle.py
+    python benchmarks/equivalencia_limpiar_moodle.py --casos 100000 --semilla 7
+"""
+import argparse
+import os
+import random
+import sys
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retroalimentacion.texto import limpiar_texto_para_moodle  # noqa: E402
+
+
+def limpiar_referencia(texto):
+    """limpiar_texto_para_moodle original (con las comillas tipográficas corregidas)"""
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = ''.join(char for char in texto if unicodedata.category(char)[0] != 'C')
+    texto = texto.replace('“', '"').replace('”', '"')
+    texto = texto.replace('‘', "'").replace('’', "'")
+    while '  ' in texto:
+        texto = texto.replace('  ', ' ')
+    return texto.strip()
+
+
+# Pedazos de los que se arman los textos al azar
+ALFABETOS = [
+    "abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ 0123456789 .,;:¿?¡!()",
+    "áéíóúüñÁÉÍÓÚÜÑàèçãõâêôœæß",
+    "\u0301\u0300\u0308\u0303\u0327",                      # acentos combinantes
+    "\x00\x07\t\n\r\x0b\x0c\x1b\x7f\x85\x9f",              # control (Cc)
+    "\u200b\u200c\u200d\u200e\u2060\ufeff\u00ad",          # formato (Cf)
+    "\ue000\uf8ff",                                        # uso privado (Co)
+    "\u00a0\u2002\u2003\u2009\u3000\u2028\u2029",          # espacios y separadores
+    "“”‘’\"'«»‹›„",                                        # comillas
+    "ﬁﬂ①²½™㎏Ａｂｃ",                                          # compatibilidad (NFKD los descompone)
+    "∪∩′–−∈∅ℕℤ→⇔¬∧∨",                                      # símbolos de los ejercicios
+    "😀👍🏽🇲🇽",                                               # emojis y secuencias
+    "Ωλπσ Привет 中文 العربية",                              # otros alfabetos
+    "  ",                                                  # espacios seguidos
+]
+
+CASOS_FIJOS = [
+    "", " ", "   ", "\t", "\n\n", "a  b", "a   \u00a0 b", "  hola  ", "“hola”",
+    "‘a’", "ﬁ", "Ａ", "e\u0301", "\u200b", "a\x00b", " \u200b ", "a \u200b b", "\ufeff texto",
+    "Excelente participación, JOSÉ.  \n  Sigue así.", "C – B′ = {1, 2, 13}",
+]
+
+
+def texto_al_azar(rng):
+    partes = []
+    for _ in range(rng.randint(0, 12)):
+        alfabeto = rng.choice(ALFABETOS)
+        partes.append("".join(rng.choice(alfabeto) for _ in range(rng.randint(1, 8))))
+    return "".join(partes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Equivalencia de limpiar_texto_para_moodle con la original")
+    parser.add_argument("--casos", type=int, default=20000)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    textos = CASOS_FIJOS + [texto_al_azar(rng) for _ in range(args.casos)]
+    distintos = [t for t in textos if limpiar_texto_para_moodle(t) != limpiar_referencia(t)]
+
+    for texto in distintos[:10]:
+        print(f"❌ {texto!r}: {limpiar_texto_para_moodle(texto)!r} != {limpiar_referencia(texto)!r}")
+    print(f"{len(textos)} texto(s), {len(distintos)} distinto(s)")
+    if distintos:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
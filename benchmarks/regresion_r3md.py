@@ -0,0 +1,146 @@
+"""
+Regresión de correctitud y tiempo de los detectores de conjuntos de R3MD.
+
+Corre extraer_conjunto_agresivo, extraer_respuestas_desde_doc (Word) y
+buscar_conjunto_MAXIMA_AGRESIVIDAD (PDF, vía evaluar_documento_r3md) sobre el
+corpus de corpus_r3md.py y reporta juntos:
+- precisión por inciso contra la verdad escrita a mano en el corpus
+- tiempo por documento
+- diferencias contra la salida de referencia guardada (salidas_r3md.json)
+
+Una optimización de los detectores debe dejar la salida de referencia igual
+(o cambiarla solo donde mejore la precisión, y entonces guardarla de nuevo).
+Termina con código 1 si alguna salida cambió.
+
+Uso:
+    python benchmarks/regresion_r3md.py
+    python benchmarks/regresion_r3md.py --detalle      # muestra cada caso fallido
+    python benchmarks/regresion_r3md.py --guardar      # actualiza la salida de referencia
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus_r3md import CASOS_CONJUNTO, DOCUMENTOS_PDF, DOCUMENTOS_WORD, construir_docx  # noqa: E402
+from retroalimentacion.conjuntos import ConjuntoBits  # noqa: E402
+from retroalimentacion.r3md import evaluar_documento_r3md, extraer_conjunto_agresivo  # noqa: E402
+
+SALIDAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "salidas_r3md.json")
+
+
+def _ordenado(conjunto):
+    return [str(numero) for numero in conjunto]
+
+
+def medir(funcion, *argumentos, repeticiones=5):
+    """Mejor tiempo (segundos) de varias repeticiones y el último resultado"""
+    mejor = float('inf')
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(*argumentos)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+# ==================== DETECTORES ====================
+# Cada uno devuelve {id: {'salida': ..., 'aciertos': [bool], 'segundos': float}}
+
+def correr_conjuntos(repeticiones):
+    casos = {}
+    for id_caso, texto, verdad in CASOS_CONJUNTO:
+        segundos, conjunto = medir(extraer_conjunto_agresivo, texto, repeticiones=repeticiones)
+        casos[id_caso] = {
+            'salida': _ordenado(conjunto),
+            'aciertos': [conjunto == ConjuntoBits.desde_numeros(verdad)],
+            'segundos': segundos,
+        }
+    return casos
+
+
+def correr_pdf(repeticiones):
+    casos = {}
+    for documento in DOCUMENTOS_PDF:
+        segundos, resultado = medir(evaluar_documento_r3md, documento['texto'], None,
+                                    repeticiones=repeticiones)
+        casos[documento['id']] = {
+            'salida': [[r.encontrado, r.distancia] for r in resultado.incisos],
+            'aciertos': [r.encontrado == correcto for r, correcto in zip(resultado.incisos, documento['correctos'])],
+            'segundos': segundos,
+        }
+    return casos
+
+
+def correr_word(repeticiones):
+    casos = {}
+    for documento in DOCUMENTOS_WORD:
+        doc = construir_docx(documento['tablas'])
+        segundos, resultado = medir(evaluar_documento_r3md, "", doc, repeticiones=repeticiones)
+        casos[documento['id']] = {
+            'salida': [_ordenado(r) for r in resultado.respuestas_word],
+            'aciertos': [r.encontrado == correcto for r, correcto in zip(resultado.incisos, documento['correctos'])],
+            'segundos': segundos,
+        }
+    return casos
+
+
+DETECTORES = [
+    ("extraer_conjunto_agresivo", correr_conjuntos),
+    ("word", correr_word),
+    ("pdf", correr_pdf),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regresión de los detectores de conjuntos de R3MD")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--salidas", default=SALIDAS)
+    parser.add_argument("--detalle", action="store_true", help="lista los casos con incisos mal detectados")
+    parser.add_argument("--guardar", action="store_true", help="guarda las salidas como nueva referencia")
+    args = parser.parse_args()
+
+    referencia = {}
+    if os.path.exists(args.salidas):
+        with open(args.salidas, 'r', encoding='utf-8') as f:
+            referencia = json.load(f)
+
+    salidas = {}
+    cambios = 0
+    print(f"{'detector':<28}{'casos':>7}{'incisos':>9}{'precisión':>11}{'ms/caso':>10}{'máx ms':>9}  referencia")
+    for nombre, correr in DETECTORES:
+        casos = correr(args.repeticiones)
+        salidas[nombre] = {id_caso: caso['salida'] for id_caso, caso in casos.items()}
+
+        aciertos = [a for caso in casos.values() for a in caso['aciertos']]
+        tiempos = [caso['segundos'] for caso in casos.values()]
+        base = referencia.get(nombre)
+        if base is None:
+            estado = "sin referencia"
+        else:
+            distintos = [id_caso for id_caso, salida in salidas[nombre].items() if base.get(id_caso) != salida]
+            cambios += len(distintos)
+            estado = f"❌ cambió: {', '.join(distintos)}" if distintos else "✅ igual"
+        print(f"{nombre:<28}{len(casos):>7}{len(aciertos):>9}{sum(aciertos) / len(aciertos):>10.1%}"
+              f"{sum(tiempos) / len(tiempos) * 1000:>10.2f}{max(tiempos) * 1000:>9.2f}  {estado}")
+
+        if args.detalle:
+            for id_caso, caso in casos.items():
+                if not all(caso['aciertos']):
+                    fallidos = [i for i, a in enumerate(caso['aciertos']) if not a]
+                    print(f"    {id_caso}: incisos mal detectados {fallidos} -> {caso['salida']}")
+
+    if args.guardar:
+        with open(args.salidas, 'w', encoding='utf-8') as f:
+            json.dump(salidas, f, ensure_ascii=False, indent=1, sort_keys=True)
+        print(f"Salidas de referencia guardadas en {args.salidas}")
+    elif cambios:
+        print(f"{cambios} caso(s) con salida distinta a la referencia")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
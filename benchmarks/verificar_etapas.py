@@ -0,0 +1,76 @@
+"""
+Revisa que cada @medir_etapa del paquete mida la función que su nombre dice.
+
+El nombre de la etapa debe ser "<módulo>.<función decorada>", y los parámetros
+posicionales de bytes_de (si es una lambda) deben coincidir con los primeros de
+la función: si el decorador queda sobre otra función (p. ej. al insertar un
+auxiliar entre el decorador y su función), el reporte de rendimiento mide lo
+que no es y los bytes salen de otro argumento.
+
+Se analiza el código fuente (ast), así que no hace falta tener instaladas las
+dependencias de cada sección.
+
+Uso:
+    python benchmarks/verificar_etapas.py
+"""
+import ast
+import os
+import sys
+
+PAQUETE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "retroalimentacion")
+
+
+def _etapas(arbol):
+    """(línea, nombre de etapa, lambda de bytes_de o None, función decorada) por cada @medir_etapa"""
+    for nodo in ast.walk(arbol):
+        if not isinstance(nodo, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        for decorador in nodo.decorator_list:
+            if not (isinstance(decorador, ast.Call) and isinstance(decorador.func, ast.Name)
+                    and decorador.func.id == "medir_etapa"):
+                continue
+            nombre = decorador.args[0].value if decorador.args else None
+            bytes_de = next((k.value for k in decorador.keywords if k.arg == "bytes_de"), None)
+            yield decorador.lineno, nombre, bytes_de if isinstance(bytes_de, ast.Lambda) else None, nodo
+
+
+def revisar_modulo(ruta):
+    """Lista de problemas (texto) de un archivo"""
+    modulo = os.path.splitext(os.path.basename(ruta))[0]
+    with open(ruta, 'r', encoding='utf-8') as f:
+        arbol = ast.parse(f.read(), ruta)
+
+    problemas = []
+    for linea, nombre, bytes_de, funcion in _etapas(arbol):
+        esperado = f"{modulo}.{funcion.name}"
+        if nombre != esperado:
+            problemas.append(f"{modulo}.py:{linea}: la etapa {nombre!r} decora a {funcion.name} "
+                             f"(se esperaba {esperado!r})")
+        if bytes_de is not None:
+            parametros_lambda = [a.arg for a in bytes_de.args.posonlyargs + bytes_de.args.args]
+            parametros = [a.arg for a in funcion.args.posonlyargs + funcion.args.args]
+            if parametros_lambda != parametros[:len(parametros_lambda)]:
+                problemas.append(f"{modulo}.py:{linea}: bytes_de recibe {parametros_lambda} pero "
+                                 f"{funcion.name} empieza con {parametros[:len(parametros_lambda)]}")
+    return problemas
+
+
+def main():
+    problemas = []
+    revisadas = 0
+    for archivo in sorted(os.listdir(PAQUETE)):
+        if archivo.endswith(".py"):
+            ruta = os.path.join(PAQUETE, archivo)
+            with open(ruta, 'r', encoding='utf-8') as f:
+                revisadas += sum(1 for _ in _etapas(ast.parse(f.read(), ruta)))
+            problemas.extend(revisar_modulo(ruta))
+
+    for problema in problemas:
+        print(f"❌ {problema}")
+    print(f"{revisadas} etapa(s) revisadas, {len(problemas)} problema(s)")
+    if problemas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
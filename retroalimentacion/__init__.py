@@ -0,0 +1,30 @@
+"""
+Motor del Sistema de Retroalimentación (Matemáticas Discretas), sin interfaz.
+
+- r3md: evaluación de ejercicios de conjuntos en documentos Word/PDF
+- r4md: calificación automática de participaciones del foro de proposiciones lógicas
+- r7md: tabla de entregas de Moodle, cola de notificados y mensajes predefinidos
+- texto, excel, nombres, conjuntos: utilidades compartidas
+- similitud: entregas casi idénticas en un lote (MinHash + LSH)
+- almacen: archivos JSON compartidos entre sesiones (candado, escritura atómica, combinación)
+- trabajos: lotes de calificación en segundo plano que sobreviven a las recargas de la página
+- puntos_control: resultados por elemento de un lote, para reanudarlo si se interrumpe
+- rendimiento: medición opcional de tiempos por etapa
+
+La app de Streamlit (app_v10_multi.py) es solo una vista sobre estas funciones;
+también se pueden usar desde scripts, benchmarks o procesos de trabajo.
+"""
+from .conjuntos import ConjuntoBits, evaluar_expresion
+from .r3md import (
+    CONJUNTOS_BASE_R3, EXPRESIONES_FIJAS, OPERACIONES_R3, ClaveR3, ResultadoDocumentoR3, ResultadoInciso,
+    TrazaInciso, calificar_documento_r3md, evaluar_documento_r3md, generar_claves_r3md, generar_mensaje_r3md,
+    huella_documento_r3md, id_alumno_desde_archivo, preparar_expresiones_r3md, traza_compacta_r3md
+)
+from .r4md import (
+    Participacion, ResultadoCalificacionR4, calificar_participaciones_r4, extraer_participaciones_html,
+    generar_retroalimentacion_r4, marcar_duplicados_r4, punto_control_lote_r4
+)
+from .r7md import Entrega, extraer_entregas_desde_html
+from .puntos_control import PuntoControl
+from .similitud import GrupoSimilar, ParSimilar, agrupar_similares
+from .trabajos import Trabajo, enviar_lote, enviar_trabajo, listar_trabajos, obtener_trabajo
@@ -0,0 +1,115 @@
+"""
+Archivos JSON compartidos entre sesiones (historial de R4MD, cola de R7MD).
+
+Varios tutores usan el mismo servidor de Streamlit, así que dos sesiones pueden
+guardar el mismo archivo a la vez. Cada guardado:
+- toma un candado de archivo (fcntl en Linux/macOS, msvcrt en Windows) solo
+  mientras lee, combina y escribe; calificar un lote no lo retiene, así que
+  las sesiones no se forman en fila
+- combina lo que hay en disco con lo de la sesión (combinación optimista): lo
+  que otra sesión guardó mientras tanto no se pierde
+- escribe a un archivo temporal y lo reemplaza con os.replace, así que un
+  lector nunca ve un JSON a medio escribir y leer no necesita candado
+"""
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def candado_archivo(ruta):
+    """Candado exclusivo (entre procesos e hilos) sobre ruta + '.lock'"""
+    carpeta = os.path.dirname(ruta)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    with open(ruta + '.lock', 'a+b') as archivo:
+        if fcntl is not None:
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+        else:
+            archivo.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK se rinde después de 10 s; se sigue esperando
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+            else:
+                archivo.seek(0)
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def leer_json(ruta, vacio):
+    """Contenido de un JSON, o `vacio` si no existe"""
+    if os.path.exists(ruta):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return vacio
+
+
+def escribir_json_atomico(ruta, datos, sincronizar=True):
+    """
+    Escribe a un temporal en la misma carpeta y lo pone en lugar de `ruta` de una sola vez.
+    sincronizar=False omite el fsync: sigue a salvo de un proceso que muere, no de un
+    corte de luz (suficiente para datos que se pueden recalcular).
+    """
+    carpeta = os.path.dirname(ruta) or '.'
+    os.makedirs(carpeta, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, prefix='.' + os.path.basename(ruta), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False, indent=2)
+            if sincronizar:
+                f.flush()
+                os.fsync(f.fileno())
+        for intento in range(10):
+            try:
+                os.replace(temporal, ruta)
+                break
+            except PermissionError:  # Windows: un lector tiene el archivo abierto
+                if intento == 9:
+                    raise
+                time.sleep(0.05)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def actualizar_json(ruta, combinar, vacio, ruta_lectura=None):
+    """
+    Lectura-combinación-escritura bajo candado: combinar(en_disco) -> datos a guardar.
+    ruta_lectura permite leer de otro archivo (p. ej. el de una versión anterior)
+    si `ruta` todavía no existe. Retorna lo guardado.
+    """
+    with candado_archivo(ruta):
+        lectura = ruta if ruta_lectura is None or os.path.exists(ruta) else ruta_lectura
+        datos = combinar(leer_json(lectura, vacio))
+        escribir_json_atomico(ruta, datos)
+    return datos
+
+
+def mover_a_papelera(ruta):
+    """
+    Renombra el archivo a ruta.AAAAMMDD_HHMMSS.bak en lugar de borrarlo (bajo su
+    candado, para no perder un guardado en curso). Retorna la ruta nueva o None.
+    """
+    with candado_archivo(ruta):
+        if not os.path.exists(ruta):
+            return None
+        destino = f"{ruta}.{datetime.now().strftime('%Y%m%d_%H%M%S')}.bak"
+        os.replace(ruta, destino)
+    return destino
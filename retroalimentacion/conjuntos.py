@@ -0,0 +1,263 @@
+"""
+Conjuntos de números naturales como máscara de bits.
+
+Los conjuntos de R3MD viven en un universo pequeño (1 a 14), así que cada
+conjunto es un entero: el bit n indica si n pertenece. Igualdad, diferencia,
+unión e intersección son operaciones de enteros, y recorrerlo ya da los
+números ordenados. Los números grandes (años, folios) que a veces aparecen
+en el texto se guardan aparte para no crear enteros enormes, y siguen
+contando para la igualdad igual que en un set.
+"""
+
+# Números a partir de este valor se guardan en un frozenset aparte
+LIMITE_BITS = 1024
+
+_SIN_GRANDES = frozenset()
+
+
+class ConjuntoBits:
+    """Conjunto inmutable de enteros no negativos respaldado por una máscara de bits"""
+    __slots__ = ('_bits', '_grandes')
+
+    def __init__(self, bits=0, grandes=_SIN_GRANDES):
+        self._bits = bits
+        self._grandes = grandes
+
+    @classmethod
+    def desde_numeros(cls, numeros):
+        """Conjunto a partir de números (int o texto con dígitos, p. ej. '013' -> 13)"""
+        bits = 0
+        grandes = None
+        for numero in numeros:
+            valor = int(numero)
+            if valor < LIMITE_BITS:
+                bits |= 1 << valor
+            else:
+                if grandes is None:
+                    grandes = set()
+                grandes.add(valor)
+        return cls(bits, frozenset(grandes) if grandes else _SIN_GRANDES)
+
+    @staticmethod
+    def _como_conjunto(otro):
+        if isinstance(otro, ConjuntoBits):
+            return otro
+        if isinstance(otro, (set, frozenset)):
+            return ConjuntoBits.desde_numeros(otro)
+        return None
+
+    def __eq__(self, otro):
+        otro = self._como_conjunto(otro)
+        if otro is None:
+            return NotImplemented
+        return self._bits == otro._bits and self._grandes == otro._grandes
+
+    def __hash__(self):
+        return hash((self._bits, self._grandes))
+
+    def __len__(self):
+        return bin(self._bits).count('1') + len(self._grandes)
+
+    def __bool__(self):
+        return bool(self._bits or self._grandes)
+
+    def __contains__(self, numero):
+        valor = int(numero)
+        if valor < LIMITE_BITS:
+            return valor >= 0 and bool(self._bits >> valor & 1)
+        return valor in self._grandes
+
+    def __iter__(self):
+        """Los números en orden ascendente"""
+        bits = self._bits
+        while bits:
+            menor = bits & -bits
+            yield menor.bit_length() - 1
+            bits ^= menor
+        yield from sorted(self._grandes)
+
+    def __sub__(self, otro):
+        return ConjuntoBits(self._bits & ~otro._bits, self._grandes - otro._grandes)
+
+    def __or__(self, otro):
+        return ConjuntoBits(self._bits | otro._bits, self._grandes | otro._grandes)
+
+    def __and__(self, otro):
+        return ConjuntoBits(self._bits & otro._bits, self._grandes & otro._grandes)
+
+    @property
+    def mascara(self):
+        """La máscara de bits (solo los números menores a LIMITE_BITS)"""
+        return self._bits
+
+    def formatear(self):
+        """Texto ordenado: {1, 2, 13}"""
+        return "{" + ", ".join(map(str, self)) + "}"
+
+    def __repr__(self):
+        return f"ConjuntoBits({self.formatear()})"
+
+
+VACIO = ConjuntoBits()
+
+
+# ==================== ÁLGEBRA DE CONJUNTOS ====================
+# Expresiones como "C – B′" o "(A ∪ B) ∩ C′" sobre conjuntos con nombre.
+# Precedencia: complemento (posfijo) > intersección > unión y diferencia
+# (estas dos de izquierda a derecha). El complemento es respecto a U.
+
+# Cada símbolo aceptado y el operador que representa
+_OPERADORES = {
+    '∪': '∪',
+    '∩': '∩', 'Ո': '∩',  # "Ո" (armenia) aparece en documentos en lugar de ∩
+    '–': '–', '-': '–', '−': '–', '\\': '–',
+    '′': '′', "'": '′', '’': '′', 'ᶜ': '′',
+    '(': '(', ')': ')',
+}
+
+
+def _tokenizar(texto):
+    """Lista de (tipo, texto): nombres de conjunto, operadores y paréntesis"""
+    tokens = []
+    i = 0
+    while i < len(texto):
+        caracter = texto[i]
+        if caracter.isspace():
+            i += 1
+        elif caracter in _OPERADORES:
+            tokens.append((_OPERADORES[caracter], caracter))
+            i += 1
+        elif caracter.isalpha():
+            fin = i + 1
+            while fin < len(texto) and (texto[fin].isalnum() or texto[fin] == '_') \
+                    and texto[fin] not in _OPERADORES:
+                fin += 1
+            tokens.append(('nombre', texto[i:fin]))
+            i = fin
+        else:
+            raise ValueError(f"Carácter no reconocido en la expresión {texto!r}: {caracter!r}")
+    return tokens
+
+
+class _Analizador:
+    """Descenso recursivo: expresion := termino ((∪|–) termino)*, termino := factor (∩ factor)*"""
+
+    def __init__(self, texto):
+        self.texto = texto
+        self.tokens = _tokenizar(texto)
+        self.posicion = 0
+
+    def _siguiente(self):
+        return self.tokens[self.posicion][0] if self.posicion < len(self.tokens) else None
+
+    def _error(self, detalle):
+        return ValueError(f"Expresión de conjuntos inválida {self.texto!r}: {detalle}")
+
+    def analizar(self):
+        arbol = self._expresion()
+        if self.posicion != len(self.tokens):
+            raise self._error(f"sobra {self.tokens[self.posicion][1]!r}")
+        return arbol
+
+    def _expresion(self):
+        arbol = self._termino()
+        while self._siguiente() in ('∪', '–'):
+            operador = self.tokens[self.posicion][0]
+            self.posicion += 1
+            arbol = (operador, arbol, self._termino())
+        return arbol
+
+    def _termino(self):
+        arbol = self._factor()
+        while self._siguiente() == '∩':
+            self.posicion += 1
+            arbol = ('∩', arbol, self._factor())
+        return arbol
+
+    def _factor(self):
+        tipo = self._siguiente()
+        if tipo == 'nombre':
+            arbol = ('nombre', self.tokens[self.posicion][1])
+            self.posicion += 1
+        elif tipo == '(':
+            self.posicion += 1
+            arbol = self._expresion()
+            if self._siguiente() != ')':
+                raise self._error("falta ')'")
+            self.posicion += 1
+        else:
+            raise self._error("se esperaba un conjunto o '('")
+        while self._siguiente() == '′':
+            self.posicion += 1
+            arbol = ('′', arbol)
+        return arbol
+
+
+_ARBOLES = {}
+
+
+def compilar_expresion(texto):
+    """Árbol de la expresión (tuplas anidadas); se analiza una sola vez por texto"""
+    arbol = _ARBOLES.get(texto)
+    if arbol is None:
+        arbol = _ARBOLES[texto] = _Analizador(texto).analizar()
+    return arbol
+
+
+def _evaluar(arbol, conjuntos):
+    operador = arbol[0]
+    if operador == 'nombre':
+        try:
+            return conjuntos[arbol[1]]
+        except KeyError:
+            raise ValueError(f"Conjunto no definido: {arbol[1]}") from None
+    if operador == '′':
+        if 'U' not in conjuntos:
+            raise ValueError("El complemento requiere el universo U")
+        return conjuntos['U'] - _evaluar(arbol[1], conjuntos)
+    izquierda = _evaluar(arbol[1], conjuntos)
+    derecha = _evaluar(arbol[2], conjuntos)
+    if operador == '∪':
+        return izquierda | derecha
+    if operador == '∩':
+        return izquierda & derecha
+    return izquierda - derecha
+
+
+def evaluar_expresion(texto, conjuntos):
+    """
+    Resultado (ConjuntoBits) de una expresión como "C – B′" con los conjuntos
+    dados: dict {nombre: ConjuntoBits o números}; el complemento usa conjuntos['U'].
+    """
+    conjuntos = {nombre: valor if isinstance(valor, ConjuntoBits) else ConjuntoBits.desde_numeros(valor)
+                 for nombre, valor in conjuntos.items()}
+    return _evaluar(compilar_expresion(texto), conjuntos)
+
+
+def _evaluar_mascaras(arbol, mascaras):
+    operador = arbol[0]
+    if operador == 'nombre':
+        try:
+            return mascaras[arbol[1]]
+        except KeyError:
+            raise ValueError(f"Conjunto no definido: {arbol[1]}") from None
+    if operador == '′':
+        if 'U' not in mascaras:
+            raise ValueError("El complemento requiere el universo U")
+        return mascaras['U'] & ~_evaluar_mascaras(arbol[1], mascaras)
+    izquierda = _evaluar_mascaras(arbol[1], mascaras)
+    derecha = _evaluar_mascaras(arbol[2], mascaras)
+    if operador == '∪':
+        return izquierda | derecha
+    if operador == '∩':
+        return izquierda & derecha
+    return izquierda & ~derecha
+
+
+def evaluar_expresion_mascaras(texto, mascaras):
+    """
+    Igual que evaluar_expresion pero sobre máscaras de bits crudas: enteros o
+    arreglos de numpy con una máscara por alumno, así se evalúa un grupo completo
+    en una sola pasada.
+    """
+    return _evaluar_mascaras(compilar_expresion(texto), mascaras)
@@ -0,0 +1,109 @@
+"""
+Lectura de libros de calificaciones de Moodle (.xlsx) y búsqueda de columnas.
+
+Solo se leen las columnas necesarias, en streaming, con python-calamine si está
+instalado o con openpyxl en modo read_only.
+"""
+from importlib.util import find_spec
+
+# Motor rápido opcional para leer Excel (si no está, se usa openpyxl en modo read_only)
+CALAMINE_AVAILABLE = find_spec("python_calamine") is not None
+
+
+def buscar_columna_flexible(df, nombres_posibles):
+    """
+    Busca una columna de manera flexible, considerando diferentes variaciones de mayúsculas/minúsculas
+    y espacios
+    """
+    return resolver_columna(construir_indice_columnas(df.columns), nombres_posibles)
+
+def construir_indice_columnas(columnas):
+    """
+    Construye una sola vez los diccionarios de búsqueda de columnas:
+    nombre exacto, en minúsculas y en minúsculas sin espacios en los extremos.
+    Ante nombres repetidos se conserva la primera columna, como en la búsqueda lineal.
+    """
+    exactas = {}
+    minusculas = {}
+    normalizadas = {}
+    for col in columnas:
+        col_str = str(col)
+        exactas.setdefault(col, col)
+        minusculas.setdefault(col_str.lower(), col)
+        normalizadas.setdefault(col_str.lower().strip(), col)
+    return {'exactas': exactas, 'minusculas': minusculas, 'normalizadas': normalizadas}
+
+def resolver_columna(indice, nombres_posibles):
+    """Devuelve la primera columna que coincida con algún nombre posible (o None)"""
+    for nombre_buscado in nombres_posibles:
+        # Búsqueda exacta
+        if nombre_buscado in indice['exactas']:
+            return indice['exactas'][nombre_buscado]
+        
+        # Búsqueda insensible a mayúsculas/minúsculas
+        col = indice['minusculas'].get(nombre_buscado.lower())
+        if col is not None:
+            return col
+        
+        # Búsqueda con normalización de espacios
+        col = indice['normalizadas'].get(nombre_buscado.lower().strip())
+        if col is not None:
+            return col
+    
+    return None
+
+def _iterar_filas_excel(excel_file):
+    """Itera las filas de la primera hoja del Excel como secuencias de valores"""
+    excel_file.seek(0)
+    if CALAMINE_AVAILABLE:
+        from python_calamine import CalamineWorkbook
+        hoja = CalamineWorkbook.from_filelike(excel_file).get_sheet_by_index(0)
+        yield from hoja.iter_rows()
+        return
+    
+    from openpyxl import load_workbook
+    libro = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        yield from libro.worksheets[0].iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+def cargar_excel_proyectado(excel_file, columnas_buscadas):
+    """
+    Carga de la primera hoja de un Excel solo las columnas que se van a usar.
+    
+    Lee primero el encabezado, resuelve cada columna con las reglas de
+    buscar_columna_flexible y después toma únicamente esas posiciones de cada fila,
+    con python-calamine si está instalado o con openpyxl en modo read_only.
+    Los libros de Moodle tienen cientos de columnas de actividades que nunca se usan.
+    
+    columnas_buscadas: dict {clave: [nombres posibles de la columna]}
+    Retorna (df, encontradas, encabezado):
+    - df: DataFrame solo con las columnas encontradas (con su nombre real)
+    - encontradas: dict {clave: nombre real de la columna o None}
+    - encabezado: lista con todas las columnas del archivo
+    """
+    import pandas as pd
+    
+    filas = _iterar_filas_excel(excel_file)
+    primera_fila = next(filas, ())
+    encabezado = [valor if valor not in (None, '') else f"Unnamed: {i}"
+                  for i, valor in enumerate(primera_fila)]
+    
+    indice = construir_indice_columnas(encabezado)
+    encontradas = {clave: resolver_columna(indice, nombres)
+                   for clave, nombres in columnas_buscadas.items()}
+    columnas_reales = list(dict.fromkeys(c for c in encontradas.values() if c is not None))
+    posiciones = [encabezado.index(c) for c in columnas_reales]
+    
+    datos = []
+    for fila in filas:
+        valores = [fila[p] if p < len(fila) else None for p in posiciones]
+        # Celdas vacías como nulos (calamine las entrega como '')
+        datos.append([None if v == '' else v for v in valores])
+    
+    # Quitar filas vacías al final, igual que pd.read_excel
+    while datos and all(v is None for v in datos[-1]):
+        datos.pop()
+    
+    return pd.DataFrame(datos, columns=columnas_reales), encontradas, encabezado
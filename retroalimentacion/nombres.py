@@ -0,0 +1,127 @@
+"""
+Normalización de nombres de alumnos compartida por R4MD y R7MD.
+
+Todas las comparaciones de nombres (foro contra Excel, tabla de entregas,
+cola de mensajes) pasan por aquí, de modo que "Pérez", "PEREZ" y "perez"
+se consideran el mismo nombre. Los patrones se compilan una sola vez y las
+funciones escalares guardan sus resultados en caché, porque los mismos
+nombres se comparan muchas veces en cada procesamiento.
+"""
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+# Prefijos comunes a eliminar de los nombres capturados
+_PATRONES_PREFIJO_NOMBRE = [
+    re.compile(r'^\s*Nombre\s*del\s*estudiante[:\s]*', re.IGNORECASE),
+    re.compile(r'^\s*Nombre\s*[:\s]*', re.IGNORECASE),
+    re.compile(r'^\s*Estudiante\s*[:\s]*', re.IGNORECASE),
+    re.compile(r'^\s*Alumno\s*[:\s]*', re.IGNORECASE),
+]
+
+# Marcas diacríticas que quedan separadas después de NFKD (acentos, tilde de la ñ, diéresis)
+_PATRON_DIACRITICOS = re.compile('[\u0300-\u036f]')
+# Todo lo que no sea letra o número se trata como separador (guiones, puntos, apóstrofos...)
+_PATRON_SEPARADORES = re.compile(r'[\W_]+')
+
+# Partículas que forman parte del apellido o nombre que les sigue ("de la Cruz", "del Valle")
+_PARTICULAS = {'DE', 'DEL', 'LA', 'LAS', 'LOS', 'Y', 'SAN', 'SANTA', 'DA', 'DI', 'VAN', 'VON'}
+
+
+def limpiar_nombre(nombre_raw):
+    """
+    Limpia el nombre extraído del texto, eliminando prefijos comunes
+    y caracteres no deseados.
+    """
+    if not nombre_raw:
+        return ""
+
+    nombre_limpio = nombre_raw
+    for patron in _PATRONES_PREFIJO_NOMBRE:
+        nombre_limpio = patron.sub('', nombre_limpio)
+
+    # Eliminar espacios extras
+    nombre_limpio = ' '.join(nombre_limpio.split())
+
+    # Capitalizar correctamente
+    nombre_limpio = nombre_limpio.title()
+
+    return nombre_limpio.strip()
+
+
+@lru_cache(maxsize=8192)
+def normalizar_nombre(nombre):
+    """
+    Forma canónica de un nombre para compararlo: mayúsculas, sin acentos,
+    sin signos de puntuación y con un solo espacio entre palabras.
+    Ejemplo: "  José  Núñez-Pérez " -> "JOSE NUNEZ PEREZ"
+    Los valores nulos (None o NaN) se normalizan a cadena vacía.
+    """
+    if nombre is None or nombre != nombre:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(nombre))
+    texto = _PATRON_DIACRITICOS.sub('', texto).upper()
+    return _PATRON_SEPARADORES.sub(' ', texto).strip()
+
+
+def normalizar_serie_nombres(serie):
+    """
+    Versión vectorizada de normalizar_nombre para una columna completa (pd.Series).
+    Aplica exactamente los mismos pasos, con los métodos .str de pandas.
+    """
+    return (serie.fillna('').astype(str)
+                 .str.normalize('NFKD')
+                 .str.replace(_PATRON_DIACRITICOS, '', regex=True)
+                 .str.upper()
+                 .str.replace(_PATRON_SEPARADORES, ' ', regex=True)
+                 .str.strip())
+
+
+@lru_cache(maxsize=8192)
+def separar_nombre(nombre_completo):
+    """
+    Separa un nombre completo "Nombre(s) Apellido(s)" en (nombres, apellidos),
+    conservando la escritura original.
+
+    Las partículas ("de", "del", "de la"...) se unen a la palabra que les sigue.
+    Con tres o más bloques, los dos últimos son los apellidos (paterno y materno);
+    con dos bloques, uno es nombre y otro apellido.
+    Ejemplo: "María de la Luz Pérez García" -> ("María de la Luz", "Pérez García")
+    """
+    bloques = []
+    pendientes = []
+    for palabra in str(nombre_completo).split():
+        pendientes.append(palabra)
+        if normalizar_nombre(palabra) not in _PARTICULAS:
+            bloques.append(' '.join(pendientes))
+            pendientes = []
+    if pendientes:
+        if bloques:
+            bloques[-1] = ' '.join([bloques[-1]] + pendientes)
+        else:
+            bloques.append(' '.join(pendientes))
+
+    if len(bloques) >= 3:
+        return ' '.join(bloques[:-2]), ' '.join(bloques[-2:])
+    if len(bloques) == 2:
+        return bloques[0], bloques[1]
+    return (bloques[0] if bloques else ''), ''
+
+
+def similitud_normalizada(nombre1_normalizado, nombre2_normalizado, minimo=0.0):
+    """
+    Similitud (0 a 1) entre dos nombres ya normalizados. Si una cota superior rápida
+    (quick_ratio) no supera `minimo` se devuelve esa cota sin calcular ratio completo,
+    útil para descartar candidatos cuando ya se tiene un mejor match.
+    """
+    matcher = SequenceMatcher(None, nombre1_normalizado, nombre2_normalizado)
+    cota = matcher.quick_ratio()
+    if cota <= minimo:
+        return cota
+    return matcher.ratio()
+
+
+def similitud_nombres(nombre1, nombre2):
+    """Calcula la similitud entre dos nombres usando SequenceMatcher"""
+    return similitud_normalizada(normalizar_nombre(nombre1), normalizar_nombre(nombre2))
@@ -0,0 +1,65 @@
+"""
+Puntos de control de los lotes de calificación.
+
+Cada elemento terminado (un documento de R3MD, una participación de R4MD) se
+guarda en puntos_control/<lote>/<huella>.json, donde la huella es el sha256 de
+su contenido y de lo que determina su calificación. Si el proceso muere a la
+mitad, al volver a correr el mismo lote los elementos con punto de control se
+toman de disco y solo se califica el resto. Al terminar bien, el lote borra sus
+puntos de control.
+
+Un archivo por elemento: guardar es una escritura atómica pequeña y dos lotes
+que corren a la vez no comparten archivos.
+"""
+import hashlib
+import os
+
+from .almacen import escribir_json_atomico, leer_json
+
+DIRECTORIO_PUNTOS_CONTROL = "puntos_control"
+
+
+def huella(*partes):
+    """sha256 (hex) de varias partes (bytes, texto u otros valores convertidos a texto)"""
+    resumen = hashlib.sha256()
+    for parte in partes:
+        if not isinstance(parte, bytes):
+            parte = str(parte).encode('utf-8')
+        resumen.update(len(parte).to_bytes(8, 'big'))
+        resumen.update(parte)
+    return resumen.hexdigest()
+
+
+class PuntoControl:
+    """Resultados ya calculados de un lote, por huella de elemento"""
+
+    def __init__(self, nombre):
+        self.ruta = os.path.join(DIRECTORIO_PUNTOS_CONTROL, nombre)
+
+    def _archivo(self, clave):
+        return os.path.join(self.ruta, f"{clave}.json")
+
+    def obtener(self, clave):
+        """El resultado guardado para la huella, o None"""
+        return leer_json(self._archivo(clave), None)
+
+    def guardar(self, clave, resultado):
+        """Guarda el resultado (JSON) de un elemento apenas termina"""
+        escribir_json_atomico(self._archivo(clave), resultado, sincronizar=False)
+
+    def cantidad(self):
+        if not os.path.isdir(self.ruta):
+            return 0
+        return sum(1 for archivo in os.listdir(self.ruta) if archivo.endswith('.json'))
+
+    def borrar(self, claves=None):
+        """Borra los puntos de control indicados (o todos los del lote)"""
+        if claves is None:
+            if not os.path.isdir(self.ruta):
+                return
+            claves = [archivo[:-5] for archivo in os.listdir(self.ruta) if archivo.endswith('.json')]
+        for clave in claves:
+            try:
+                os.remove(self._archivo(clave))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,917 @@
+"""
+R3MD - Conjuntos: evaluación de los ejercicios de operaciones con conjuntos.
+
+Detecta las respuestas de cada inciso en documentos Word (tablas con
+"Resultado de la operación:") o PDF (búsqueda agresiva alrededor del inciso),
+las compara con los conjuntos esperados y arma el mensaje de retroalimentación.
+No depende de Streamlit.
+"""
+import hashlib
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from .conjuntos import VACIO, ConjuntoBits, evaluar_expresion, evaluar_expresion_mascaras
+from .puntos_control import huella
+from .rendimiento import medir_etapa
+from .texto import leer_documento
+
+MENSAJES_EXITO_R3 = [
+    "Excelente trabajo, {nombre}. El último ejercicio de este reto demuestra claramente tu dominio y comprensión profunda de los conjuntos. Felicidades por tu esfuerzo. Saludos.",
+    "Muy bien hecho, {nombre}. Tus respuestas son precisas, completas y demuestran que has comprendido perfectamente el tema. Sigue trabajando con esa misma dedicación.",
+    "Perfecto, {nombre}. Se nota que comprendiste el tema de conjuntos de manera integral. Tu trabajo refleja compromiso y entendimiento. Continúa así.",
+    "Buen trabajo, {nombre}. Has resuelto correctamente todos los incisos del reto, mostrando un manejo adecuado de las operaciones con conjuntos. Felicidades.",
+    "Todo correcto, {nombre}. Tu trabajo refleja que has dominado completamente el concepto de operaciones con conjuntos. Excelente desempeño en este reto.",
+    "Felicidades, {nombre}. El ejercicio está resuelto sin errores, lo cual demuestra tu dedicación y comprensión del tema. Sigue adelante con ese nivel.",
+    "Gran resultado, {nombre}. El dominio del tema es evidente en cada una de tus respuestas. Tu esfuerzo y dedicación se reflejan en este trabajo.",
+    "Correcto en todos los puntos, {nombre}. Tu desempeño ha sido sobresaliente en este ejercicio. Sigue manteniendo ese nivel de excelencia.",
+    "Buen cierre del reto, {nombre}. Todas las respuestas son válidas y están correctamente fundamentadas. Felicidades por tu logro.",
+    "Excelente resolución, {nombre}. Cada conjunto está trabajado con precisión y demuestra tu comprensión clara del tema. Muy buen trabajo."
+]
+
+MENSAJES_ERROR_R3 = [
+    "Buen trabajo, {nombre}. Aunque hay algunos detalles que necesitan revisión. Por favor revisa y corrige los puntos señalados, luego reenvía tu trabajo.",
+    "Estás muy cerca del objetivo, {nombre}. Revisa con atención las operaciones que te señalo abajo y realiza los ajustes necesarios.",
+    "Tu avance es bueno, {nombre}, sin embargo hay algunas expresiones que requieren corrección. Te invito a revisar cuidadosamente cada inciso marcado.",
+    "Vamos por buen camino, {nombre}, pero algunos incisos necesitan revisión adicional. Analiza los puntos señalados y realiza las correcciones correspondientes.",
+    "Buen intento, {nombre}, aunque faltan algunos ajustes en ciertas expresiones. Revisa los incisos marcados y corrige según sea necesario.",
+    "Estás entendiendo el tema, {nombre}, pero hay algunos errores que necesitan corrección. Revisa con calma y ajusta donde sea necesario.",
+    "Revisa con atención los conjuntos indicados abajo, {nombre}. Con un poco más de cuidado puedes mejorar significativamente tu resultado.",
+    "Vamos por buen camino, {nombre}, pero aún hay algunas inconsistencias que resolver. Analiza cada punto señalado y realiza las correcciones.",
+    "Casi lo tienes completo, {nombre}. Corrige los puntos marcados como incorrectos y estarás listo. Ánimo, vas muy bien.",
+    "Un pequeño esfuerzo más, {nombre}, y tu trabajo estará perfecto. Revisa los detalles señalados y realiza los ajustes necesarios."
+]
+
+# Conjuntos base del reto. Una variante del ejercicio solo cambia estos valores:
+# las respuestas esperadas se calculan a partir de ellos.
+CONJUNTOS_BASE_R3 = {
+    'U': ConjuntoBits.desde_numeros(range(1, 15)),
+    'A': ConjuntoBits.desde_numeros((2, 4, 6, 8, 10, 12, 14)),
+    'B': ConjuntoBits.desde_numeros((1, 2, 3, 5, 8, 13)),
+    'C': ConjuntoBits.desde_numeros((1, 2, 4, 6, 7, 10, 11, 13)),
+}
+
+OPERACIONES_R3 = ["B ∩ C", "C′", "B ∪ C", "A ∩ C", "A′", "B – A", "C – B′"]
+
+
+@dataclass
+class ResultadoInciso:
+    """Evaluación de un inciso: conjunto esperado contra lo que se encontró en el documento"""
+    letra: str
+    expresion: str
+    conjunto_esperado: ConjuntoBits
+    encontrado: bool
+    conjunto_encontrado: ConjuntoBits
+    distancia: int = -1  # líneas desde el inciso hasta la respuesta (PDF); -1 si no se encontró
+    linea: str = ""      # texto donde se encontró la respuesta (PDF)
+
+
+@dataclass
+class TrazaInciso:
+    """
+    Cómo se resolvió un inciso (modo traza): la estrategia que dio con la respuesta,
+    cuánto texto se revisó y cuánto tardó. Las pasadas de regex cuentan cada patrón
+    aplicado a una línea o celda; no cuentan la extracción de números de una coincidencia.
+    """
+    letra: str
+    estrategia: str  # "word_tabla", "pdf_1", "pdf_2", "pdf_3" o "ninguna"
+    lineas: int = 0  # líneas del PDF (o celdas de Word) revisadas
+    regex: int = 0
+    ms: float = 0.0
+
+
+@dataclass
+class ResultadoDocumentoR3:
+    """Evaluación completa de un documento"""
+    nombre: str
+    texto: str
+    es_word: bool
+    incisos: list = field(default_factory=list)
+    respuestas_word: list = field(default_factory=list)  # ConjuntoBits leídos de las tablas (Word)
+    traza: list = field(default_factory=list)  # TrazaInciso por inciso, solo con trazar=True
+    
+    @property
+    def correctos(self):
+        return [r for r in self.incisos if r.encontrado]
+    
+    @property
+    def incorrectos(self):
+        return [r for r in self.incisos if not r.encontrado]
+    
+    @property
+    def indices_incorrectos(self):
+        return [i for i, r in enumerate(self.incisos) if not r.encontrado]
+
+
+# ========== FUNCIONES PARA WORD ==========
+
+def extraer_numeros_de_texto(texto):
+    """
+    Extrae números de un texto, soportando:
+    - Separados por comas: 1,2,3
+    - Separados por espacios: 1 2 3
+    - Combinaciones: 1, 2, 3 o 1,2, 3
+    Retorna un ConjuntoBits con los números
+    """
+    # Extraer todos los números
+    numeros = re.findall(r'\d+', texto)
+    
+    # Normalizar (convertir a int y luego a string para eliminar ceros a la izquierda)
+    numeros_normalizados = ConjuntoBits.desde_numeros(numeros)
+    
+    return numeros_normalizados
+
+@medir_etapa("r3md.extraer_respuestas_desde_doc")
+def extraer_respuestas_desde_doc(doc, traza=None):
+    """
+    MÉTODO PARA WORD: Extrae TODAS las respuestas de un documento Word.
+    VERSIÓN V10 - Sin código duplicado, solo procesa celdas con "Resultado de la operación:"
+    
+    Mejoras V10:
+    - Eliminado código duplicado que causaba doble extracción
+    - Procesa ÚNICAMENTE celdas con "Resultado de la operación:"
+    - Usa rfind para encontrar el último "=" y extraer correctamente
+    - Extrae exactamente 7 respuestas (no 14)
+    
+    traza, si se indica (dict), recibe 'lineas' (celdas revisadas) y 'regex'.
+    """
+    respuestas = []
+    primera_respuesta = True
+    celdas_revisadas = 0
+    evaluaciones = 0
+    
+    for table_idx, table in enumerate(doc.tables):
+        # Saltar las primeras 3 tablas (encabezado, instrucciones, conjuntos base)
+        if table_idx < 3:
+            continue
+        
+        for row in table.rows:
+            for cell in row.cells:
+                texto_celda = cell.text.strip()
+                celdas_revisadas += 1
+                evaluaciones += 1
+                
+                # ÚNICA ESTRATEGIA: Buscar "Resultado de la operación:"
+                patron_resultado = re.search(r'Resultado\s+de\s+la\s+operaci[oó]n\s*:\s*', texto_celda, re.IGNORECASE)
+                
+                # Si NO tiene el patrón, ignorar completamente esta celda
+                if not patron_resultado:
+                    continue
+                
+                # Extraer texto después del patrón
+                inicio_resultado = patron_resultado.end()
+                texto_solo_resultado = texto_celda[inicio_resultado:].strip()
+                
+                # Verificar que tenga "="
+                if not texto_solo_resultado or '=' not in texto_solo_resultado:
+                    continue
+                
+                # Buscar el ÚLTIMO signo igual
+                ultimo_igual_idx = texto_solo_resultado.rfind('=')
+                if ultimo_igual_idx == -1:
+                    continue
+                
+                # Extraer texto después del último "="
+                texto_despues_igual = texto_solo_resultado[ultimo_igual_idx + 1:].strip()
+                
+                # Extraer números
+                numeros_resultado = extraer_numeros_de_texto(texto_despues_igual)
+                
+                if numeros_resultado:
+                    # Saltar la primera respuesta (ejemplo)
+                    if primera_respuesta:
+                        primera_respuesta = False
+                        continue
+                    
+                    # Agregar respuesta válida
+                    respuestas.append(numeros_resultado)
+                else:
+                    # Conjunto vacío (sin números después del "=")
+                    if not re.search(r'[\d\{\[\(]', texto_despues_igual):
+                        if primera_respuesta:
+                            primera_respuesta = False
+                            continue
+                        respuestas.append(VACIO)
+    
+    if traza is not None:
+        traza.update(lineas=celdas_revisadas, regex=evaluaciones)
+    return respuestas
+
+# ========== FUNCIONES PARA PDF ==========
+
+def extraer_todos_los_numeros(texto):
+    """Extrae TODOS los números de un texto, sin importar el formato"""
+    return ConjuntoBits.desde_numeros(re.findall(r'\d+', texto))
+
+@medir_etapa("r3md.extraer_conjunto_agresivo", bytes_de=lambda texto, *args, **kwargs: len(texto))
+def extraer_conjunto_agresivo(texto, conjuntos=None, filtros=None):
+    """
+    VERSIÓN V5 MEJORADA: Extrae conjuntos de CUALQUIER formato.
+    Detecta: [], {}, (), combinaciones mixtas, números con espacios, y toma el ÚLTIMO conjunto válido.
+    NUEVO V5: Soporta combinaciones mixtas de delimitadores.
+    conjuntos: conjuntos base de la variante (por omisión CONJUNTOS_BASE_R3), para descartar sus definiciones.
+    filtros: el resultado de filtros_conjuntos_r3md ya calculado (evita recalcularlo en cada línea).
+    """
+    conjuntos_base, conjuntos_filtrados = filtros if filtros is not None else filtros_conjuntos_r3md(conjuntos)
+    todos_conjuntos = []
+    
+    # PASO 1: Si hay múltiples "=", dividir y tomar solo lo que está después del último
+    if texto.count('=') > 1:
+        partes = texto.split('=')
+        # Tomar la última parte (después del último "=")
+        texto = partes[-1].strip()
+    
+    # PASO 2: Buscar en TODOS los formatos posibles y guardar todos los conjuntos
+    
+    # ============ COMBINACIONES MIXTAS DE DELIMITADORES ============
+    
+    # { ) - abre con llave, cierra con paréntesis
+    matches = re.finditer(r'\{([^\}\)]*)\)', texto)
+    for match in matches:
+        conjunto = extraer_todos_los_numeros(match.group(1))
+        if conjunto and len(conjunto) >= 2:
+            if conjunto not in conjuntos_filtrados:
+                todos_conjuntos.append(('mixto_llave_paren', conjunto))
+    
+    # { ] - abre con llave, cierra con corchete
+    matches = re.finditer(r'\{([^\}\]]*)\]', texto)
+    for match in matches:
+        conjunto = extraer_todos_los_numeros(match.group(1))
+        if conjunto and len(conjunto) >= 2:
+            if conjunto not in conjuntos_filtrados:
+                todos_conjuntos.append(('mixto_llave_corchete', conjunto))
+    
+    # [ } - abre con corchete, cierra con llave
+    matches = re.finditer(r'\[([^\]\}]*)\}', texto)
+    for match in matches:
+        conjunto = extraer_todos_los_numeros(match.group(1))
+        if conjunto and len(conjunto) >= 2:
+            if conjunto not in conjuntos_filtrados:
+                todos_conjuntos.append(('mixto_corchete_llave', conjunto))
+    
+    # [ ) - abre con corchete, cierra con paréntesis
+    matches = re.finditer(r'\[([^\]\)]*)\)', texto)
+    for match in matches:
+        conjunto = extraer_todos_los_numeros(match.group(1))
+        if conjunto and len(conjunto) >= 2:
+            if conjunto not in conjuntos_filtrados:
+                todos_conjuntos.append(('mixto_corchete_paren', conjunto))
+    
+    # ( } - abre con paréntesis, cierra con llave
+    matches = re.finditer(r'\(([^\)\}]*)\}', texto)
+    for match in matches:
+        conjunto = extraer_todos_los_numeros(match.group(1))
+        if conjunto and len(conjunto) >= 2:
+            if conjunto not in conjuntos_filtrados:
+                todos_conjuntos.append(('mixto_paren_llave', conjunto))
+    
+    # ( ] - abre con paréntesis, cierra con corchete
+    matches = re.finditer(r'\(([^\)\]]*)\]', texto)
+    for match in matches:
+        conjunto = extraer_todos_los_numeros(match.group(1))
+        if conjunto and len(conjunto) >= 2:
+            if conjunto not in conjuntos_filtrados:
+                todos_conjuntos.append(('mixto_paren_corchete', conjunto))
+    
+    # ============ COMBINACIONES ESTÁNDAR ============
+    
+    # Formato 1: Corchetes [] (común en el documento)
+    matches_corchetes = re.finditer(r'\[([^\]]+)\]', texto)
+    for match in matches_corchetes:
+        conjunto = extraer_todos_los_numeros(match.group(1))
+        if conjunto and len(conjunto) >= 2:
+            todos_conjuntos.append(('corchetes', conjunto))
+    
+    # Formato 2: Llaves {}
+    matches_llaves = re.finditer(r'\{([^}]+)\}', texto)
+    for match in matches_llaves:
+        conjunto = extraer_todos_los_numeros(match.group(1))
+        if conjunto and len(conjunto) >= 2:
+            # Filtrar conjuntos que son definiciones base
+            if conjunto not in conjuntos_filtrados:
+                todos_conjuntos.append(('llaves', conjunto))
+    
+    # Formato 3: Paréntesis ()
+    matches_parentesis = re.finditer(r'\(([^)]+)\)', texto)
+    for match in matches_parentesis:
+        contenido = match.group(1)
+        # Filtrar si parece ser hora, fecha, etc.
+        if not re.search(r':\d{2}|Real|Máx', contenido):
+            numeros = extraer_todos_los_numeros(contenido)
+            if len(numeros) >= 2:
+                todos_conjuntos.append(('parentesis', numeros))
+    
+    # Formato 4: Números sueltos separados por comas (sin delimitadores)
+    # Ejemplo: "A Ո C = 2, 4, 6, 10"
+    if ',' in texto and not todos_conjuntos:
+        # Extraer solo la parte después del último "=" si existe
+        if '=' in texto:
+            texto_numeros = texto.split('=')[-1].strip()
+        else:
+            texto_numeros = texto
+        
+        numeros = extraer_todos_los_numeros(texto_numeros)
+        if len(numeros) >= 2:
+            # Verificar que no sea un conjunto base
+            if numeros not in conjuntos_base:
+                todos_conjuntos.append(('sueltos', numeros))
+    
+    # PASO 3: Retornar el ÚLTIMO conjunto encontrado (el más probable de ser el resultado)
+    if todos_conjuntos:
+        return todos_conjuntos[-1][1]  # Retornar solo el conjunto, no el tipo
+    
+    return VACIO
+
+def _buscar_inciso(patrones, linea):
+    """(coincide, patrones evaluados): igual que any(), contando las pasadas de regex"""
+    for evaluados, patron in enumerate(patrones, start=1):
+        if re.search(patron, linea, re.IGNORECASE):
+            return True, evaluados
+    return False, len(patrones)
+
+# Pasadas de patrones que hace extraer_conjunto_agresivo sobre su texto (6 mixtos + 3 estándar)
+_REGEX_POR_CONJUNTO_AGRESIVO = 9
+
+def _cerrar_traza(traza, estrategia, lineas, evaluaciones):
+    if traza is not None:
+        traza.update(estrategia=estrategia, lineas=lineas, regex=evaluaciones)
+
+@medir_etapa("r3md.buscar_conjunto_MAXIMA_AGRESIVIDAD", bytes_de=lambda texto_completo, *args, **kwargs: len(texto_completo))
+def buscar_conjunto_MAXIMA_AGRESIVIDAD(texto_completo, letra_inciso, conjunto_esperado, traza=None,
+                                       conjuntos=None):
+    """
+    MÉTODO PARA PDF: VERSIÓN ULTRA MEJORADA V4
+    - Busca hasta 30 líneas después del inciso
+    - Concatena múltiples líneas para manejar operaciones complejas distribuidas
+    - Busca el patrón "Resultado de la operación:"
+    - Maneja casos donde la operación se extiende en varias líneas con múltiples "="
+    - Toma el ÚLTIMO conjunto cuando hay múltiples en la misma sección
+    - Mejor detección de fin de sección (siguiente inciso o créditos)
+    - ✨ NUEVO V4: Detecta tanto letras (a-g) como números (1-7) en los incisos
+    - ✨ Maneja respuestas en líneas separadas (típico de PDFs)
+    - ✨ Inicia búsqueda DESPUÉS de la definición de conjuntos base
+    
+    traza, si se indica (dict), recibe la estrategia que encontró la respuesta
+    ("pdf_1", "pdf_2", "pdf_3" o "ninguna"), las líneas revisadas y las pasadas de regex.
+    conjuntos: conjuntos base de la variante (por omisión CONJUNTOS_BASE_R3).
+    """
+    filtros = filtros_conjuntos_r3md(conjuntos)
+    conjuntos_filtrados = filtros[1]
+    lineas = texto_completo.split('\n')
+    lineas_revisadas = 0
+    evaluaciones = 0
+    
+    # PASO 1: Encontrar dónde terminan las definiciones de conjuntos base
+    # Buscar la línea que contiene "C = " (último conjunto base definido)
+    inicio_busqueda = 0
+    for i, linea in enumerate(lineas):
+        lineas_revisadas += 1
+        evaluaciones += 1
+        if re.search(r'C\s*=\s*\{.*\d.*\}', linea):
+            inicio_busqueda = i + 1  # Empezar búsqueda después de esta línea
+            break
+    
+    # Convertir letra a número (a=1, b=2, etc.) para buscar también en formato numérico
+    numero_inciso = str(ord(letra_inciso.lower()) - ord('a') + 1)
+    
+    # Patrones para detectar el inciso (letras Y números)
+    patrones_inciso = [
+        # Patrones con LETRAS
+        rf"^{letra_inciso}[\)\.]",           # a) o a.
+        rf"\b{letra_inciso}[\)\.]",          # palabra a) o a.
+        rf"inciso\s+{letra_inciso}\b",       # inciso a
+        rf"^\s*{letra_inciso}\s*[\)\.]",     # a) con espacios
+        rf"^{letra_inciso}\s*$",              # solo "a" en una línea
+        # Patrones con NÚMEROS
+        rf"^{numero_inciso}[\)\.]",          # 1) o 1.
+        rf"\b{numero_inciso}[\)\.]",         # palabra 1) o 1.
+        rf"^\s*{numero_inciso}\s*[\)\.]",    # 1) con espacios
+        rf"^{numero_inciso}\s*$",             # solo "1" en una línea
+    ]
+    
+    for i, linea in enumerate(lineas[inicio_busqueda:], start=inicio_busqueda):
+        lineas_revisadas += 1
+        linea_limpia = linea.strip()
+        if not linea_limpia:
+            continue
+        
+        # Verificar si esta línea contiene el inciso
+        contiene_inciso, evaluados = _buscar_inciso(patrones_inciso, linea_limpia)
+        evaluaciones += evaluados
+        
+        # También verificar la línea anterior
+        if not contiene_inciso and i > 0:
+            linea_anterior = lineas[i-1].strip()
+            contiene_inciso, evaluados = _buscar_inciso(patrones_inciso, linea_anterior)
+            evaluaciones += evaluados
+        
+        if contiene_inciso:
+            # BUSCAR en las siguientes 30 líneas (aumentado desde 15)
+            conjuntos_candidatos = []
+            
+            # ESTRATEGIA 1: Buscar "Resultado de la operación:" y concatenar líneas
+            resultado_encontrado = False
+            lineas_concatenadas = ""
+            inicio_resultado = i
+            
+            for j in range(i, min(i + 30, len(lineas))):
+                lineas_revisadas += 1
+                linea_a_evaluar = lineas[j].strip()
+                
+                # Detectar "Resultado de la operación:"
+                if 'resultado de la operación' in linea_a_evaluar.lower() or \
+                   'resultado de la operacion' in linea_a_evaluar.lower():
+                    resultado_encontrado = True
+                    inicio_resultado = j
+                    continue
+                
+                # Si ya encontramos "Resultado de la operación:", concatenar líneas
+                if resultado_encontrado:
+                    # Detectar si llegamos al siguiente inciso (cualquier letra seguida de ) o . O cualquier número seguido de ) o .)
+                    if j > inicio_resultado + 1:  # No verificar la línea inmediata después
+                        evaluaciones += 2
+                        # Patrones para detectar CUALQUIER inciso (letras a-z O números 1-7)
+                        if (re.match(r'^[a-z][\)\.]', linea_a_evaluar.lower()) or 
+                            re.match(r'^[1-7][\)\.]', linea_a_evaluar)):
+                            # Encontramos el siguiente inciso, detenerse
+                            break
+                    
+                    # Si la línea contiene "CRÉDITOS" o similar, detenerse
+                    if 'créditos' in linea_a_evaluar.lower() or 'autor' in linea_a_evaluar.lower():
+                        break
+                    
+                    # Si la línea está vacía y ya tenemos contenido, puede ser fin de sección
+                    if not linea_a_evaluar and lineas_concatenadas:
+                        # Verificar si las próximas 2 líneas también están vacías
+                        proximas_vacias = sum(1 for k in range(j+1, min(j+3, len(lineas))) 
+                                             if not lineas[k].strip())
+                        if proximas_vacias >= 2:
+                            break
+                    
+                    # Concatenar esta línea
+                    if linea_a_evaluar:  # Solo si no está vacía
+                        lineas_concatenadas += " " + linea_a_evaluar
+                    
+                    # Extraer TODOS los conjuntos de la concatenación actual
+                    # Buscar con llaves primero (formato más común)
+                    patron_llaves = r'\{([^}]*)\}'
+                    matches = list(re.finditer(patron_llaves, lineas_concatenadas))
+                    evaluaciones += 1
+                    
+                    # Si no se encontraron con llaves, buscar en la línea individual también
+                    # (para casos donde el conjunto está solo en una línea)
+                    if not matches and linea_a_evaluar:
+                        evaluaciones += 1
+                        matches_linea = list(re.finditer(patron_llaves, linea_a_evaluar))
+                        if matches_linea:
+                            matches = matches_linea
+                    
+                    for match in matches:
+                        contenido = match.group(1).strip()
+                        numeros = re.findall(r'\d+', contenido)
+                        if numeros and len(numeros) >= 2:
+                            conjunto_temp = ConjuntoBits.desde_numeros(numeros)
+                            
+                            # Filtrar conjuntos base (las definiciones iniciales)
+                            if conjunto_temp not in conjuntos_filtrados:
+                                # Reemplazar si ya existe (mantener solo el último)
+                                # Filtrar candidatos previos del mismo conjunto
+                                conjuntos_candidatos = [c for c in conjuntos_candidatos if c[0] != conjunto_temp]
+                                # Agregar el nuevo (más reciente)
+                                conjuntos_candidatos.append((conjunto_temp, lineas_concatenadas.strip(), j - i))
+            
+            # Buscar el conjunto esperado en los candidatos (tomar el ÚLTIMO que coincida)
+            for conjunto_temp, linea_orig, distancia in reversed(conjuntos_candidatos):
+                if conjunto_temp == conjunto_esperado:
+                    _cerrar_traza(traza, "pdf_1", lineas_revisadas, evaluaciones)
+                    return True, linea_orig[:300], distancia  # Limitar longitud del contexto
+            
+            # ESTRATEGIA 2: Búsqueda con concatenación de líneas sin "Resultado de la operación:"
+            if not conjuntos_candidatos:
+                for j in range(i, min(i + 30, len(lineas))):
+                    lineas_revisadas += 1
+                    evaluaciones += _REGEX_POR_CONJUNTO_AGRESIVO
+                    # Concatenar hasta 7 líneas para buscar el conjunto (aumentado desde 5)
+                    texto_multi_linea = " ".join([lineas[k].strip() for k in range(j, min(j + 7, len(lineas))) 
+                                                  if lineas[k].strip()])
+                    
+                    conjunto_encontrado = extraer_conjunto_agresivo(texto_multi_linea, filtros=filtros)
+                    
+                    if conjunto_encontrado and conjunto_encontrado == conjunto_esperado:
+                        _cerrar_traza(traza, "pdf_2", lineas_revisadas, evaluaciones)
+                        return True, texto_multi_linea[:300], j - i
+            
+            # ESTRATEGIA 3: Búsqueda línea por línea individual
+            for j in range(i, min(i + 30, len(lineas))):
+                lineas_revisadas += 1
+                evaluaciones += _REGEX_POR_CONJUNTO_AGRESIVO
+                linea_a_evaluar = lineas[j].strip()
+                conjunto_encontrado = extraer_conjunto_agresivo(linea_a_evaluar, filtros=filtros)
+                
+                if conjunto_encontrado and conjunto_encontrado == conjunto_esperado:
+                    _cerrar_traza(traza, "pdf_3", lineas_revisadas, evaluaciones)
+                    return True, linea_a_evaluar, j - i
+    
+    _cerrar_traza(traza, "ninguna", lineas_revisadas, evaluaciones)
+    return False, "", -1
+
+# ========== FUNCIONES COMUNES ==========
+
+def extraer_nombre(texto):
+    """Extrae el nombre del documento de manera más flexible"""
+    # Patrón 1: "Nombre completo:"
+    match = re.search(r"(?i)nombre\s*completo[:\s]+([^\n\r]+)", texto)
+    if match:
+        nombre_completo = match.group(1).strip()
+        # Tomar solo la primera palabra (nombre)
+        primer_nombre = nombre_completo.split()[0] if nombre_completo else "Alumno"
+        return primer_nombre
+    
+    # Patrón 2: "Nombre:"
+    match = re.search(r"(?i)nombre[:\s]+([^\n\r]+)", texto)
+    if match:
+        nombre_completo = match.group(1).strip()
+        primer_nombre = nombre_completo.split()[0] if nombre_completo else "Alumno"
+        return primer_nombre
+    
+    return "Alumno"
+
+def extraer_conjunto_esperado(expresion_completa):
+    """Extrae el conjunto esperado de una expresión como 'B ∩ C = {1,2,13}'"""
+    if '=' in expresion_completa:
+        parte_conjunto = expresion_completa.split('=', 1)[1].strip()
+        # Usar la función agresiva para máxima compatibilidad
+        return extraer_conjunto_agresivo(parte_conjunto)
+    return VACIO
+
+def determinar_videos_necesarios(indices_incorrectos):
+    videos = []
+    if 6 in indices_incorrectos:
+        videos.append("https://youtu.be/-IHf20iF3Cg")
+    
+    otros_incorrectos = [i for i in indices_incorrectos if i != 6]
+    if otros_incorrectos:
+        videos.append("https://youtu.be/q5uYIWw7uD0")
+    
+    return videos
+
+# ========== VARIANTES DEL EJERCICIO ==========
+
+def _clave_conjuntos(conjuntos):
+    """Forma hashable de un dict de conjuntos, para usarlo como clave de caché"""
+    if conjuntos is None:
+        return None
+    return tuple(sorted((nombre, valor if isinstance(valor, ConjuntoBits) else ConjuntoBits.desde_numeros(valor))
+                        for nombre, valor in conjuntos.items()))
+
+@lru_cache(maxsize=256)
+def _filtros_por_variante(clave_conjuntos):
+    conjuntos = dict(clave_conjuntos) if clave_conjuntos is not None else CONJUNTOS_BASE_R3
+    base = frozenset(conjuntos.values())
+    if 'U' in conjuntos and 'B' in conjuntos:
+        return base, base | {conjuntos['U'] - conjuntos['B']}
+    return base, base
+
+def filtros_conjuntos_r3md(conjuntos=None):
+    """
+    (base, filtrados): un conjunto encontrado en el texto que coincide con uno de
+    los conjuntos base es una definición, no una respuesta. filtrados agrega B′,
+    que los alumnos suelen escribir como paso intermedio de C – B′.
+    """
+    return _filtros_por_variante(_clave_conjuntos(conjuntos))
+
+@lru_cache(maxsize=256)
+def _preparar_expresiones(expresiones, clave_conjuntos):
+    conjuntos = dict(clave_conjuntos) if clave_conjuntos is not None else CONJUNTOS_BASE_R3
+    mostradas = []
+    esperados = []
+    for expresion in expresiones:
+        if '=' in expresion:
+            # Expresión con su resultado escrito ("B ∩ C = {1,2,13}")
+            mostradas.append(expresion)
+            esperados.append(extraer_conjunto_esperado(expresion))
+        else:
+            esperado = evaluar_expresion(expresion, conjuntos)
+            mostradas.append(_mostrar_expresion(expresion, esperado))
+            esperados.append(esperado)
+    return tuple(mostradas), tuple(esperados)
+
+def _mostrar_expresion(operacion, esperado):
+    """'B ∩ C = {1,2,13}', el formato de EXPRESIONES_FIJAS"""
+    return f"{operacion.strip()} = {{{','.join(map(str, esperado))}}}"
+
+def preparar_expresiones_r3md(expresiones=None, conjuntos=None):
+    """
+    Expresiones a mostrar ("B ∩ C = {1,2,13}") y conjuntos esperados (ConjuntoBits).
+    Una operación sin "=" se evalúa con los conjuntos base (CONJUNTOS_BASE_R3 o los
+    de la variante); una con "=" usa el resultado escrito. Se calcula una vez por
+    combinación de expresiones y conjuntos.
+    """
+    if expresiones is None:
+        expresiones = OPERACIONES_R3
+    return _preparar_expresiones(tuple(expresiones), _clave_conjuntos(conjuntos))
+
+@dataclass
+class ClaveR3:
+    """Clave de respuestas de un alumno: sus conjuntos base, las expresiones y los resultados"""
+    id_alumno: str
+    conjuntos: dict      # {'U': ConjuntoBits, 'A': ..., 'B': ..., 'C': ...}
+    expresiones: tuple   # "B ∩ C = {1,3,9}", como EXPRESIONES_FIJAS
+    esperados: tuple     # ConjuntoBits por expresión
+
+def _contar_bits(mascaras):
+    """Cantidad de elementos de cada máscara de 16 bits (arreglo de numpy)"""
+    x = mascaras - ((mascaras >> 1) & 0x5555)
+    x = (x & 0x3333) + ((x >> 2) & 0x3333)
+    x = (x + (x >> 4)) & 0x0F0F
+    return (x + (x >> 8)) & 0x1F
+
+def _variantes_validas(mascaras, operaciones):
+    """
+    Filas cuyas respuestas se pueden calificar: cada conjunto base y cada resultado
+    con al menos 2 elementos (los detectores ignoran conjuntos más chicos) y ningún
+    resultado igual a un conjunto base o a B′ (los detectores los descartan).
+    """
+    filtrados = list(mascaras.values()) + [mascaras['U'] & ~mascaras['B']]
+    validas = (_contar_bits(mascaras['A']) >= 2) & (_contar_bits(mascaras['B']) >= 2) \
+        & (_contar_bits(mascaras['C']) >= 2)
+    for operacion in operaciones:
+        resultado = evaluar_expresion_mascaras(operacion, mascaras)
+        validas &= _contar_bits(resultado) >= 2
+        for conjunto in filtrados:
+            validas &= resultado != conjunto
+    return validas
+
+def generar_claves_r3md(ids_alumnos, operaciones=None, semilla="R3MD", universo=None, max_intentos=64):
+    """
+    Claves de respuestas de todo un grupo: {id_alumno: ClaveR3}.
+    
+    A, B y C de cada alumno salen de sha256(semilla, intento, id), así que la misma
+    semilla y el mismo id dan siempre la misma variante. Todas las máscaras y
+    resultados se calculan en una sola pasada vectorizada (numpy) para el grupo;
+    solo las filas cuya variante no se podría calificar se vuelven a sortear.
+    universo: ConjuntoBits con números del 0 al 15 (por omisión el U del reto).
+    """
+    import numpy as np
+    
+    if operaciones is None:
+        operaciones = OPERACIONES_R3
+    if universo is None:
+        universo = CONJUNTOS_BASE_R3['U']
+    if universo.mascara >= 1 << 16 or len(universo) != len(ConjuntoBits(universo.mascara)):
+        raise ValueError("El universo de las variantes debe tener números del 0 al 15")
+    
+    ids = [str(id_alumno) for id_alumno in dict.fromkeys(ids_alumnos)]
+    total = len(ids)
+    mascara_u = universo.mascara
+    mascaras = {
+        'U': np.full(total, mascara_u, dtype=np.int64),
+        'A': np.zeros(total, dtype=np.int64),
+        'B': np.zeros(total, dtype=np.int64),
+        'C': np.zeros(total, dtype=np.int64),
+    }
+    
+    pendientes = np.arange(total)
+    for intento in range(max_intentos):
+        if not len(pendientes):
+            break
+        digestos = b"".join(hashlib.sha256(f"{semilla}|{intento}|{ids[i]}".encode('utf-8')).digest()
+                            for i in pendientes)
+        sorteo = np.frombuffer(digestos, dtype='>u2').reshape(len(pendientes), 16).astype(np.int64)
+        for columna, nombre in enumerate("ABC"):
+            mascaras[nombre][pendientes] = sorteo[:, columna] & mascara_u
+        validas = _variantes_validas({nombre: m[pendientes] for nombre, m in mascaras.items()}, operaciones)
+        pendientes = pendientes[~validas]
+    if len(pendientes):
+        raise ValueError(f"No se pudo generar una variante calificable para {len(pendientes)} alumno(s); "
+                         f"revisa el universo y las operaciones")
+    
+    resultados = [evaluar_expresion_mascaras(operacion, mascaras).tolist() for operacion in operaciones]
+    columnas = {nombre: m.tolist() for nombre, m in mascaras.items()}
+    claves = {}
+    for i, id_alumno in enumerate(ids):
+        esperados = tuple(ConjuntoBits(resultado[i]) for resultado in resultados)
+        claves[id_alumno] = ClaveR3(
+            id_alumno=id_alumno,
+            conjuntos={nombre: ConjuntoBits(columna[i]) for nombre, columna in columnas.items()},
+            expresiones=tuple(_mostrar_expresion(op, esperado) for op, esperado in zip(operaciones, esperados)),
+            esperados=esperados
+        )
+    return claves
+
+def tabla_claves_r3md(claves):
+    """Filas (una por alumno) con los conjuntos base y las respuestas, listas para un DataFrame o CSV"""
+    filas = []
+    for clave in claves.values():
+        fila = {'ID': clave.id_alumno}
+        fila.update({nombre: conjunto.formatear() for nombre, conjunto in clave.conjuntos.items()})
+        fila.update({f"{chr(97 + i)})": expresion for i, expresion in enumerate(clave.expresiones)})
+        filas.append(fila)
+    return filas
+
+# Archivos de la descarga masiva de Moodle: "Nombre Apellido_123456_assignsubmission_file_..."
+_PATRON_ID_ARCHIVO = re.compile(r'_(\d+)_assignsubmission')
+
+def id_alumno_desde_archivo(nombre_archivo):
+    """ID del participante en el nombre de un archivo descargado de Moodle, o None"""
+    coincidencia = _PATRON_ID_ARCHIVO.search(nombre_archivo)
+    return coincidencia.group(1) if coincidencia else None
+
+# ========== EVALUACIÓN DE DOCUMENTOS ==========
+
+def formatear_conjunto(conjunto):
+    """Conjunto de números como texto ordenado: {1, 2, 13}"""
+    if not isinstance(conjunto, ConjuntoBits):
+        conjunto = ConjuntoBits.desde_numeros(conjunto)
+    return conjunto.formatear()
+
+@medir_etapa("r3md.evaluar_documento_r3md", bytes_de=lambda texto_completo, *args, **kwargs: len(texto_completo))
+def evaluar_documento_r3md(texto_completo, doc_object=None, expresiones=None, trazar=False, conjuntos=None,
+                           clave=None):
+    """
+    Evalúa las expresiones contra el texto de un documento.
+    Con doc_object (Word) las respuestas se leen de las tablas; sin él (PDF)
+    se buscan alrededor de cada inciso en el texto.
+    expresiones y conjuntos se resuelven con preparar_expresiones_r3md (por omisión
+    OPERACIONES_R3 con CONJUNTOS_BASE_R3); con clave (ClaveR3 de generar_claves_r3md)
+    se usa directamente la variante del alumno.
+    Con trazar=True llena resultado.traza (un TrazaInciso por inciso).
+    Retorna un ResultadoDocumentoR3.
+    """
+    if clave is not None:
+        expresiones, conjuntos_esperados, conjuntos = clave.expresiones, clave.esperados, clave.conjuntos
+    else:
+        expresiones, conjuntos_esperados = preparar_expresiones_r3md(expresiones, conjuntos)
+    letras = "abcdefghijklmnopqrstuvwxyz"
+    resultado = ResultadoDocumentoR3(
+        nombre=extraer_nombre(texto_completo),
+        texto=texto_completo,
+        es_word=doc_object is not None
+    )
+    
+    # ===== WORD: detección directa desde tablas =====
+    if doc_object is not None:
+        traza_doc = {} if trazar else None
+        inicio = time.perf_counter()
+        resultado.respuestas_word = extraer_respuestas_desde_doc(doc_object, traza_doc)
+        if trazar:
+            ms_tablas = (time.perf_counter() - inicio) * 1000
+        
+        for i, (expresion, conjunto_esperado) in enumerate(zip(expresiones, conjuntos_esperados)):
+            if i < len(resultado.respuestas_word):
+                conjunto_encontrado = resultado.respuestas_word[i]
+                encontrado = (conjunto_esperado == conjunto_encontrado)
+            else:
+                conjunto_encontrado = VACIO
+                encontrado = False
+            
+            resultado.incisos.append(ResultadoInciso(
+                letra=letras[i], expresion=expresion,
+                conjunto_esperado=conjunto_esperado,
+                encontrado=encontrado,
+                conjunto_encontrado=conjunto_encontrado,
+                distancia=0 if encontrado else -1
+            ))
+            if trazar:
+                # Las tablas se leen una sola vez: todo el trabajo se anota en el primer inciso
+                resultado.traza.append(TrazaInciso(
+                    letra=letras[i],
+                    estrategia="word_tabla" if encontrado else "ninguna",
+                    lineas=traza_doc['lineas'] if i == 0 else 0,
+                    regex=traza_doc['regex'] if i == 0 else 0,
+                    ms=ms_tablas if i == 0 else 0.0
+                ))
+    
+    # ===== PDF: búsqueda agresiva =====
+    else:
+        for i, (expresion, conjunto_esperado) in enumerate(zip(expresiones, conjuntos_esperados)):
+            letra = letras[i]
+            traza_inciso = {} if trazar else None
+            inicio = time.perf_counter()
+            encontrado, linea_encontrada, distancia = buscar_conjunto_MAXIMA_AGRESIVIDAD(
+                texto_completo, letra, conjunto_esperado, traza_inciso, conjuntos
+            )
+            if trazar:
+                resultado.traza.append(TrazaInciso(
+                    letra=letra, ms=(time.perf_counter() - inicio) * 1000, **traza_inciso
+                ))
+            resultado.incisos.append(ResultadoInciso(
+                letra=letra, expresion=expresion,
+                conjunto_esperado=conjunto_esperado,
+                encontrado=encontrado,
+                conjunto_encontrado=conjunto_esperado if encontrado else VACIO,
+                distancia=distancia if encontrado else -1,
+                linea=linea_encontrada
+            ))
+    
+    return resultado
+
+def calificar_documento_r3md(nombre_archivo, contenido, expresiones=None, conjuntos=None, clave=None):
+    """Lee un documento (.docx o .pdf, en bytes) y lo evalúa. Retorna un ResultadoDocumentoR3."""
+    texto_completo, doc_object = leer_documento(nombre_archivo, contenido)
+    return evaluar_documento_r3md(texto_completo, doc_object, expresiones, conjuntos=conjuntos, clave=clave)
+
+def fila_calificacion_r3md(nombre_archivo, contenido, clave=None, mensajes_exito=None, mensajes_error=None):
+    """
+    Califica un documento y resume el resultado en un dict que se puede guardar como
+    JSON (lo que registra un lote en segundo plano): archivo, nombre, correctos, total,
+    letras de los incisos incorrectos, mensaje de retroalimentación y texto extraído.
+    """
+    resultado = calificar_documento_r3md(nombre_archivo, contenido, clave=clave)
+    return {
+        'archivo': nombre_archivo,
+        'nombre': resultado.nombre,
+        'correctos': len(resultado.correctos),
+        'total': len(resultado.incisos),
+        'incorrectos': ", ".join(r.letra for r in resultado.incorrectos),
+        'mensaje': generar_mensaje_r3md(resultado, mensajes_exito, mensajes_error),
+        'texto': resultado.texto,
+    }
+
+def huella_documento_r3md(nombre_archivo, contenido, clave=None):
+    """
+    Huella para el punto de control de un documento en un lote: nombre, bytes y
+    las expresiones con que se califica (las de la variante del alumno o las fijas).
+    """
+    return huella(nombre_archivo, contenido, *(clave.expresiones if clave else EXPRESIONES_FIJAS))
+
+def traza_compacta_r3md(nombre_archivo, resultado):
+    """
+    Traza de un documento en forma compacta para guardar o exportar a JSON:
+    totales del documento y una lista [letra, estrategia, líneas, regex, ms] por inciso.
+    """
+    return {
+        'archivo': nombre_archivo,
+        'es_word': resultado.es_word,
+        'caracteres': len(resultado.texto),
+        'ms': round(sum(t.ms for t in resultado.traza), 3),
+        'regex': sum(t.regex for t in resultado.traza),
+        'incisos': [[t.letra, t.estrategia, t.lineas, t.regex, round(t.ms, 3)] for t in resultado.traza],
+    }
+
+def tabla_comparacion_r3md(resultado):
+    """Filas de la tabla Esperado vs Obtenido (una por inciso), listas para un DataFrame"""
+    comparacion_data = []
+    for r in resultado.incisos:
+        esperado_str = formatear_conjunto(r.conjunto_esperado)
+        if r.encontrado:
+            encontrado_str = formatear_conjunto(r.conjunto_encontrado)
+            diferencias_str = "—"
+            estado = "✅ Correcto"
+        else:
+            encontrado_str = "❌ No encontrado"
+            diferencias_str = "No se encontró cerca del inciso"
+            estado = "❌ Incorrecto"
+        
+        if r.conjunto_encontrado and r.conjunto_esperado != r.conjunto_encontrado:
+            faltantes = r.conjunto_esperado - r.conjunto_encontrado
+            extras    = r.conjunto_encontrado - r.conjunto_esperado
+            diferencias_str = ""
+            if faltantes:
+                diferencias_str += f"Faltan: {formatear_conjunto(faltantes)}"
+            if extras:
+                if diferencias_str: diferencias_str += " | "
+                diferencias_str += f"Sobran: {formatear_conjunto(extras)}"
+        
+        comparacion_data.append({
+            'Inciso': r.letra, 'Expresión': r.expresion,
+            'Esperado': esperado_str, 'Obtenido': encontrado_str,
+            'Diferencias': diferencias_str, 'Estado': estado
+        })
+    return comparacion_data
+
+def generar_mensaje_r3md(resultado, mensajes_exito=None, mensajes_error=None):
+    """Mensaje final de retroalimentación para copiar en Moodle"""
+    if mensajes_exito is None:
+        mensajes_exito = MENSAJES_EXITO_R3
+    if mensajes_error is None:
+        mensajes_error = MENSAJES_ERROR_R3
+    
+    nombre = resultado.nombre
+    mensaje_limpio = ""
+    if not resultado.incorrectos:
+        encabezado = random.choice(mensajes_exito).format(nombre=nombre)
+        mensaje_limpio += f"{encabezado}\n\n"
+        for r in resultado.incisos:
+            mensaje_limpio += f"{r.letra}) {r.expresion} - correcto\n"
+    else:
+        encabezado = random.choice(mensajes_error).format(nombre=nombre)
+        mensaje_limpio += f"{encabezado}\n"
+        videos = determinar_videos_necesarios(resultado.indices_incorrectos)
+        if videos:
+            mensaje_limpio += ("Revisa el siguiente video:\n" if len(videos) == 1
+                               else "Revisa los siguientes videos:\n")
+            for v in videos:
+                mensaje_limpio += f"{v}\n"
+            mensaje_limpio += "\n"
+        for r in resultado.incisos:
+            if r.encontrado:
+                mensaje_limpio += f"{r.letra}) {r.expresion} - correcto\n"
+            else:
+                mensaje_limpio += f"{r.letra}) - incorrecto\n"
+    return mensaje_limpio
+
+# Las siete expresiones del reto con su resultado, calculadas a partir de los conjuntos base
+EXPRESIONES_FIJAS = list(preparar_expresiones_r3md()[0])
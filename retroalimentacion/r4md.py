@@ -0,0 +1,961 @@
+"""
+R4MD - Proposiciones lógicas: calificación automática de las participaciones del foro.
+
+Extrae las participaciones del HTML del foro, las relaciona con los alumnos del
+libro de calificaciones, genera la retroalimentación y construye las exportaciones
+(texto para Moodle, Excel y libro de calificaciones). No depende de Streamlit.
+"""
+import io
+import os
+import random
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from .almacen import actualizar_json, leer_json, mover_a_papelera
+from .nombres import (
+    normalizar_nombre, normalizar_serie_nombres, separar_nombre,
+    similitud_nombres, similitud_normalizada
+)
+from .puntos_control import PuntoControl, huella
+from .rendimiento import medir_etapa, tamano_archivo
+from .similitud import agrupar_similares
+from .texto import limpiar_texto_para_moodle
+
+
+COLUMNA_CALIFICACION_R4 = "Tarea:R4. Proposiciones lógicas (Real)"
+CURSO_PREDETERMINADO_R4 = "General"
+DIRECTORIO_HISTORIAL_R4 = "historial_r4"
+INDICE_HISTORIAL_R4 = os.path.join(DIRECTORIO_HISTORIAL_R4, "indice.json")
+# Historial global de versiones anteriores; se lee como la partición predeterminada
+HISTORIAL_FILE_R4 = "historial_calificaciones_r4.json"
+
+# Inicio de cada artículo del foro y la primera fecha dentro de él (la del autor)
+_PATRON_INICIO_ARTICULO = re.compile(r'<article\b[^>]*?\bid=["\'](p\d+)["\']', re.IGNORECASE)
+_PATRON_FECHA_ARTICULO = re.compile(r'<time\b[^>]*?\bdatetime=["\']([^"\']*)["\']', re.IGNORECASE)
+
+
+@dataclass
+class Participacion:
+    """Una participación del foro con el nombre del autor ya separado"""
+    nombre_completo: str
+    primer_nombre: str
+    segundo_nombre: str
+    apellidos: str
+    fecha: str
+    contenido: str
+    id_articulo: str = ''  # id del <article> en el HTML (pNNN)
+    # Autores de participaciones casi idénticas (lo llena marcar_duplicados_r4)
+    similares: list = field(default_factory=list)
+    similitud_similares: float = 0.0
+
+
+@dataclass
+class ResultadoCalificacionR4:
+    """
+    Resultado de procesar las participaciones contra el Excel.
+    df_resultados tiene columnas Nombre y Retroalimentación, indexado por la fila del Excel.
+    """
+    df_resultados: object
+    nuevos_calificados: int = 0
+    ya_calificados: int = 0
+    no_encontrados: int = 0
+    total_participaciones: int = 0
+    debug_info: list = field(default_factory=list)
+    pendientes: list = field(default_factory=list)  # ids de artículo sin alumno en el Excel
+    interrumpido: bool = False  # se canceló antes de terminar las participaciones
+
+# ==================== HISTORIAL POR CURSO Y ACTIVIDAD ====================
+# Cada curso/grupo y actividad tiene su propia carpeta, así que calificar una
+# actividad nunca carga los datos de otra:
+#   historial_r4/<curso>/<actividad>/historial.json  alumnos ya calificados
+#   historial_r4/<curso>/<actividad>/marca.json      última publicación del foro procesada
+#   historial_r4/<curso>/<actividad>/publicaciones.json  autor y texto de las publicaciones
+#       ya procesadas, para buscar copias de semanas anteriores
+# historial_r4/indice.json lleva los nombres originales y la cantidad de alumnos
+# de cada partición, para listarlas y contarlas sin abrir sus historiales.
+
+def _nombre_carpeta(texto):
+    """'Tarea:R4. Proposiciones lógicas (Real)' -> 'tarea_r4_proposiciones_logicas_real'"""
+    return normalizar_nombre(texto).lower().replace(' ', '_') or '_'
+
+def _clave_particion(curso, actividad):
+    return (_nombre_carpeta(curso or CURSO_PREDETERMINADO_R4),
+            _nombre_carpeta(actividad or COLUMNA_CALIFICACION_R4))
+
+def ruta_particion_r4(curso=None, actividad=None):
+    """Carpeta de un curso y actividad (por omisión el curso general y la columna de R4)"""
+    return os.path.join(DIRECTORIO_HISTORIAL_R4, *_clave_particion(curso, actividad))
+
+def _ruta_historial(curso=None, actividad=None):
+    return os.path.join(ruta_particion_r4(curso, actividad), "historial.json")
+
+def _archivo_historial(curso=None, actividad=None):
+    """Archivo del que se lee el historial"""
+    ruta = _ruta_historial(curso, actividad)
+    # La partición predeterminada hereda el historial global de versiones anteriores
+    if not os.path.exists(ruta) and _clave_particion(curso, actividad) == _clave_particion(None, None) \
+            and os.path.exists(HISTORIAL_FILE_R4):
+        return HISTORIAL_FILE_R4
+    return ruta
+
+def _archivo_marca(curso=None, actividad=None):
+    return os.path.join(ruta_particion_r4(curso, actividad), "marca.json")
+
+def _archivo_publicaciones(curso=None, actividad=None):
+    return os.path.join(ruta_particion_r4(curso, actividad), "publicaciones.json")
+
+def particiones_r4():
+    """Cursos y actividades con historial: lista de {'curso', 'actividad', 'alumnos', 'actualizado'}"""
+    return sorted(leer_json(INDICE_HISTORIAL_R4, {}).values(), key=lambda p: (p['curso'], p['actividad']))
+
+def _actualizar_indice(curso, actividad, alumnos):
+    clave = "/".join(_clave_particion(curso, actividad))
+    
+    def combinar(indice):
+        if alumnos is None:
+            indice.pop(clave, None)
+        else:
+            indice[clave] = {
+                'curso': curso or CURSO_PREDETERMINADO_R4,
+                'actividad': actividad or COLUMNA_CALIFICACION_R4,
+                'alumnos': alumnos,
+                'actualizado': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+        return indice
+    
+    actualizar_json(INDICE_HISTORIAL_R4, combinar, {})
+
+def contar_historial_r4(curso=None, actividad=None):
+    """Alumnos en el historial de un curso y actividad, leído del índice (sin abrir el historial)"""
+    entrada = leer_json(INDICE_HISTORIAL_R4, {}).get("/".join(_clave_particion(curso, actividad)))
+    if entrada is not None:
+        return entrada['alumnos']
+    return len(cargar_historial_r4(curso, actividad))
+
+@medir_etapa("r4md.cargar_historial_r4",
+             bytes_de=lambda curso=None, actividad=None: tamano_archivo(_archivo_historial(curso, actividad)))
+def cargar_historial_r4(curso=None, actividad=None):
+    """Carga el historial de alumnos ya calificados de un curso y actividad"""
+    return leer_json(_archivo_historial(curso, actividad), {})
+
+@medir_etapa("r4md.guardar_historial_r4",
+             bytes_de=lambda historial, curso=None, actividad=None, cargado=None:
+                 tamano_archivo(_ruta_historial(curso, actividad)))
+def guardar_historial_r4(historial, curso=None, actividad=None, cargado=None):
+    """
+    Guarda el historial de alumnos calificados de un curso y actividad, combinándolo
+    con lo que otras sesiones guardaron desde que se cargó: se agregan los alumnos
+    nuevos y, si otra sesión ya registró a alguno, se conserva ese primer registro.
+    cargado es una copia del historial tal como se cargó: solo se guardan las entradas
+    que esta sesión agregó o cambió respecto a ella, así lo que otra sesión borró o
+    vació mientras tanto no regresa. Sin cargado se guardan todas las entradas.
+    historial queda igual a lo guardado.
+    Retorna los nombres que ya había registrado otra sesión con otra retroalimentación
+    (calificados dos veces en paralelo).
+    """
+    conflictos = []
+    if cargado is None:
+        cambios = historial
+    else:
+        cambios = {nombre: registro for nombre, registro in historial.items() if cargado.get(nombre) != registro}
+    
+    def combinar(en_disco):
+        claves = {normalizar_nombre(nombre): nombre for nombre in en_disco}
+        for nombre, registro in cambios.items():
+            existente = claves.get(normalizar_nombre(nombre))
+            if existente is None:
+                en_disco[nombre] = registro
+                claves[normalizar_nombre(nombre)] = nombre
+            elif en_disco[existente] != registro:
+                conflictos.append(nombre)
+        return en_disco
+    
+    guardado = actualizar_json(_ruta_historial(curso, actividad), combinar, {},
+                               ruta_lectura=_archivo_historial(curso, actividad))
+    historial.clear()
+    historial.update(guardado)
+    _actualizar_indice(curso, actividad, len(guardado))
+    return conflictos
+
+def borrar_historial_r4(curso=None, actividad=None):
+    """
+    Vacía el historial de un curso y actividad (las demás particiones no se tocan).
+    El archivo se mueve a historial.json.<fecha>.bak en lugar de borrarse.
+    También se reinicia la marca del foro: si no, con "solo participaciones nuevas"
+    las publicaciones ya vistas no se volverían a calificar.
+    """
+    mover_a_papelera(_ruta_historial(curso, actividad))
+    # La partición predeterminada vuelve a leer el historial global de versiones
+    # anteriores en cuanto no tiene el suyo: se retira siempre, exista o no el suyo
+    if _clave_particion(curso, actividad) == _clave_particion(None, None):
+        mover_a_papelera(HISTORIAL_FILE_R4)
+    borrar_marca_r4(curso, actividad)
+    _actualizar_indice(curso, actividad, None)
+
+@medir_etapa("r4md.cargar_marca_r4",
+             bytes_de=lambda curso=None, actividad=None: tamano_archivo(_archivo_marca(curso, actividad)))
+def cargar_marca_r4(curso=None, actividad=None):
+    """
+    Carga la marca del foro de un curso y actividad: {'fecha': datetime ISO del
+    artículo más reciente ya procesado, 'ids': ids (pNNN) de los artículos con esa
+    misma fecha, 'pendientes': ids de artículos anteriores cuyo autor no se encontró
+    en el Excel (se vuelven a procesar hasta encontrarlo)}. Sin archivo retorna una
+    marca vacía (se procesa todo el foro).
+    """
+    return leer_json(_archivo_marca(curso, actividad), {'fecha': '', 'ids': [], 'pendientes': []})
+
+@medir_etapa("r4md.guardar_marca_r4",
+             bytes_de=lambda marca, curso=None, actividad=None: tamano_archivo(_archivo_marca(curso, actividad)))
+def guardar_marca_r4(marca, curso=None, actividad=None):
+    """
+    Guarda la marca del foro (con la fecha en UTC sin zona, como _fecha_articulo);
+    si otra sesión guardó una más reciente, se conserva la más reciente (agregándole
+    los pendientes de esta). Con la misma fecha o una más reciente, los pendientes
+    de esta marca reemplazan a los guardados: los que ya se encontraron salen.
+    """
+    fecha = _fecha_articulo(marca.get('fecha'))
+    pendientes = set(marca.get('pendientes', []))
+    
+    def combinar(en_disco):
+        fecha_disco = _fecha_articulo(en_disco.get('fecha'))
+        if fecha_disco is not None and (fecha is None or fecha < fecha_disco):
+            return dict(en_disco, pendientes=sorted(set(en_disco.get('pendientes', [])) | pendientes))
+        ids = set(marca.get('ids', []))
+        if fecha is not None and fecha == fecha_disco:
+            ids |= set(en_disco['ids'])
+        return {'fecha': fecha.isoformat() if fecha else '', 'ids': sorted(ids), 'pendientes': sorted(pendientes)}
+    
+    actualizar_json(_archivo_marca(curso, actividad), combinar, {'fecha': '', 'ids': [], 'pendientes': []})
+
+def borrar_marca_r4(curso=None, actividad=None):
+    """Elimina la marca del foro: la próxima carga procesa todo el foro"""
+    mover_a_papelera(_archivo_marca(curso, actividad))
+
+@medir_etapa("r4md.cargar_publicaciones_r4",
+             bytes_de=lambda curso=None, actividad=None: tamano_archivo(_archivo_publicaciones(curso, actividad)))
+def cargar_publicaciones_r4(curso=None, actividad=None):
+    """
+    Publicaciones ya procesadas de un curso y actividad: {id del artículo: {'autor', 'contenido'}}.
+    Se pasan a marcar_duplicados_r4 para comparar las nuevas también contra las de lotes anteriores.
+    """
+    return leer_json(_archivo_publicaciones(curso, actividad), {})
+
+def _clave_publicacion(p):
+    return p.id_articulo or huella(p.nombre_completo, p.contenido)[:16]
+
+@medir_etapa("r4md.guardar_publicaciones_r4",
+             bytes_de=lambda participaciones, curso=None, actividad=None:
+                 tamano_archivo(_archivo_publicaciones(curso, actividad)))
+def guardar_publicaciones_r4(participaciones, curso=None, actividad=None):
+    """Agrega (o actualiza) las participaciones del lote a las publicaciones del curso y actividad"""
+    nuevas = {_clave_publicacion(p): {'autor': p.nombre_completo, 'contenido': p.contenido}
+              for p in participaciones}
+    
+    def combinar(en_disco):
+        en_disco.update(nuevas)
+        return en_disco
+    
+    actualizar_json(_archivo_publicaciones(curso, actividad), combinar, {})
+
+# ==================== EXTRACCIÓN DEL FORO ====================
+
+def _fecha_articulo(fecha):
+    """
+    datetime del atributo datetime de Moodle ("2025-09-01T10:00:00-06:00"), None si no
+    se entiende. Siempre sin zona horaria, en UTC (una fecha sin zona se toma como UTC),
+    así fechas con y sin zona se pueden comparar y la marca se guarda en una sola forma.
+    """
+    try:
+        fecha = datetime.fromisoformat(fecha)
+    except (TypeError, ValueError):
+        return None
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+def _articulos_nuevos(html_content, marca):
+    """
+    Recorta del HTML solo los artículos posteriores a la marca, sin construir el DOM:
+    cada artículo va desde su <article id="pNNN"> hasta el inicio del siguiente.
+    Los artículos sin fecha legible y los pendientes de la marca (autor que no estaba
+    en el Excel) siempre se consideran nuevos.
+    Actualiza la marca con los artículos nuevos. Retorna (html de los nuevos, cantidad omitida).
+    """
+    inicios = list(_PATRON_INICIO_ARTICULO.finditer(html_content))
+    fecha_marca = _fecha_articulo(marca.get('fecha'))
+    ids_marca = set(marca.get('ids', []))
+    pendientes = set(marca.get('pendientes', []))
+    fecha_nueva, ids_nuevos = fecha_marca, set(ids_marca)
+    
+    fragmentos = []
+    omitidos = 0
+    for k, inicio in enumerate(inicios):
+        fin = inicios[k + 1].start() if k + 1 < len(inicios) else len(html_content)
+        id_articulo = inicio.group(1)
+        coincidencia = _PATRON_FECHA_ARTICULO.search(html_content, inicio.end(), fin)
+        fecha = _fecha_articulo(coincidencia.group(1)) if coincidencia else None
+        
+        if fecha is not None and fecha_marca is not None and id_articulo not in pendientes and (
+                fecha < fecha_marca or (fecha == fecha_marca and id_articulo in ids_marca)):
+            omitidos += 1
+            continue
+        fragmentos.append(html_content[inicio.start():fin])
+        
+        if fecha is None:
+            continue
+        if fecha_nueva is None or fecha > fecha_nueva:
+            fecha_nueva, ids_nuevos = fecha, {id_articulo}
+        elif fecha == fecha_nueva:
+            ids_nuevos.add(id_articulo)
+    
+    if fecha_nueva is not None:
+        marca['fecha'] = fecha_nueva.isoformat()
+        marca['ids'] = sorted(ids_nuevos)
+    return "".join(fragmentos), omitidos
+
+def _participacion_desde_articulo(article):
+    """Participacion de un <article> del foro, o None si no tiene autor o contenido suficiente"""
+    # Buscar el address con clase author
+    author_address = article.find('address', class_='author')
+    if not author_address:
+        return None
+    
+    # Extraer el link del autor
+    author_link = author_address.find('a', href=re.compile(r'user/view\.php'))
+    if not author_link:
+        return None
+        
+    nombre_completo = author_link.get_text().strip()
+    
+    # Separar nombre(s) y apellidos (los dos últimos bloques son los apellidos)
+    nombres, apellidos = separar_nombre(nombre_completo)
+    if not apellidos:
+        return None
+    
+    partes_nombre = nombres.split()
+    primer_nombre = partes_nombre[0]
+    segundo_nombre = " ".join(partes_nombre[1:])
+    
+    # Extraer fecha
+    time_tag = author_address.find('time')
+    fecha = time_tag.get('datetime', '') if time_tag else ''
+    
+    # Buscar el contenido en la estructura: div.content > div.posting
+    content_div = article.find('div', class_='content')
+    if not content_div:
+        return None
+    
+    posting_div = content_div.find('div', class_='posting')
+    if not posting_div:
+        return None
+    
+    # Extraer todo el texto del contenido
+    contenido = posting_div.get_text(separator=' ', strip=True)
+    
+    # Filtrar contenido muy corto o vacío
+    if not contenido or len(contenido) <= 50:
+        return None
+    return Participacion(
+        nombre_completo=nombre_completo,
+        primer_nombre=primer_nombre,
+        segundo_nombre=segundo_nombre,
+        apellidos=apellidos,
+        fecha=fecha,
+        contenido=contenido,
+        id_articulo=article.get('id', '')
+    )
+
+@medir_etapa("r4md.extraer_participaciones_html", bytes_de=lambda html_content, *args, **kwargs: len(html_content))
+def extraer_participaciones_html(html_content, marca=None):
+    """
+    Extrae las participaciones del HTML del foro (lista de Participacion).
+    
+    Con marca (de cargar_marca_r4) el proceso es incremental: los artículos con fecha
+    anterior a la marca, o con la misma fecha e id ya registrado, se descartan antes
+    de construir su DOM, así que una exportación acumulada del foro cuesta lo que sus
+    publicaciones nuevas. La marca se actualiza (guardarla queda a cargo de quien llama).
+    """
+    from bs4 import BeautifulSoup
+    
+    if marca is not None:
+        html_content, _ = _articulos_nuevos(html_content, marca)
+    
+    soup = BeautifulSoup(html_content, 'html.parser')
+    participaciones = []
+    
+    # Buscar todos los artículos del foro con ID que empiece con 'p' seguido de números
+    articles = soup.find_all('article', id=re.compile(r'^p\d+'))
+    
+    for article in articles:
+        try:
+            participacion = _participacion_desde_articulo(article)
+        except Exception:
+            # Silenciosamente continuar con el siguiente
+            continue
+        if participacion is not None:
+            participaciones.append(participacion)
+    
+    return participaciones
+
+@medir_etapa("r4md.marcar_duplicados_r4")
+def marcar_duplicados_r4(participaciones, umbral=0.8, anteriores=None):
+    """
+    Marca las participaciones casi idénticas a la de otro autor (definiciones o
+    ejemplos copiados): llena p.similares con los nombres de esos autores y
+    p.similitud_similares con la mayor similitud (0 a 1).
+    Sirve para lotes grandes (varios foros juntos): usa agrupar_similares (MinHash + LSH).
+    anteriores (de cargar_publicaciones_r4) son las publicaciones de lotes ya procesados:
+    con "solo participaciones nuevas" el lote trae solo lo de esta semana, y sin ellas
+    una copia de una publicación ya calificada no se detectaría. Solo se marcan las
+    participaciones del lote; las anteriores sirven de comparación (las que vuelven a
+    venir en el lote, con el mismo id de artículo, se toman del lote).
+    Retorna la cantidad de participaciones marcadas.
+    """
+    for p in participaciones:
+        p.similares = []
+        p.similitud_similares = 0.0
+    
+    autores = {i: p.nombre_completo for i, p in enumerate(participaciones)}
+    textos = {i: p.contenido for i, p in enumerate(participaciones)}
+    en_lote = {_clave_publicacion(p) for p in participaciones}
+    for clave, publicacion in (anteriores or {}).items():
+        if clave not in en_lote:
+            autores[clave] = publicacion['autor']
+            textos[clave] = publicacion['contenido']
+    
+    for grupo in agrupar_similares(textos, umbral=umbral):
+        for par in grupo.pares:
+            a, b = par.documento_a, par.documento_b
+            # Dos mensajes del mismo autor (publicación y respuesta) no son copia
+            if normalizar_nombre(autores[a]) == normalizar_nombre(autores[b]):
+                continue
+            for documento, otro in ((a, b), (b, a)):
+                if not isinstance(documento, int):  # publicación anterior: solo se compara
+                    continue
+                p = participaciones[documento]
+                if autores[otro] not in p.similares:
+                    p.similares.append(autores[otro])
+                p.similitud_similares = max(p.similitud_similares, par.similitud)
+    return sum(1 for p in participaciones if p.similares)
+
+# ==================== PUNTOS DE CONTROL DEL LOTE ====================
+# Un lote guarda por participación la fila del Excel encontrada y la
+# retroalimentación generada (puntos_control/r4md/<curso>/<actividad>/<excel>/).
+# La carpeta depende de los alumnos del Excel: con otro Excel las filas guardadas
+# no sirven y se empieza de cero.
+
+def huella_participacion_r4(p):
+    """Huella de una participación: autor, contenido y con quién se marcó como duplicada"""
+    return huella(p.nombre_completo, p.contenido, '|'.join(p.similares))
+
+def punto_control_lote_r4(df, curso=None, actividad=None):
+    """PuntoControl de un lote del Excel df en el curso y actividad"""
+    alumnos = huella(*(f"{idx}|{nombre}|{apellido}" for idx, nombre, apellido
+                       in zip(df.index, df['Nombre'], df['Apellido(s)'])))
+    return PuntoControl(os.path.join("r4md", *_clave_particion(curso, actividad), alumnos[:16]))
+
+def preparar_nombres_excel(df):
+    """
+    Precalcula de forma vectorizada el nombre completo normalizado (Nombre + Apellido(s))
+    de cada fila del Excel. Retorna una lista de (índice, nombre normalizado) que se
+    calcula una vez por procesamiento y se reutiliza en cada búsqueda.
+    """
+    nombres = df['Nombre'].fillna('').astype(str).str.strip()
+    if 'Apellido(s)' in df.columns:
+        nombres = nombres + " " + df['Apellido(s)'].fillna('').astype(str).str.strip()
+    return list(zip(df.index, normalizar_serie_nombres(nombres)))
+
+@medir_etapa("r4md.buscar_alumno_en_excel")
+def buscar_alumno_en_excel(df, nombre_completo_html, primer_nombre, segundo_nombre, apellidos,
+                           nombres_excel=None):
+    """
+    Busca un alumno en el DataFrame del Excel con validación mejorada
+    Compara el nombre completo del HTML con el nombre completo del Excel (Nombre + Apellido(s))
+    usando nombres normalizados (sin acentos ni mayúsculas), así "Pérez" y "PEREZ" coinciden.
+    
+    nombres_excel es el resultado de preparar_nombres_excel(df); al procesar muchas
+    participaciones conviene calcularlo una sola vez y pasarlo aquí.
+    primer_nombre, segundo_nombre y apellidos se conservan por compatibilidad: el nombre
+    completo normalizado ya los incluye.
+    """
+    if nombres_excel is None:
+        nombres_excel = preparar_nombres_excel(df)
+    
+    nombre_html = normalizar_nombre(nombre_completo_html)
+    
+    mejor_match = None
+    mejor_similitud = 0.0
+    umbral_similitud = 0.75  # Umbral de similitud mínimo (75%)
+    
+    for idx, nombre_excel in nombres_excel:
+        # Método 1: Coincidencia exacta de nombre completo
+        if nombre_html == nombre_excel:
+            return idx
+        
+        # Método 2: Similitud del nombre completo (descarta rápido los que no superan al mejor)
+        similitud = similitud_normalizada(nombre_html, nombre_excel, mejor_similitud)
+        if similitud > mejor_similitud:
+            mejor_similitud = similitud
+            mejor_match = idx
+    
+    # Retornar el mejor match solo si supera el umbral de similitud
+    if mejor_similitud >= umbral_similitud:
+        return mejor_match
+    
+    return None
+
+def necesita_calificacion_r4(calificacion_actual):
+    """Una calificación vacía, nula o "-" indica que el alumno aún no ha sido calificado"""
+    if calificacion_actual is None or calificacion_actual != calificacion_actual:
+        return True
+    return str(calificacion_actual).strip() in ("-", "")
+
+def calificar_participaciones_r4(df, participaciones, historial, columna_calificacion=COLUMNA_CALIFICACION_R4,
+                                 al_avanzar=None, punto_control=None, cancelado=None):
+    """
+    Relaciona cada participación con su alumno del Excel y genera la retroalimentación
+    de los que no tienen calificación ni están en el historial.
+    
+    df debe tener las columnas 'Nombre', 'Apellido(s)' y la de calificación.
+    historial se actualiza con los nuevos calificados (guardarlo queda a cargo de quien llama).
+    al_avanzar(i, total, participacion), si se indica, se llama antes de cada participación
+    (por ejemplo para una barra de progreso).
+    punto_control (PuntoControl, ver punto_control_lote_r4), si se indica, guarda la fila
+    del Excel y la retroalimentación de cada participación apenas se calculan; si el lote
+    se interrumpe, la siguiente corrida las toma de ahí en lugar de calcularlas de nuevo.
+    cancelado() -> bool, si se indica, se consulta antes de cada participación: si
+    retorna True el lote se detiene y el resultado queda con interrumpido=True.
+    Si hace falta calificar se decide siempre contra el Excel y el historial actuales.
+    Retorna un ResultadoCalificacionR4.
+    """
+    import pandas as pd
+    
+    # Historial con claves normalizadas para comparar nombres
+    claves_historial = {normalizar_nombre(nombre) for nombre in historial}
+    
+    # Nombres del Excel normalizados una sola vez para todas las búsquedas
+    nombres_excel = preparar_nombres_excel(df)
+    
+    resultado = ResultadoCalificacionR4(df_resultados=None, total_participaciones=len(participaciones))
+    resultados = []
+    filas_excel = []  # índice de cada resultado en el Excel original
+    
+    for i, p in enumerate(participaciones):
+        if cancelado is not None and cancelado():
+            resultado.interrumpido = True
+            break
+        if al_avanzar:
+            al_avanzar(i, len(participaciones), p)
+        
+        clave = huella_participacion_r4(p) if punto_control is not None else None
+        guardado = punto_control.obtener(clave) if clave is not None else None
+        
+        if guardado is not None:
+            idx = guardado['idx']
+        else:
+            # Buscar alumno en Excel con validación mejorada
+            idx = buscar_alumno_en_excel(
+                df,
+                p.nombre_completo,
+                p.primer_nombre,
+                p.segundo_nombre,
+                p.apellidos,
+                nombres_excel
+            )
+            if hasattr(idx, 'item'):  # entero de numpy -> int (JSON)
+                idx = idx.item()
+            if clave is not None:
+                guardado = {'idx': idx, 'retroalimentacion': None}
+                punto_control.guardar(clave, guardado)
+        
+        if idx is None:
+            resultado.no_encontrados += 1
+            if p.id_articulo:
+                resultado.pendientes.append(p.id_articulo)
+            resultado.debug_info.append({
+                'HTML': p.nombre_completo,
+                'Excel': 'No encontrado',
+                'Similitud': 'N/A',
+                'Match': '❌',
+                'Duplicado': ''
+            })
+            continue
+        
+        nombre_excel = str(df.loc[idx, 'Nombre'])
+        apellido_excel = str(df.loc[idx, 'Apellido(s)'])
+        nombre_completo_excel = f"{nombre_excel} {apellido_excel}"
+        primer_nombre_excel = nombre_excel.split()[0]  # Extraer primer nombre
+        calificacion_actual = df.loc[idx, columna_calificacion]
+        
+        # Guardar info de debug
+        similitud = similitud_nombres(p.nombre_completo, nombre_completo_excel)
+        resultado.debug_info.append({
+            'HTML': p.nombre_completo,
+            'Excel': nombre_completo_excel,
+            'Similitud': f"{similitud:.2%}",
+            'Match': '✅',
+            'Duplicado': (f"{p.similitud_similares:.0%} con {', '.join(p.similares)}" if p.similares else '')
+        })
+        
+        # Verificar si ya está en historial
+        en_historial = normalizar_nombre(nombre_completo_excel) in claves_historial
+        
+        if necesita_calificacion_r4(calificacion_actual) and not en_historial:
+            if guardado is not None and guardado['retroalimentacion']:
+                retroalimentacion = guardado['retroalimentacion']
+            else:
+                # Generar retroalimentación con nombre completo y primer nombre
+                retroalimentacion = generar_retroalimentacion_r4(nombre_completo_excel, primer_nombre_excel,
+                                                                 p.contenido, duplicado=bool(p.similares))
+                if clave is not None:
+                    punto_control.guardar(clave, {'idx': idx, 'retroalimentacion': retroalimentacion})
+            
+            # Agregar al historial
+            claves_historial.add(normalizar_nombre(nombre_completo_excel))
+            historial[nombre_completo_excel] = {
+                'fecha': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'retroalimentacion': retroalimentacion
+            }
+            
+            resultados.append({
+                'Nombre': nombre_completo_excel,
+                'Retroalimentación': retroalimentacion
+            })
+            filas_excel.append(idx)
+            resultado.nuevos_calificados += 1
+        else:
+            resultado.ya_calificados += 1
+    
+    if resultados:
+        resultado.df_resultados = pd.DataFrame(resultados, index=filas_excel)
+    else:
+        resultado.df_resultados = pd.DataFrame(columns=['Nombre', 'Retroalimentación'])
+    return resultado
+
+@medir_etapa("r4md.generar_retroalimentacion_r4",
+             bytes_de=lambda nombre_completo, primer_nombre, contenido, *args, **kwargs: len(contenido))
+def generar_retroalimentacion_r4(nombre_completo, primer_nombre, contenido, duplicado=False):
+    """
+    Genera retroalimentación personalizada basada en el contenido.
+    Con duplicado=True (participación casi idéntica a la de otro alumno) no se elogian
+    las definiciones ni los ejemplos y se pide redactarlos con sus propias palabras.
+    """
+    
+    contenido_lower = contenido.lower()
+    comentarios = []
+    
+    # === SALUDOS INICIALES VARIADOS ===
+    saludos_iniciales = [
+        f"Excelente participación, {primer_nombre}.",
+        f"Muy bien, {primer_nombre}, tu aportación es valiosa.",
+        f"Felicidades, {primer_nombre}, excelente trabajo.",
+        f"{primer_nombre}, tu participación demuestra dedicación.",
+        f"Hola {primer_nombre}, que buena contribución al foro.",
+        f"Muy buena aportación, {primer_nombre}.",
+        f"Gracias por tu participación, {primer_nombre}.",
+        f"{primer_nombre}, tu trabajo refleja compromiso con el tema."
+    ]
+    comentarios.append(random.choice(saludos_iniciales))
+    
+    # === PRESENTACIÓN (variaciones) ===
+    if any(palabra in contenido_lower for palabra in ["mi nombre es", "me presento", "soy", "tengo", "buenas", "hola", "saludos"]):
+        frases_presentacion = [
+            "Me encantó tu presentación al inicio, es importante conocernos.",
+            "Tu presentación fue muy cordial y apropiada.",
+            "Agradezco tu presentación, eso fortalece nuestra comunidad de aprendizaje.",
+            "Me gustó como te presentaste, es valioso saber quien esta detrás de cada participación.",
+            "Tu saludo inicial fue muy amable y profesional.",
+            "La manera en que te presentaste fue excelente.",
+            "Tu introducción personal aporta calidez al foro."
+        ]
+        if random.random() < 0.85:  # 85% de probabilidad
+            comentarios.append(random.choice(frases_presentacion))
+    
+    # === PROPOSICIONES SIMPLES (variaciones) ===
+    if not duplicado and any(palabra in contenido_lower for palabra in ["proposición lógica simple", "proposiciones simples", "proposición simple", "proposición atómica", "atómica"]):
+        frases_simples = [
+            "Tus definiciones sobre proposiciones lógicas simples son muy claras y precisas.",
+            "Explicaste de manera excelente que es una proposición simple.",
+            "Tu comprensión de las proposiciones atómicas es evidente y bien fundamentada.",
+            "Las proposiciones simples quedaron muy bien explicadas en tu aporte.",
+            "Demuestras claridad al definir las proposiciones lógicas simples.",
+            "Tu explicacion sobre proposiciones simples es clara y correcta.",
+            "El concepto de proposición simple esta muy bien desarrollado.",
+            "Tus definiciones de proposiciones atómicas son precisas y completas."
+        ]
+        if random.random() < 0.9:  # 90% de probabilidad
+            comentarios.append(random.choice(frases_simples))
+    
+    # === PROPOSICIONES COMPUESTAS (variaciones) ===
+    if not duplicado and any(palabra in contenido_lower for palabra in ["proposición lógica compuesta", "proposiciones compuestas", "proposición compuesta", "molecular"]):
+        frases_compuestas = [
+            "Explicaste muy bien las proposiciones compuestas y el uso de conectores lógicos.",
+            "Tu análisis de las proposiciones moleculares es correcto y detallado.",
+            "Las proposiciones compuestas están bien desarrolladas en tu participación.",
+            "Comprendes claramente como se forman las proposiciones compuestas.",
+            "Excelente explicación sobre proposiciones compuestas y sus conectivos.",
+            "Tu manejo de las proposiciones compuestas refleja buen estudio del tema.",
+            "Las proposiciones moleculares fueron abordadas con precisión.",
+            "Tu comprensión de como combinar proposiciones es notable."
+        ]
+        if random.random() < 0.9:  # 90% de probabilidad
+            comentarios.append(random.choice(frases_compuestas))
+    
+    # === CANTIDAD Y CALIDAD DE EJEMPLOS ===
+    num_puntos = 0 if duplicado else contenido.count(".")
+    if num_puntos > 15:
+        frases_ejemplos_muchos = [
+            "Los ejemplos que compartiste son muy variados y demuestran una comprensión profunda del tema.",
+            "Tu aportación incluye numerosos ejemplos que enriquecen la discusión.",
+            "La cantidad de ejemplos que proporcionaste refleja tu dedicación al tema.",
+            "Tus múltiples ejemplos ayudan a comprender mejor los conceptos.",
+            "La diversidad de ejemplos en tu participación es impresionante.",
+            "Has proporcionado una excelente variedad de ejemplos ilustrativos."
+        ]
+        comentarios.append(random.choice(frases_ejemplos_muchos))
+    elif num_puntos > 10:
+        frases_ejemplos_buenos = [
+            "Los ejemplos que compartiste son apropiados y claros.",
+            "Tus ejemplos ilustran bien los conceptos explicados.",
+            "Proporcionaste buenos ejemplos que ayudan a la comprensión.",
+            "Los ejemplos que incluiste son pertinentes y útiles.",
+            "Tus ejemplos son claros y bien elegidos.",
+            "Los casos que presentaste facilitan el entendimiento."
+        ]
+        if random.random() < 0.8:  # 80% de probabilidad
+            comentarios.append(random.choice(frases_ejemplos_buenos))
+    
+    # === CONECTORES LÓGICOS (variaciones) ===
+    conectores = [" y ", " o ", "si ", "entonces", "solo si", "si y solo si"]
+    conectores_encontrados = [c for c in conectores if c in contenido_lower]
+    if len(conectores_encontrados) >= 4:
+        frases_conectores_muchos = [
+            "Identificaste correctamente el uso de diversos conectores lógicos.",
+            "Tu manejo de los diferentes conectores lógicos es excelente.",
+            "Demuestras dominio de los conectivos lógicos fundamentales.",
+            "Aplicaste correctamente una gran variedad de conectores.",
+            "El uso que haces de los conectivos es muy apropiado.",
+            "Muestras buen dominio de los operadores lógicos."
+        ]
+        comentarios.append(random.choice(frases_conectores_muchos))
+    elif len(conectores_encontrados) >= 2:
+        frases_conectores_algunos = [
+            "Usaste apropiadamente varios conectores lógicos.",
+            "Los conectores lógicos estan bien aplicados en tus ejemplos.",
+            "Tu uso de conectivos es correcto y apropiado.",
+            "Los operadores lógicos fueron bien utilizados.",
+            "Tus conectores lógicos estan correctamente empleados."
+        ]
+        if random.random() < 0.75:  # 75% de probabilidad
+            comentarios.append(random.choice(frases_conectores_algunos))
+    
+    # === EJEMPLOS COTIDIANOS (variaciones) ===
+    if not duplicado and any(palabra in contenido_lower for palabra in ["celular", "llueve", "clase", "estudio", "trabajo", "examen", "computadora", "tierra", "sol", "luna", "agua", "auto", "carro", "casa", "familia", "comida", "perro", "gato", "telefono", "internet"]):
+        frases_cotidianas = [
+            "Me gusto que uses ejemplos de la vida cotidiana, eso facilita la comprensión.",
+            "Tus ejemplos cercanos a la realidad hacen el tema más accesible.",
+            "Usar situaciones cotidianas para ejemplificar es una excelente estratégia.",
+            "Los ejemplos de la vida diaria que elegiste son muy efectivos.",
+            "Aprecio que hayas relacionado el tema con situaciones cotidianas.",
+            "Tus ejemplos practicos ayudan a conectar la teoría con la realidad.",
+            "Es valioso que uses contextos familiares para explicar los conceptos.",
+            "Los ejemplos que tomaste de situaciones comunes son muy útiles."
+        ]
+        if random.random() < 0.85:  # 85% de probabilidad
+            comentarios.append(random.choice(frases_cotidianas))
+    
+    # === VALORES DE VERDAD (variaciones) ===
+    if any(palabra in contenido_lower for palabra in ["verdadero", "falso", "verdad", "valor de verdad"]):
+        frases_verdad = [
+            "Comprendes bien el concepto de valor de verdad en las proposiciones.",
+            "Tu análisis de los valores de verdad es correcto.",
+            "Demuestras claridad al evaluar la veracidad de las proposiciones.",
+            "El manejo de valores de verdad en tu trabajo es apropiado.",
+            "Tu comprensión sobre verdadero y falso en lógica es evidente.",
+            "Los valores de verdad fueron correctamente analizados.",
+            "Tu evaluación de proposiciones verdaderas y falsas es acertada."
+        ]
+        if random.random() < 0.8:  # 80% de probabilidad
+            comentarios.append(random.choice(frases_verdad))
+    
+    # === ESTRUCTURA Y ORGANIZACIÓN ===
+    if ":" in contenido or contenido.count("\n") > 5:
+        frases_organizacion = [
+            "Tu participación esta bien organizada y estructurada.",
+            "La manera en que organizaste tu información es clara.",
+            "Aprecio la estructura ordenada de tu aportación.",
+            "Tu trabajo muestra una buena organización de ideas."
+        ]
+        if random.random() < 0.6:  # 60% de probabilidad
+            comentarios.append(random.choice(frases_organizacion))
+    
+    # === PROFUNDIDAD DEL CONTENIDO ===
+    longitud_contenido = len(contenido)
+    if longitud_contenido > 1800:
+        frases_profundidad = [
+            "Tu análisis es profundo y completo.",
+            "La extensión y detalle de tu participación es destacable.",
+            "Tu desarrollo del tema es exhaustivo y bien estructurado.",
+            "La profundidad de tu aporte refleja un excelente estudio.",
+            "Tu trabajo demuestra una investigación seria del tema.",
+            "El nivel de detalle en tu participación es admirable."
+        ]
+        if random.random() < 0.7:  # 70% de probabilidad
+            comentarios.append(random.choice(frases_profundidad))
+    elif longitud_contenido > 1200:
+        frases_buen_desarrollo = [
+            "Tu desarrollo del tema es completo.",
+            "Tu aportación tiene un buen nivel de detalle.",
+            "El contenido que compartiste es sustancial."
+        ]
+        if random.random() < 0.5:  # 50% de probabilidad
+            comentarios.append(random.choice(frases_buen_desarrollo))
+    
+    # === PARTICIPACIÓN CASI IDÉNTICA A LA DE OTRO ALUMNO ===
+    if duplicado:
+        frases_duplicado = [
+            "Noté que parte de tu aportación coincide casi textualmente con la de otros compañeros; "
+            "te invito a redactar tus definiciones y ejemplos con tus propias palabras.",
+            "Algunas de tus definiciones y ejemplos son prácticamente iguales a los de otra participación; "
+            "procura elaborar ejemplos propios para demostrar tu comprensión.",
+            "Tu participación es muy similar a la de otro compañero; la próxima vez intenta proponer "
+            "ejemplos originales y explicar los conceptos a tu manera."
+        ]
+        comentarios.append(random.choice(frases_duplicado))
+    
+    # === MENSAJES FINALES MOTIVACIONALES (más variados) ===
+    mensajes_finales = [
+        "Tu comprensión del tema demuestra un excelente trabajo de estudio. Sigue así.",
+        "Tu participación refleja dedicación y esfuerzo. Muy bien.",
+        "Excelente trabajo, tu aportación enriquece el foro. Felicidades.",
+        "Tu análisis es muy completo y bien fundamentado. Continúa con ese nivel.",
+        "Demuestras dominio del tema. Excelente aportación.",
+        "Sigue participando con este nivel de calidad. Felicidades.",
+        "Tu esfuerzo es evidente y muy valorado. Excelente.",
+        "Continúa trabajando con esta dedicación. Muy bien hecho.",
+        "Tu aporte es significativo para el aprendizaje colectivo. Gracias.",
+        "Excelente nivel de análisis. Te felicito.",
+        "Tu compromiso con el tema es admirable. Adelante.",
+        "Muy buen trabajo. Sigue así.",
+        "Tu participación es de calidad. Felicidades.",
+        "Gracias por tu valiosa contribución.",
+        "Tu trabajo refleja profesionalismo. Excelente.",
+        "Felicidades por tu dedicación al tema.",
+        "Sigue con ese entusiasmo por aprender.",
+        "Tu aportación es muy valiosa para todos."
+    ]
+    
+    # Agregar mensaje final (75% de probabilidad para no ser tan predecible)
+    if random.random() < 0.75:
+        comentarios.append(random.choice(mensajes_finales))
+    
+    # Unir todos los comentarios con espacio
+    retroalimentacion = " ".join(comentarios)
+    
+    # Limpiar el texto para que sea compatible con Moodle
+    retroalimentacion = limpiar_texto_para_moodle(retroalimentacion)
+    
+    return retroalimentacion
+
+def construir_exportaciones_r4(df_resultado):
+    """
+    Construye de una sola vez las salidas descargables de la pestaña Resultados:
+    texto plano para Moodle, formato simple y el Excel en bytes.
+    Se llama una vez por procesamiento y el resultado se guarda en session_state,
+    así cambiar de pestaña no vuelve a generar los archivos.
+    """
+    import pandas as pd
+    
+    nombres = df_resultado['Nombre'].astype(str)
+    retros = df_resultado['Retroalimentación'].astype(str)
+    
+    separador = "\n" + "="*80 + "\n\n"
+    texto_plano = (nombres + "\n" + retros + "\n" + separador).str.cat()
+    texto_simple = (nombres + ": " + retros + "\n\n").str.cat()
+    
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df_resultado.to_excel(writer, index=False, sheet_name='Retroalimentaciones')
+    
+    return {
+        'texto_plano': texto_plano,
+        'texto_simple': texto_simple,
+        'excel': output.getvalue()
+    }
+
+def exportar_libro_moodle_r4(excel_bytes, df_resultados, columna_calificacion, calificacion=None):
+    """
+    Escribe las retroalimentaciones (y opcionalmente la calificación) en una copia
+    del libro de calificaciones de Moodle que se subió, lista para importarse.
+    
+    df_resultados debe tener como índice la fila del DataFrame del Excel original
+    (la misma numeración que produce pd.read_excel), así que la fila de datos i del
+    libro corresponde al índice i. El libro se lee en modo read_only y se escribe en
+    modo write_only: las demás columnas se copian sin cambios y sin cargar estilos.
+    """
+    from openpyxl import Workbook, load_workbook
+    
+    lector = load_workbook(io.BytesIO(excel_bytes), read_only=True)
+    hoja_origen = lector.worksheets[0]  # pd.read_excel usa la primera hoja
+    filas = hoja_origen.iter_rows(values_only=True)
+    encabezado = list(next(filas, ()))
+    
+    # Columnas destino: se reutilizan si existen, si no se agregan al final
+    columna_retro = re.sub(r'\s*\(Real\)\s*$', '', columna_calificacion) + " (Retroalimentación)"
+    for columna in (columna_calificacion, columna_retro):
+        if columna not in encabezado:
+            encabezado.append(columna)
+    pos_calificacion = encabezado.index(columna_calificacion)
+    pos_retro = encabezado.index(columna_retro)
+    ancho = len(encabezado)
+    
+    # Cambios por fila de datos, calculados de una vez a partir del DataFrame
+    cambios = dict(zip(df_resultados.index, df_resultados['Retroalimentación']))
+    
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(title=hoja_origen.title)
+    hoja.append(encabezado)
+    for i, fila in enumerate(filas):
+        if i not in cambios:
+            hoja.append(fila)
+            continue
+        fila = list(fila) + [None] * (ancho - len(fila))
+        fila[pos_retro] = cambios[i]
+        if calificacion is not None:
+            fila[pos_calificacion] = calificacion
+        hoja.append(fila)
+    lector.close()
+    
+    output = io.BytesIO()
+    libro.save(output)
+    return output.getvalue()
+
+def nombres_sin_calificar(df, columna_objetivo, columna_nombre):
+    """
+    Nombres (limpios, sin nulos ni vacíos) de las filas cuya columna objetivo es "-".
+    Todo se resuelve con operaciones de columna, sin recorrer filas.
+    """
+    nombres = df.loc[df[columna_objetivo] == "-", columna_nombre]
+    nombres = nombres[nombres.notna()].astype(str).str.strip()
+    return nombres[nombres != ""]
+
+# Mensajes de la pestaña "Mensajes Simples Excel"
+MENSAJES_SIMPLES_R4 = [
+    "Buen día {nombre}. He tenido la oportunidad de revisar tu participación en el foro y quiero felicitarte, ya que has abordado todos los puntos de manera adecuada, cumpliendo con los criterios de la rúbrica. Ahora, aguardamos los comentarios de tus compañeros para enriquecer el intercambio. Te sugiero considerar sus observaciones y sacar provecho de esta oportunidad. ¡Saludos!",
+
+    "Hola {nombre}, qué gusto saludarte. Revisé tu trabajo en el foro y quiero felicitarte por cumplir con los puntos solicitados en la rúbrica. Ahora esperemos la retroalimentación de tus compañeros, ya que el foro está diseñado para promover este intercambio de ideas. Aprovecha los comentarios recibidos para potenciar tu aprendizaje. Saludos.",
+
+    "Gracias por tu aporte {nombre}. He revisado con detalle tu participación en el foro y quiero reconocerte el haber cumplido con todos los criterios establecidos. Ahora, esperamos las observaciones de tus compañeros, que enriquecerán la discusión y te brindarán nuevos puntos de vista. Aprovecha esta oportunidad para fortalecer tus conocimientos. Saludos cordiales.",
+
+    "Excelente trabajo {nombre}. Al revisar tu contribución en el foro, pude ver que has cumplido con todos los aspectos solicitados en la rúbrica, ¡felicidades! Ahora queda por esperar los comentarios de tus compañeros, quienes podrán ofrecerte nuevas perspectivas. Considera sus observaciones para sacar el mayor provecho de esta actividad. Saludos.",
+
+    "¿Qué tal? {nombre}. Muy bien hecho. Tu participación en el foro ha sido revisada, y es evidente que has cumplido con los puntos solicitados de forma satisfactoria. Ahora, espera la retroalimentación de tus compañeros, ya que el intercambio de ideas es el objetivo de este espacio. Aprovecha sus comentarios para fortalecer tu aprendizaje. ¡Saludos!"
+]
+
+def generar_mensajes_simples_r4(nombres):
+    """Un mensaje por alumno, repartiendo las plantillas de forma equilibrada (módulo)"""
+    return [
+        MENSAJES_SIMPLES_R4[i % len(MENSAJES_SIMPLES_R4)].format(nombre=nombre)
+        for i, nombre in enumerate(nombres)
+    ]
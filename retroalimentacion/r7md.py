@@ -0,0 +1,253 @@
+"""
+R7MD - Mensajes predefinidos: lectura de la tabla de entregas de Moodle,
+cola de alumnos ya notificados y catálogo de mensajes.
+No depende de Streamlit.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+from lxml import etree, html as lxml_html
+
+from .almacen import actualizar_json, leer_json
+from .nombres import limpiar_nombre, normalizar_nombre
+from .rendimiento import medir_etapa, tamano_archivo
+
+
+@dataclass
+class Entrega:
+    """Una fila de la tabla de entregas de Moodle"""
+    nombre: str
+    email: str
+    estado: str
+    modificado: str  # texto de "última modificación"
+    calificacion: str
+
+
+# Filas de la tabla de entregas y sus celdas. Moodle agrega el nombre de la columna como
+# clase de la celda (email, grade, timemodified...); cuando no está se usa la posición
+# habitual de la tabla de calificación (c2 nombre, c5 calificación, c7 última modificación).
+_XPATH_FILAS_ENTREGA = etree.XPath("//tr[.//div[contains(@class, 'submissionstatus')]]")
+_XPATH_ENTREGA_NOMBRE = etree.XPath(
+    "td[@class='cell c2' or contains(concat(' ', normalize-space(@class), ' '), ' fullname ')]/descendant::a[1]"
+)
+_XPATH_ENTREGA_EMAIL = etree.XPath("td[contains(concat(' ', normalize-space(@class), ' '), ' email ')]")
+_XPATH_ENTREGA_ESTADO = etree.XPath("(.//div[contains(@class, 'submissionstatus')])[1]")
+_XPATH_ENTREGA_MODIFICADO = etree.XPath(
+    "td[contains(concat(' ', normalize-space(@class), ' '), ' timemodified ')"
+    " or contains(concat(' ', normalize-space(@class), ' '), ' timesubmitted ') or @class='cell c7']"
+)
+_XPATH_ENTREGA_CALIFICACION = etree.XPath(
+    "td[contains(concat(' ', normalize-space(@class), ' '), ' grade ') or @class='cell c5']"
+)
+
+def _texto_celda(elementos):
+    """Texto con espacios normalizados del primer elemento encontrado ('' si no hay)"""
+    return ' '.join(elementos[0].text_content().split()) if elementos else ''
+
+@medir_etapa("r7md.extraer_entregas_desde_html", bytes_de=lambda html_content: len(html_content))
+def extraer_entregas_desde_html(html_content):
+    """
+    Extrae en una sola pasada todas las filas de la tabla de entregas de Moodle,
+    sin importar su status (enviado, borrador, sin entrega...).
+    
+    Retorna una lista de Entrega.
+    """
+    if not html_content or not html_content.strip():
+        return []
+    
+    arbol = lxml_html.fromstring(
+        html_content.encode('utf-8'),
+        parser=lxml_html.HTMLParser(encoding='utf-8')
+    )
+    
+    entregas = []
+    for fila in _XPATH_FILAS_ENTREGA(arbol):
+        nombre = limpiar_nombre(_texto_celda(_XPATH_ENTREGA_NOMBRE(fila)))
+        if not nombre:
+            continue
+        entregas.append(Entrega(
+            nombre=nombre,
+            email=_texto_celda(_XPATH_ENTREGA_EMAIL(fila)),
+            estado=_texto_celda(_XPATH_ENTREGA_ESTADO(fila)),
+            modificado=_texto_celda(_XPATH_ENTREGA_MODIFICADO(fila)),
+            calificacion=_texto_celda(_XPATH_ENTREGA_CALIFICACION(fila))
+        ))
+    
+    return entregas
+
+COLA_FILE_R7 = "cola_mensajes_r7.json"
+
+@medir_etapa("r7md.cargar_cola_r7", bytes_de=lambda: tamano_archivo(COLA_FILE_R7))
+def cargar_cola_r7():
+    """Carga la cola de entregas a las que ya se les envió mensaje"""
+    return leer_json(COLA_FILE_R7, {})
+
+@medir_etapa("r7md.guardar_cola_r7", bytes_de=lambda cola: tamano_archivo(COLA_FILE_R7))
+def guardar_cola_r7(cola):
+    """
+    Guarda la cola de entregas a las que ya se les envió mensaje, combinándola con
+    lo que otras sesiones guardaron desde que se cargó: por alumno gana el registro
+    con el mensaje más reciente. cola queda igual a lo guardado.
+    """
+    def combinar(en_disco):
+        for clave, registro in cola.items():
+            actual = en_disco.get(clave)
+            if actual is None or registro['fecha_mensaje'] >= actual['fecha_mensaje']:
+                en_disco[clave] = registro
+        return en_disco
+    
+    guardada = actualizar_json(COLA_FILE_R7, combinar, {})
+    cola.clear()
+    cola.update(guardada)
+
+def alumnos_de_entregas_r7(entregas):
+    """
+    Nombres de los alumnos de las entregas sin repetidos, en orden de aparición. Dos
+    nombres son el mismo alumno si coinciden con normalizar_nombre (acentos, mayúsculas,
+    espacios); se conserva la primera forma escrita.
+    """
+    # dict como conjunto ordenado (clave normalizada) para eliminar repetidos en O(1)
+    alumnos = {}
+    for entrega in entregas:
+        alumnos.setdefault(normalizar_nombre(entrega.nombre), entrega.nombre)
+    return list(alumnos.values())
+
+def clave_entrega_r7(entrega):
+    """Identificador estable de un alumno en la cola: email si existe, si no el nombre"""
+    if entrega.email:
+        return entrega.email.lower()
+    return normalizar_nombre(entrega.nombre)
+
+def entregas_pendientes_r7(entregas, cola):
+    """
+    Filtra las entregas nuevas o actualizadas: las que no están en la cola o cuyo
+    estado o fecha de última modificación cambió desde que se les envió mensaje.
+    """
+    pendientes = []
+    for entrega in entregas:
+        registro = cola.get(clave_entrega_r7(entrega))
+        if (registro is None or registro['estado'] != entrega.estado
+                or registro['modificado'] != entrega.modificado):
+            pendientes.append(entrega)
+    return pendientes
+
+def registrar_en_cola_r7(cola, entregas):
+    """Marca las entregas como ya notificadas (modifica y devuelve la cola)"""
+    fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for entrega in entregas:
+        cola[clave_entrega_r7(entrega)] = {
+            'nombre': entrega.nombre,
+            'estado': entrega.estado,
+            'modificado': entrega.modificado,
+            'fecha_mensaje': fecha
+        }
+    return cola
+
+# ==================== MENSAJES PREDEFINIDOS ====================
+
+# Mensajes CORRECTOS (7 mensajes)
+MENSAJES_CORRECTO_R7 = [
+    """Excelente trabajo {nombre}, he podido ver que has identificado de manera adecuada las propiedades de la relación, además de mostrar de manera correcta los diagramas, el de Hasse y el dígrafo.
+
+Me da gusto haberte acompañado en este proceso de aprendizaje. Éxito en tus siguientes módulos.
+
+Saludos.""",
+
+    """Buen trabajo {nombre}, tu actividad ha sido resuelta de manera adecuada, las propiedades que corresponden a ambas relaciones las has identificado de manera correcta, así como los diagramas solicitados.
+
+Éxito en tus siguientes retos.
+
+Me da gusto haberte acompañado en este proceso de aprendizaje.
+
+Saludos.""",
+
+    """Buen trabajo {nombre}, tu actividad ha sido resuelta de manera adecuada, las propiedades que corresponden a ambas relaciones las has identificado de manera correcta, así como los diagramas solicitados.
+
+Éxito en tus siguientes retos.
+
+Saludos.""",
+
+    """Buen trabajo {nombre}, tu actividad ha sido resuelta de manera adecuada, las propiedades que corresponden a ambas relaciones las has identificado de manera correcta, así como los diagramas solicitados.
+
+Éxito en tus siguientes retos y me da gusto haberte acompañado en este proceso de aprendizaje.
+
+Saludos.""",
+
+    """Buen trabajo {nombre}, tu actividad ha sido resuelta de manera adecuada, las propiedades que corresponden a ambas relaciones las has identificado de manera correcta, así como los diagramas solicitados.
+
+Me da gusto haberte acompañado en este proceso de aprendizaje.
+
+Saludos.""",
+
+    """Buen trabajo {nombre}, tu actividad ha sido resuelta de manera adecuada, las propiedades que corresponden a ambas relaciones las has identificado de manera correcta, así como los diagramas solicitados. Me da gusto haberte acompañado en este proceso de aprendizaje. Éxito en tus siguientes retos.
+
+Saludos.""",
+
+    """Excelente trabajo {nombre}, tu actividad ha sido resuelta de manera adecuada, las propiedades que corresponden a ambas relaciones las has identificado de manera correcta, así como los diagramas solicitados.
+
+Me da gusto haberte acompañado en este proceso de aprendizaje.
+
+Saludos."""
+]
+
+# Mensajes INCORRECTOS (4 mensajes)
+MENSAJES_INCORRECTO_R7 = [
+    """Buen trabajo {nombre}, lo que corresponde a tu primera tabla es correcto, identificas de manera adecuada las propiedades, la segunda tabla no se ha realizado, de ahí tu calificación, te dejo un video que he realizado con el objetivo de poder darte claridad para resolver el ejercicio.
+
+https://youtu.be/naYR2TQ84L0
+
+Corrige y reenvía.
+
+Saludos.""",
+
+    """Buen trabajo {nombre}, lo que corresponde a tu primera tabla es correcto, identificas de manera adecuada las propiedades, en la segunda tabla la que corresponde al diagrama de Hasse, es correcta hasta el paso 3, ya que en el paso 4, a pesar que identificas de manera correcta cada una de las relaciones transitivas, hay un cambio de dirección de la arista de "c" a "b", ya que la dirección en un paso anterior lo manejas de "b" a "c", de ahí la calificación, si pudieras argumentar dicho cambio de dirección podría corregir la calificación, quedo al pendiente.
+
+Aquí un video que te puede ayudar.
+
+https://youtu.be/WTGkSBsLX34
+
+Saludos.""",
+
+    """Buen trabajo {nombre}, lo que corresponde a tu primera tabla es correcto, identificas de manera adecuada las propiedades, en la segunda tabla la que corresponde al diagrama de Hasse, es correcta hasta el paso 2, ya que en el paso 3, no identificas en su totalidad las relaciones transitivas, situación que te lleva al error en tu diagrama final, te dejo un video que he realizado con el objetivo de poder darte claridad para resolver el ejercicio.
+
+https://youtu.be/naYR2TQ84L0
+
+Corrige y reenvía.
+
+Saludos.""",
+
+    """Buen trabajo {nombre}, la primera tabla es correcta, en la parte que corresponde al dígrafo faltó eliminar la totalidad de las relaciones transitivas, hecho que no te permite alcanzar el 100% de la calificación.
+
+Te dejo la resolución del ejercicio y quedo a disposición por si hubiera alguna duda más, aprovecho para preguntar, con todo respeto ¿Viste el video que te envíe en la realimentación anterior?
+
+Saludos.
+
+https://youtu.be/WTGkSBsLX34"""
+]
+
+# Mensajes ALTERNOS (3 mensajes)
+MENSAJES_ALTERNOS_R7 = [
+    """Buen trabajo {nombre}, un detalle en el dígrafo de la primera tabla, en particular en la relación transitiva, ya que no corresponde la notación matemática y el dígrafo, se otorga la mayor calificación esperando tomes en consideración la observación.
+
+Saludos.""",
+
+    """Buen trabajo {nombre}, lo que corresponde a tu primera tabla es correcto, identificas de manera adecuada las propiedades, en la segunda tabla la que corresponde al diagrama de Hasse, es correcta hasta el paso 3, ya que en el paso 4, estás realizando un acomodo incorrecto, situación que te lleva al error en tu diagrama final, te dejo un video que he realizado con el objetivo de poder darte claridad para resolver el ejercicio. Esperando tomes en consideración la recomendación, para evitar suspicacia en futuros trabajo, se asigna la mayor calificación.
+
+https://youtu.be/WTGkSBsLX34
+
+Éxito en tus subsecuentes retos.
+
+Me da gusto haberte acompañado en este proceso de aprendizaje. Te deseo mucho éxito en tus subsecuentes módulos.
+
+Saludos.""",
+
+    """Buen trabajo {nombre}, desafortunadamente este trabajo lo he visto en entregas anteriores, de hecho veo que es prácticamente el mismo trabajo que compañeros tuyos están entregando, estoy llegando a la conclusión que es un trabajo que aparece en Internet. Me hubiera gustado que generarás tu propio diseño y con ello, adueñarte del conocimiento, ya que en este caso, solo terminas copiando y pegando, sin reflexionar lo que implica este ejercicio. Por cualquier duda quedo a disposición.
+
+Saludos."""
+]
+
+def personalizar_mensaje_r7(mensaje, nombre_alumno):
+    """Sustituye {nombre} por el nombre del alumno; sin nombre se deja el marcador"""
+    if nombre_alumno:
+        return mensaje.replace("{nombre}", nombre_alumno)
+    return mensaje
@@ -0,0 +1,158 @@
+"""
+Medición de tiempos por etapa (extracción de PDF, búsqueda de conjuntos,
+emparejamiento de nombres, retroalimentación, historial...).
+
+Las funciones calientes se marcan con @medir_etapa y los bloques más grandes
+(un documento, un lote) con `with etapa(...)`. Por cada etapa se acumulan
+llamadas, tiempo total y bytes procesados (caracteres, cuando la entrada es texto).
+
+Desactivado (lo normal) el costo es una consulta a una variable por llamada:
+el decorador llama directo a la función y etapa() devuelve un contexto vacío.
+Si se mide o no es de cada contexto (contextvars): cada sesión de Streamlit
+corre en su propio hilo y lo enciende o apaga solo para sí, y un trabajo en
+segundo plano hereda lo que tenía la sesión que lo envió (trabajos.py copia el
+contexto). Los registros sí son del proceso (compartidos entre sesiones).
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_activo = ContextVar('rendimiento_activo', default=False)
+_registros = {}  # etapa -> [llamadas, segundos, bytes, máximo de segundos]
+_candado = threading.Lock()
+
+
+def activar(valor=True):
+    """Enciende (o apaga) la medición en el contexto actual (la sesión o el hilo que llama)"""
+    _activo.set(bool(valor))
+
+
+def esta_activo():
+    return _activo.get()
+
+
+def reiniciar():
+    """Borra lo acumulado"""
+    with _candado:
+        _registros.clear()
+
+
+def _registrar(nombre, segundos, cantidad_bytes):
+    with _candado:
+        registro = _registros.get(nombre)
+        if registro is None:
+            registro = _registros[nombre] = [0, 0.0, 0, 0.0]
+        registro[0] += 1
+        registro[1] += segundos
+        registro[2] += cantidad_bytes
+        registro[3] = max(registro[3], segundos)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s: %.2f ms, %d bytes", nombre, segundos * 1000, cantidad_bytes)
+
+
+def medir_etapa(nombre, bytes_de=None):
+    """
+    Decorador que acumula tiempo y llamadas de la función en la etapa `nombre`.
+    bytes_de(*args, **kwargs) -> int calcula los bytes procesados; se evalúa
+    después de la llamada (así puede medir un archivo recién escrito).
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _activo.get():
+                return funcion(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                transcurrido = time.perf_counter() - inicio
+                _registrar(nombre, transcurrido, bytes_de(*args, **kwargs) if bytes_de else 0)
+        return envoltura
+    return decorador
+
+
+class _Etapa:
+    """Contexto que mide un bloque; los bytes se pueden sumar dentro con agregar_bytes()"""
+    __slots__ = ('nombre', 'bytes', 'inicio')
+
+    def __init__(self, nombre, cantidad_bytes):
+        self.nombre = nombre
+        self.bytes = cantidad_bytes
+
+    def agregar_bytes(self, cantidad):
+        self.bytes += cantidad
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        _registrar(self.nombre, time.perf_counter() - self.inicio, self.bytes)
+        return False
+
+
+class _EtapaVacia:
+    __slots__ = ()
+
+    def agregar_bytes(self, cantidad):
+        pass
+
+
+_ETAPA_VACIA = _EtapaVacia()
+_CONTEXTO_VACIO = nullcontext(_ETAPA_VACIA)
+
+
+def etapa(nombre, cantidad_bytes=0):
+    """Contexto para medir un bloque (un documento, un lote, el dibujado de una sección)"""
+    if not _activo.get():
+        return _CONTEXTO_VACIO
+    return _Etapa(nombre, cantidad_bytes)
+
+
+def tamano_archivo(ruta):
+    """Tamaño en bytes de un archivo, 0 si no existe o no es una ruta"""
+    if isinstance(ruta, (str, os.PathLike)) and os.path.exists(ruta):
+        return os.path.getsize(ruta)
+    return 0
+
+
+def resumen():
+    """Lista de dicts por etapa (ordenada por tiempo total), lista para un DataFrame"""
+    with _candado:
+        registros = list(_registros.items())
+    filas = []
+    for nombre, (llamadas, segundos, cantidad_bytes, maximo) in registros:
+        filas.append({
+            'etapa': nombre,
+            'llamadas': llamadas,
+            'total_ms': round(segundos * 1000, 3),
+            'promedio_ms': round(segundos * 1000 / llamadas, 3),
+            'max_ms': round(maximo * 1000, 3),
+            'bytes': cantidad_bytes,
+        })
+    filas.sort(key=lambda fila: fila['total_ms'], reverse=True)
+    return filas
+
+
+def exportar_json():
+    """Resumen en JSON, con la fecha en que se generó"""
+    return json.dumps({'generado': datetime.now().isoformat(timespec='seconds'), 'etapas': resumen()},
+                      ensure_ascii=False, indent=2)
+
+
+def registrar_en_log(titulo):
+    """Escribe el resumen acumulado en el log (nivel INFO)"""
+    if not _activo.get():
+        return
+    for fila in resumen():
+        logger.info("%s | %s: %d llamadas, %.1f ms total, %.3f ms promedio, %d bytes",
+                    titulo, fila['etapa'], fila['llamadas'], fila['total_ms'],
+                    fila['promedio_ms'], fila['bytes'])
@@ -0,0 +1,162 @@
+"""
+Detección de entregas casi idénticas en un lote (posibles copias).
+
+Cada texto se parte en tejas (secuencias de k palabras normalizadas) y se
+resume en una firma MinHash. Las firmas se reparten en bandas (LSH): solo los
+documentos que coinciden en alguna banda se comparan, así que el costo crece
+casi linealmente con el lote en lugar de comparar todos contra todos. Los
+candidatos se confirman con la similitud de Jaccard exacta de sus tejas.
+
+Las tejas que aparecen en la mayoría de los documentos (el enunciado, los
+encabezados de la plantilla) se descartan antes de firmar; si no, todas las
+entregas de un mismo ejercicio parecerían copias.
+
+numpy se importa dentro de las funciones.
+"""
+import re
+import unicodedata
+import zlib
+from dataclasses import dataclass, field
+
+from .rendimiento import medir_etapa
+
+# Primo de Mersenne 2^31 - 1: (a * x + b) cabe en 64 bits con a, x < 2^31
+_PRIMO = (1 << 31) - 1
+
+_PATRON_DIACRITICOS = re.compile('[\u0300-\u036f]')
+_PATRON_PALABRAS = re.compile(r'\w+')
+
+
+@dataclass
+class ParSimilar:
+    """Dos documentos y la similitud de Jaccard de sus tejas"""
+    documento_a: str
+    documento_b: str
+    similitud: float
+
+
+@dataclass
+class GrupoSimilar:
+    """Documentos conectados por pares similares (componente conexa)"""
+    documentos: list
+    similitud_maxima: float
+    pares: list = field(default_factory=list)
+
+
+def tejas_texto(texto, k=5):
+    """
+    Conjunto de hashes (crc32) de las secuencias de k palabras del texto,
+    sin acentos y en minúsculas. Textos de menos de k palabras dan una sola teja.
+    """
+    texto = unicodedata.normalize('NFKD', texto or '')
+    palabras = _PATRON_PALABRAS.findall(_PATRON_DIACRITICOS.sub('', texto).lower())
+    if not palabras:
+        return set()
+    if len(palabras) <= k:
+        return {zlib.crc32(' '.join(palabras).encode('utf-8'))}
+    return {zlib.crc32(' '.join(palabras[i:i + k]).encode('utf-8')) for i in range(len(palabras) - k + 1)}
+
+
+def quitar_tejas_comunes(tejas_por_documento, max_frecuencia=0.5):
+    """
+    Quita las tejas presentes en más de max_frecuencia de los documentos
+    (la plantilla del ejercicio). Con menos de 3 documentos no se quita nada:
+    no se puede distinguir la plantilla de una copia.
+    """
+    total = len(tejas_por_documento)
+    if total < 3:
+        return tejas_por_documento
+    frecuencias = {}
+    for tejas in tejas_por_documento.values():
+        for teja in tejas:
+            frecuencias[teja] = frecuencias.get(teja, 0) + 1
+    limite = max_frecuencia * total
+    comunes = {teja for teja, veces in frecuencias.items() if veces > limite}
+    if not comunes:
+        return tejas_por_documento
+    return {nombre: tejas - comunes for nombre, tejas in tejas_por_documento.items()}
+
+
+def firmas_minhash(tejas_por_documento, permutaciones=128, semilla=1):
+    """
+    Firma MinHash de cada documento: {nombre: arreglo de `permutaciones` enteros}.
+    Con la misma semilla las firmas son comparables entre llamadas.
+    Los documentos sin tejas no tienen firma.
+    """
+    import numpy as np
+
+    generador = np.random.default_rng(semilla)
+    a = generador.integers(1, _PRIMO, size=(permutaciones, 1), dtype=np.uint64)
+    b = generador.integers(0, _PRIMO, size=(permutaciones, 1), dtype=np.uint64)
+
+    firmas = {}
+    for nombre, tejas in tejas_por_documento.items():
+        if not tejas:
+            continue
+        x = np.fromiter(tejas, dtype=np.uint64, count=len(tejas)) % np.uint64(_PRIMO)
+        firmas[nombre] = ((a * x + b) % np.uint64(_PRIMO)).min(axis=1)
+    return firmas
+
+
+def _candidatos_lsh(firmas, bandas):
+    """Pares de nombres que coinciden en al menos una banda de sus firmas"""
+    candidatos = set()
+    for banda in range(bandas):
+        cubetas = {}
+        for nombre, firma in firmas.items():
+            filas = len(firma) // bandas
+            clave = firma[banda * filas:(banda + 1) * filas].tobytes()
+            cubetas.setdefault(clave, []).append(nombre)
+        for nombres in cubetas.values():
+            for i in range(len(nombres)):
+                for j in range(i + 1, len(nombres)):
+                    candidatos.add((nombres[i], nombres[j]))
+    return candidatos
+
+
+@medir_etapa("similitud.agrupar_similares", bytes_de=lambda textos, *args, **kwargs: sum(map(len, textos.values())))
+def agrupar_similares(textos, umbral=0.8, k=5, permutaciones=128, bandas=32, max_frecuencia=0.5):
+    """
+    Grupos de documentos casi idénticos en un lote.
+    textos: {nombre: texto extraído} (p. ej. de leer_documento).
+    umbral: similitud de Jaccard mínima (0 a 1) para considerar dos documentos copias.
+    bandas debe dividir a permutaciones; más bandas encuentran pares menos
+    parecidos a cambio de más candidatos por confirmar.
+    Retorna una lista de GrupoSimilar, del más al menos parecido.
+    """
+    if permutaciones % bandas:
+        raise ValueError("bandas debe dividir a permutaciones")
+
+    tejas = quitar_tejas_comunes({nombre: tejas_texto(texto, k) for nombre, texto in textos.items()},
+                                 max_frecuencia)
+    firmas = firmas_minhash(tejas, permutaciones)
+
+    pares = []
+    for nombre_a, nombre_b in _candidatos_lsh(firmas, bandas):
+        union = len(tejas[nombre_a] | tejas[nombre_b])
+        similitud = len(tejas[nombre_a] & tejas[nombre_b]) / union
+        if similitud >= umbral:
+            pares.append(ParSimilar(nombre_a, nombre_b, similitud))
+
+    # Componentes conexas (unión-búsqueda)
+    padres = {}
+
+    def raiz(nombre):
+        while padres.get(nombre, nombre) != nombre:
+            nombre = padres[nombre]
+        return nombre
+
+    for par in pares:
+        padres[raiz(par.documento_a)] = raiz(par.documento_b)
+
+    grupos = {}
+    for par in pares:
+        grupo = grupos.setdefault(raiz(par.documento_a), GrupoSimilar([], 0.0))
+        grupo.pares.append(par)
+        grupo.similitud_maxima = max(grupo.similitud_maxima, par.similitud)
+    orden = {nombre: i for i, nombre in enumerate(textos)}
+    for grupo in grupos.values():
+        grupo.documentos = sorted({n for par in grupo.pares for n in (par.documento_a, par.documento_b)},
+                                  key=orden.get)
+        grupo.pares.sort(key=lambda par: par.similitud, reverse=True)
+    return sorted(grupos.values(), key=lambda grupo: grupo.similitud_maxima, reverse=True)
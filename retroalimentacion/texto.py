@@ -0,0 +1,128 @@
+"""
+Lectura de documentos (PDF y Word) y limpieza de texto para Moodle.
+
+Las librerías de PDF y python-docx se importan dentro de cada función,
+así importar el paquete no las carga si la sección no las usa.
+"""
+import io
+import os
+import re
+import tempfile
+import unicodedata
+from importlib.util import find_spec
+
+from .rendimiento import medir_etapa, tamano_archivo
+
+# Librerías de PDF (se localizan sin importarlas)
+PDF_AVAILABLE = find_spec("pdfplumber") is not None and find_spec("PyPDF2") is not None
+
+
+@medir_etapa("texto.extraer_texto_pdf", bytes_de=tamano_archivo)
+def extraer_texto_pdf(pdf_file):
+    """Extrae texto de un archivo PDF usando pdfplumber"""
+    if not PDF_AVAILABLE:
+        raise Exception("Las librerías de PDF no están instaladas. Instala: pip install PyPDF2 pdfplumber")
+    
+    import pdfplumber
+    
+    try:
+        texto_completo = ""
+        with pdfplumber.open(pdf_file) as pdf:
+            for pagina in pdf.pages:
+                texto_pagina = pagina.extract_text()
+                if texto_pagina:
+                    texto_completo += texto_pagina + "\n"
+        return texto_completo.strip()
+    except Exception as e:
+        try:
+            import PyPDF2
+            pdf_file.seek(0)
+            texto_completo = ""
+            pdf_reader = PyPDF2.PdfReader(pdf_file)
+            for pagina in pdf_reader.pages:
+                texto_completo += pagina.extract_text() + "\n"
+            return texto_completo.strip()
+        except Exception as e2:
+            raise Exception(f"Error con pdfplumber: {str(e)} | Error con PyPDF2: {str(e2)}")
+
+@medir_etapa("texto.extraer_texto_docx_completo")
+def extraer_texto_docx_completo(docx_file):
+    """Extrae texto de un archivo DOCX incluyendo párrafos y tablas en orden"""
+    from docx import Document
+    
+    doc = Document(docx_file)
+    
+    # Crear un diccionario para mantener el orden de elementos
+    elementos = []
+    
+    # Extraer párrafos con su índice
+    for para in doc.paragraphs:
+        if para.text.strip():
+            elementos.append(('parrafo', para.text))
+    
+    # Extraer tablas
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                if cell.text.strip():
+                    elementos.append(('tabla', cell.text))
+    
+    # Unir todo el texto
+    texto_completo = "\n".join([elem[1] for elem in elementos])
+    return texto_completo, doc  # También retornar el objeto doc
+
+@medir_etapa("texto.leer_documento", bytes_de=lambda nombre_archivo, contenido: len(contenido))
+def leer_documento(nombre_archivo, contenido):
+    """
+    Extrae el texto de un documento Word (.docx) o PDF a partir de sus bytes.
+    Retorna (texto, doc): doc es el objeto Document de Word, o None para PDF.
+    """
+    if nombre_archivo.lower().endswith('.pdf'):
+        # Escribir a archivo temporal para máxima compatibilidad con pdfplumber
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+                tmp.write(contenido)
+                tmp_path = tmp.name
+            return extraer_texto_pdf(tmp_path), None
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    
+    return extraer_texto_docx_completo(io.BytesIO(contenido))
+
+
+class _TablaMoodle(dict):
+    """
+    Tabla para str.translate que se completa de forma perezosa: la primera vez que
+    aparece un carácter se decide si es de control (categoría Unicode 'C') y el
+    resultado queda guardado, así unicodedata.category se consulta una sola vez
+    por carácter distinto en toda la sesión.
+    """
+    def __missing__(self, codigo):
+        valor = None if unicodedata.category(chr(codigo))[0] == 'C' else codigo
+        self[codigo] = valor
+        return valor
+
+# Comillas tipográficas -> comillas simples; el resto se resuelve en __missing__
+_TABLA_MOODLE = _TablaMoodle({
+    ord('\u201c'): '"', ord('\u201d'): '"',
+    ord('\u2018'): "'", ord('\u2019'): "'",
+})
+_PATRON_ESPACIOS_MOODLE = re.compile(r' {2,}')
+
+def limpiar_texto_para_moodle(texto):
+    """
+    Limpia el texto para que sea compatible con Moodle.
+    Remueve caracteres problemáticos y normaliza el texto.
+    """
+    # Normalizar caracteres Unicode (convierte acentos a forma estándar)
+    texto = unicodedata.normalize('NFKD', texto)
+    
+    # Remover caracteres de control y reemplazar comillas especiales en una sola pasada
+    texto = texto.translate(_TABLA_MOODLE)
+    
+    # Colapsar espacios múltiples en uno solo
+    texto = _PATRON_ESPACIOS_MOODLE.sub(' ', texto)
+    
+    return texto.strip()
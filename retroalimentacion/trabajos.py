@@ -0,0 +1,307 @@
+"""
+Trabajos en segundo plano para los lotes largos de calificación.
+
+Streamlit vuelve a ejecutar el script con cada clic y lo interrumpe al recargar
+la página, así que un lote calificado dentro del script se pierde. Aquí los lotes
+corren en un grupo de hilos del proceso del servidor, que sigue vivo aunque el
+navegador se desconecte; la interfaz solo consulta el avance.
+
+Cada trabajo tiene su carpeta trabajos/<id>/ con:
+- estado.json: tipo, descripción, estado y avance; es pequeño, se reescribe de
+  forma atómica a medida que avanza y es lo único que lee listar_trabajos
+- resultados.jsonl: un renglón por elemento, agregado apenas termina (escribir
+  uno no reescribe los anteriores)
+- resultado.json: el resultado final, escrito una sola vez
+Una sesión nueva (otra pestaña, la página recargada) encuentra los trabajos con
+listar_trabajos y se vuelve a conectar. Los resultados deben poder guardarse
+como JSON. Al enviar un trabajo se borran los terminados más antiguos del mismo
+tipo, así que la carpeta no crece sin límite.
+
+Si el servidor muere a la mitad de un lote, el registro queda interrumpido; con
+un PuntoControl (puntos_control.py) los elementos terminados quedan en disco y
+volver a enviar el mismo lote solo procesa los que faltan.
+"""
+import contextvars
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .almacen import escribir_json_atomico, leer_json
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_TRABAJOS = "trabajos"
+MAX_TRABAJOS_SIMULTANEOS = 2
+MAX_TRABAJOS_GUARDADOS = 20  # terminados que se conservan por tipo
+
+# Estados de un trabajo
+EN_COLA = "en_cola"
+EJECUTANDO = "ejecutando"
+TERMINADO = "terminado"
+FALLIDO = "error"
+CANCELADO = "cancelado"
+INTERRUMPIDO = "interrumpido"  # el servidor se reinició mientras corría
+ACTIVOS = (EN_COLA, EJECUTANDO)
+
+# Segundos mínimos entre escrituras del estado (el final siempre se escribe)
+_INTERVALO_GUARDADO = 1.0
+
+_ejecutor = None
+_trabajos = {}  # id -> Trabajo de este proceso
+_candado = threading.Lock()
+
+
+def _ahora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Trabajo:
+    """
+    Un lote en segundo plano. La función del trabajo recibe el Trabajo y reporta
+    con avanzar(); entre elementos debe revisar `cancelado` para detenerse.
+    """
+
+    def __init__(self, tipo, descripcion, total, id_trabajo=None, datos=None):
+        self.id = id_trabajo or uuid.uuid4().hex[:12]
+        self.tipo = tipo
+        self.descripcion = descripcion
+        self.total = total
+        self.hechos = 0
+        self.recuperados = 0  # elementos tomados de un punto de control
+        self.estado = EN_COLA
+        self.error = ''
+        self._resultados = []
+        self._resultado = None
+        self._en_disco = False  # registro guardado: resultados y resultado se leen al pedirlos
+        self.datos = datos or {}  # parámetros del lote que la interfaz quiera recordar
+        self.creado = _ahora()
+        self.actualizado = self.creado
+        self.cancelado = False
+        self._guardado = 0.0
+
+    @property
+    def activo(self):
+        return self.estado in ACTIVOS
+
+    @property
+    def carpeta(self):
+        return os.path.join(DIRECTORIO_TRABAJOS, self.id)
+
+    @property
+    def resultados(self):
+        """Resultados por elemento (los de un registro guardado se leen al pedirlos)"""
+        if self._en_disco and self._resultados is None:
+            self._resultados = _leer_renglones(os.path.join(self.carpeta, "resultados.jsonl"))
+        return self._resultados
+
+    @property
+    def resultado(self):
+        """Resultado final (el de un registro guardado se lee al pedirlo)"""
+        if self._en_disco and self._resultado is None:
+            self._resultado = leer_json(os.path.join(self.carpeta, "resultado.json"), None)
+        return self._resultado
+
+    def como_dict(self):
+        return {
+            'id': self.id, 'tipo': self.tipo, 'descripcion': self.descripcion,
+            'total': self.total, 'hechos': self.hechos, 'recuperados': self.recuperados, 'estado': self.estado, 'error': self.error,
+            'datos': self.datos, 'creado': self.creado, 'actualizado': self.actualizado,
+        }
+
+    @classmethod
+    def desde_dict(cls, registro):
+        trabajo = cls(registro['tipo'], registro['descripcion'], registro['total'],
+                      registro['id'], registro.get('datos'))
+        for campo in ('hechos', 'recuperados', 'estado', 'error', 'creado', 'actualizado'):
+            setattr(trabajo, campo, registro.get(campo, getattr(trabajo, campo)))
+        trabajo._en_disco = True
+        trabajo._resultados = None
+        return trabajo
+
+    def guardar(self, forzar=True):
+        """Escribe el estado (si no forzar, como mucho una vez por _INTERVALO_GUARDADO)"""
+        ahora = time.monotonic()
+        if not forzar and ahora - self._guardado < _INTERVALO_GUARDADO:
+            return
+        self._guardado = ahora
+        self.actualizado = _ahora()
+        escribir_json_atomico(os.path.join(self.carpeta, "estado.json"), self.como_dict(),
+                              sincronizar=forzar)
+
+    def terminar(self, resultado):
+        """Guarda el resultado final (una sola vez, al terminar la función del trabajo)"""
+        self._resultado = resultado
+        if resultado is not None:
+            escribir_json_atomico(os.path.join(self.carpeta, "resultado.json"), resultado)
+
+    def avanzar(self, cantidad=1, resultado=None, omitir=()):
+        """
+        Reporta elementos terminados (y, si se indica, el resultado de uno). Los
+        campos en omitir quedan en trabajo.resultados pero no se escriben al disco.
+        """
+        self.hechos += cantidad
+        if resultado is not None:
+            self.resultados.append(resultado)
+            guardado = {k: v for k, v in resultado.items() if k not in omitir} if omitir else resultado
+            os.makedirs(self.carpeta, exist_ok=True)
+            with open(os.path.join(self.carpeta, "resultados.jsonl"), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(guardado, ensure_ascii=False) + "\n")
+        self.guardar(forzar=False)
+
+
+def _leer_renglones(ruta):
+    """Un JSON por renglón; un último renglón a medias (el proceso murió escribiéndolo) se omite"""
+    if not os.path.exists(ruta):
+        return []
+    renglones = []
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for renglon in f:
+            try:
+                renglones.append(json.loads(renglon))
+            except ValueError:
+                logger.warning("Renglón incompleto en %s", ruta)
+    return renglones
+
+
+def _obtener_ejecutor():
+    global _ejecutor
+    with _candado:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(max_workers=MAX_TRABAJOS_SIMULTANEOS, thread_name_prefix="trabajo")
+        return _ejecutor
+
+
+def _correr(trabajo, funcion):
+    if trabajo.cancelado:
+        trabajo.estado = CANCELADO
+        trabajo.guardar()
+        return
+    trabajo.estado = EJECUTANDO
+    trabajo.guardar()
+    try:
+        trabajo.terminar(funcion(trabajo))
+        # Cancelado solo si se detuvo antes de terminar: si ya había hecho todos sus
+        # elementos (la cancelación llegó tarde), su resultado está completo
+        trabajo.estado = CANCELADO if trabajo.cancelado and trabajo.hechos < trabajo.total else TERMINADO
+    except Exception as e:
+        logger.exception("Falló el trabajo %s (%s)", trabajo.id, trabajo.tipo)
+        trabajo.estado = FALLIDO
+        trabajo.error = f"{type(e).__name__}: {e}"
+    trabajo.guardar()
+    # Ya terminado, el registro en disco es el trabajo; el objeto vivo (con lo
+    # omitido de los resultados) se suelta
+    with _candado:
+        _trabajos.pop(trabajo.id, None)
+
+
+def enviar_trabajo(tipo, descripcion, total, funcion, datos=None):
+    """
+    Encola funcion(trabajo) -> resultado final (JSON) en segundo plano y retorna el Trabajo.
+    total es la cantidad de elementos que funcion reportará con trabajo.avanzar().
+    """
+    limpiar_trabajos(tipo)
+    trabajo = Trabajo(tipo, descripcion, total, datos=datos)
+    with _candado:
+        _trabajos[trabajo.id] = trabajo
+    trabajo.guardar()
+    # El hilo del trabajo corre en una copia del contexto de quien lo envía
+    # (p. ej. si esa sesión mide el rendimiento)
+    _obtener_ejecutor().submit(contextvars.copy_context().run, _correr, trabajo, funcion)
+    return trabajo
+
+
+def enviar_lote(tipo, descripcion, elementos, procesar, al_terminar=None, datos=None,
+                punto_control=None, clave_de=None, omitir=()):
+    """
+    Atajo para lotes elemento por elemento: procesar(elemento) -> resultado (JSON)
+    se guarda en trabajo.resultados; al_terminar(resultados), si se indica, da el
+    resultado final. Un elemento que falla queda como {'error': ...} y el lote sigue.
+    Los campos en omitir (p. ej. el texto completo de un documento) solo llegan a
+    al_terminar; no se guardan en el registro del trabajo.
+    Con punto_control (PuntoControl) y clave_de(elemento) -> huella, cada resultado
+    se guarda apenas termina y los que ya estaban guardados no se procesan de nuevo;
+    si se procesaron todos los elementos se borran los puntos de control del lote.
+    """
+    elementos = list(elementos)
+
+    def funcion(trabajo):
+        claves = []
+        for elemento in elementos:
+            if trabajo.cancelado:
+                break
+            clave = clave_de(elemento) if punto_control is not None else None
+            resultado = punto_control.obtener(clave) if clave is not None else None
+            if resultado is not None:
+                trabajo.recuperados += 1
+            else:
+                try:
+                    resultado = procesar(elemento)
+                except Exception as e:
+                    logger.exception("Falló un elemento del trabajo %s", trabajo.id)
+                    resultado = {'error': f"{type(e).__name__}: {e}"}
+                if clave is not None and 'error' not in resultado:
+                    punto_control.guardar(clave, resultado)
+            if clave is not None:
+                claves.append(clave)
+            trabajo.avanzar(1, resultado, omitir)
+        final = al_terminar(trabajo.resultados) if al_terminar else None
+        if punto_control is not None and trabajo.hechos == trabajo.total:
+            punto_control.borrar(claves)
+        return final
+
+    return enviar_trabajo(tipo, descripcion, len(elementos), funcion, datos)
+
+
+def obtener_trabajo(id_trabajo):
+    """
+    El trabajo con ese id: el objeto vivo si corre en este proceso, si no el
+    registro guardado (None si no existe). Un trabajo activo cuyo proceso ya no
+    existe se reporta como interrumpido.
+    """
+    with _candado:
+        trabajo = _trabajos.get(id_trabajo)
+    if trabajo is not None:
+        return trabajo
+    registro = leer_json(os.path.join(DIRECTORIO_TRABAJOS, id_trabajo, "estado.json"), None)
+    if registro is None:
+        return None
+    trabajo = Trabajo.desde_dict(registro)
+    if trabajo.activo:
+        trabajo.estado = INTERRUMPIDO
+    return trabajo
+
+
+def listar_trabajos(tipo=None):
+    """Trabajos registrados (de este proceso y de anteriores), del más reciente al más antiguo"""
+    if not os.path.isdir(DIRECTORIO_TRABAJOS):
+        return []
+    trabajos = []
+    for id_trabajo in os.listdir(DIRECTORIO_TRABAJOS):
+        trabajo = obtener_trabajo(id_trabajo)
+        if trabajo is not None and (tipo is None or trabajo.tipo == tipo):
+            trabajos.append(trabajo)
+    trabajos.sort(key=lambda t: t.creado, reverse=True)
+    return trabajos
+
+
+def limpiar_trabajos(tipo, conservar=MAX_TRABAJOS_GUARDADOS):
+    """Borra los trabajos de ese tipo que ya no corren, salvo los `conservar` más recientes"""
+    terminados = [t for t in listar_trabajos(tipo) if not t.activo]
+    for trabajo in terminados[conservar:]:
+        shutil.rmtree(trabajo.carpeta, ignore_errors=True)
+
+
+def cancelar_trabajo(id_trabajo):
+    """Pide detener el trabajo; se detiene al terminar el elemento en curso"""
+    with _candado:
+        trabajo = _trabajos.get(id_trabajo)
+    if trabajo is not None and trabajo.activo:
+        trabajo.cancelado = True
+        return True
+    return False